@@ -2,20 +2,26 @@
 # -*- coding: utf-8 -*-
 
 from chinese_qa_generator import ChineseQAGenerator
+from question_space import QuestionSpaceExhausted
+import argparse
 import os
 
-def append_qa_pairs(filename: str = "chinese_qa_data.xlsx", count: int = 20):
-    """Append new Q&A pairs to existing Excel file."""
+def append_qa_pairs(filename: str = "chinese_qa_data.xlsx", count: int = 20, exhausted_policy: str = "suffix"):
+    """Append new Q&A pairs to existing Excel file.
+
+    `exhausted_policy` is passed to ChineseQAGenerator: "suffix" adds numbered duplicates once the
+    unique questions run out, "error" stops before writing anything.
+    """
     
     if not os.path.exists(filename):
         print(f"File '{filename}' does not exist. Creating new file...")
-        generator = ChineseQAGenerator()
+        generator = ChineseQAGenerator(exhausted_policy=exhausted_policy)
         generator.generate_and_save(count=count, filename=filename, append=False)
         return
     
     print(f"Appending {count} new Q&A pairs to existing file '{filename}'...")
     
-    generator = ChineseQAGenerator()
+    generator = ChineseQAGenerator(exhausted_policy=exhausted_policy)
     qa_pairs = generator.generate_and_save(count=count, filename=filename, append=True)
     
     if qa_pairs:
@@ -31,16 +37,28 @@ def append_qa_pairs(filename: str = "chinese_qa_data.xlsx", count: int = 20):
     else:
         print("No new Q&A pairs were added (all questions already existed).")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Append Chinese Q&A pairs to an existing file.")
+    parser.add_argument("--exhausted-policy", choices=ChineseQAGenerator.EXHAUSTED_POLICIES, default="suffix",
+                        help="once the unique questions run out: suffix adds numbered duplicates, error stops "
+                             "before writing (default: suffix)")
+    return parser.parse_args()
+
 def main():
     """Main function to append Q&A pairs."""
     print("Chinese Q&A Appender")
     print("=" * 50)
     
+    args = parse_args()
+    
     # You can modify these parameters
     filename = "chinese_qa_data100000.xlsx"
     count = 100000  # Number of new Q&A pairs to add
     
-    append_qa_pairs(filename, count)
+    try:
+        append_qa_pairs(filename, count, args.exhausted_policy)
+    except QuestionSpaceExhausted as e:
+        print(f"Error: {e}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -2,80 +2,208 @@
 # -*- coding: utf-8 -*-
 
 from chinese_qa_generator import ChineseQAGenerator
+from question_space import QuestionSpaceExhausted
+from qa_pipeline import DEFAULT_QUEUE_SIZE
+from qa_checkpoint import DEFAULT_CHECKPOINT_EVERY, CheckpointedRun
+from xlsx_writer import XLSX_ENGINES
+import argparse
 import os
 import time
 
-def batch_generate_qa(filename: str = "chinese_qa_data100000.xlsx", total_count: int = 100000, batch_size: int = 1000):
-    """Generate Q&A pairs in batches with progress tracking."""
+def _write_pipelined(generator, writer, total_count: int, batch_size: int, queue_size: int,
+                     metrics_file: str, start_time: float) -> int:
+    """Generate batches on this thread while the writer thread writes the previous ones."""
+    progress = {"batches": 0, "written": 0}
+    
+    def on_written(batch_length, written):
+        progress["batches"] += 1
+        progress["written"] += written
+        total_generated = progress["written"]
+        elapsed_time = time.time() - start_time
+        remaining_qa = total_count - total_generated
+        print(f"Batch {progress['batches']} written: {written} Q&A pairs, "
+              f"total progress: {total_generated}/{total_count} ({total_generated/total_count*100:.1f}%), "
+              f"estimated remaining time: {remaining_qa * elapsed_time / max(total_generated, 1) / 60:.1f} minutes")
+        if metrics_file:
+            generator.metrics.export(metrics_file)
+    
+    return writer.write_pipelined(generator.iter_qa_batches(batch_size, count=total_count), queue_size, on_written)
+
+def batch_generate_qa(filename: str = "chinese_qa_data100000.xlsx", total_count: int = 100000, batch_size: int = 1000,
+                      workers: int = 1, seed: int = None, metrics_file: str = None, pipeline: bool = False,
+                      queue_size: int = DEFAULT_QUEUE_SIZE, checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+                      resume: bool = False, rows_per_file: int = None, mb_per_file: float = None,
+                      engine: str = "openpyxl", exhausted_policy: str = "suffix"):
+    """Generate Q&A pairs in batches with progress tracking.
+
+    With `pipeline`, batches are written on a separate thread while the next ones are generated,
+    with at most `queue_size` batches waiting to be written.
+    
+    Otherwise the run is checkpointed every `checkpoint_every` batches (0 disables it), and
+    `resume` continues an interrupted run from its last checkpoint (see qa_checkpoint).
+    
+    With `rows_per_file` or `mb_per_file` the output rolls over numbered files (name_0001.xlsx, ...)
+    listed in name.manifest.json (see qa_rolling); rolling runs are not checkpointed.
+    
+    `engine` picks the xlsx writer: "openpyxl", or "native" (xlsx_writer) for faster saves; the
+    native writer renders the sheet on `workers` processes too.
+    
+    `exhausted_policy` is passed to ChineseQAGenerator: the default "suffix" lets a run go past
+    the unique question space with numbered duplicates, "error" stops before writing anything.
+    """
+    rolling = bool(rows_per_file or mb_per_file)
+    if (pipeline or rolling) and resume:
+        raise ValueError("pipelined and rolling runs are not checkpointed, so they cannot be resumed")
+    checkpointing = not (pipeline or rolling) and (checkpoint_every > 0 or resume)
     
     print(f"Starting batch generation of {total_count} Q&A pairs...")
     print(f"Batch size: {batch_size}")
     print(f"Target file: {filename}")
+    print(f"Workers: {workers}")
+    if engine != "openpyxl":
+        print(f"xlsx engine: {engine}")
+    if pipeline:
+        print(f"Pipelined: queue of {queue_size} batches")
+    if metrics_file:
+        print(f"Metrics file: {metrics_file}")
+    if checkpointing:
+        print(f"Checkpoint every {checkpoint_every} batches")
+    if rolling:
+        print(f"Rolling output: new file every {rows_per_file or '-'} rows / {mb_per_file or '-'} MB")
     print("=" * 60)
     
-    generator = ChineseQAGenerator()
+    generator = ChineseQAGenerator(exhausted_policy=exhausted_policy, workers=workers, seed=seed)
+    run = CheckpointedRun(filename, {"total_count": total_count, "batch_size": batch_size, "seed": seed,
+                                     "workers": workers, "exhausted_policy": exhausted_policy}, checkpoint_every)
+    if resume and run.resume(generator):
+        if run.finalized:
+            print(f"The interrupted run had already saved '{filename}'; nothing left to do.")
+            run.finish()
+            return run.rows_committed
+        print(f"Resuming from checkpoint: {run.rows_committed}/{total_count} Q&A pairs already written.")
+    elif resume:
+        print("No checkpoint found; starting a new run.")
+    generator.check_capacity(total_count - run.rows_committed)
     
     # Check if file exists
-    file_exists = os.path.exists(filename)
-    if file_exists:
+    file_exists = os.path.exists(filename) and not rolling
+    if rolling:
+        print(f"Writing numbered files next to '{filename}'.")
+    elif file_exists and not run.resumed:
         print(f"Found existing file '{filename}'. Will append new Q&A pairs.")
-    else:
+    elif not file_exists:
         print(f"Creating new file '{filename}'.")
     
-    total_generated = 0
-    batch_num = 1
+    resumed_from = total_generated = run.rows_committed
+    batch_num = run.batches + 1
     start_time = time.time()
     
-    while total_generated < total_count:
-        current_batch_size = min(batch_size, total_count - total_generated)
-        
-        print(f"\n--- Batch {batch_num} ---")
-        print(f"Generating {current_batch_size} Q&A pairs...")
-        
-        batch_start_time = time.time()
-        
-        # Generate batch
-        qa_pairs = generator.generate_qa_pairs(current_batch_size)
-        
-        # Write to Excel
-        if batch_num == 1 and not file_exists:
-            generator.write_to_excel(qa_pairs, filename, append=False)
+    if rolling:
+        max_bytes = int(mb_per_file * 1024 * 1024) if mb_per_file else None
+        output = generator.open_rolling_writer(filename, rows_per_file, max_bytes, engine=engine)
+    else:
+        # Checked again once the questions already in an appended file are known
+        output = generator.open_writer(filename, append=file_exists, journal=checkpointing, state=run.session_state,
+                                     engine=engine, count=total_count - run.rows_committed)
+    print(f"Unique questions available: {generator.remaining_questions():,}")
+    
+    with output as writer:
+        if checkpointing:
+            run.begin(generator, writer)
+        if pipeline:
+            total_generated = _write_pipelined(generator, writer, total_count, batch_size, queue_size,
+                                               metrics_file, start_time)
         else:
-            generator.write_to_excel(qa_pairs, filename, append=True)
-        
-        batch_time = time.time() - batch_start_time
-        total_generated += len(qa_pairs)
-        
-        print(f"Batch {batch_num} completed in {batch_time:.2f} seconds")
-        print(f"Generated: {len(qa_pairs)} Q&A pairs")
-        print(f"Total progress: {total_generated}/{total_count} ({total_generated/total_count*100:.1f}%)")
-        
-        batch_num += 1
-        
-        # Progress statistics
-        elapsed_time = time.time() - start_time
-        avg_time_per_qa = elapsed_time / total_generated
-        remaining_qa = total_count - total_generated
-        estimated_remaining_time = remaining_qa * avg_time_per_qa
-        
-        print(f"Average time per Q&A: {avg_time_per_qa:.3f} seconds")
-        print(f"Estimated remaining time: {estimated_remaining_time/60:.1f} minutes")
+            while total_generated < total_count:
+                current_batch_size = min(batch_size, total_count - total_generated)
+
+                print(f"\n--- Batch {batch_num} ---")
+                print(f"Generating {current_batch_size} Q&A pairs...")
+
+                batch_start_time = time.time()
+
+                # Generate batch
+                qa_pairs = generator.generate_qa_pairs(current_batch_size)
+
+                # Stream batch into the open workbook
+                written = writer.write_batch(qa_pairs)
+
+                batch_time = time.time() - batch_start_time
+                total_generated += written
+
+                print(f"Batch {batch_num} completed in {batch_time:.2f} seconds")
+                print(f"Generated: {written} Q&A pairs")
+                print(f"Total progress: {total_generated}/{total_count} ({total_generated/total_count*100:.1f}%)")
+
+                batch_num += 1
+
+                if checkpointing and run.after_batch(generator, writer, written):
+                    print(f"Checkpoint saved at {total_generated} Q&A pairs")
+
+                # Progress statistics
+                elapsed_time = time.time() - start_time
+                avg_time_per_qa = elapsed_time / max(total_generated - resumed_from, 1)
+                remaining_qa = total_count - total_generated
+                estimated_remaining_time = remaining_qa * avg_time_per_qa
+
+                print(f"Average time per Q&A: {avg_time_per_qa:.3f} seconds")
+                print(f"Estimated remaining time: {estimated_remaining_time/60:.1f} minutes")
+
+                if metrics_file:
+                    generator.metrics.export(metrics_file)
+    
+    run.finish()
+    generator.close()
+    if metrics_file:
+        generator.metrics.export(metrics_file)
     
     total_time = time.time() - start_time
     print(f"\n" + "=" * 60)
     print(f"BATCH GENERATION COMPLETED!")
     print(f"Total Q&A pairs generated: {total_generated}")
     print(f"Total time: {total_time/60:.1f} minutes")
-    print(f"Average time per Q&A: {total_time/total_generated:.3f} seconds")
-    print(f"File saved as: {filename}")
+    print(f"Average time per Q&A: {total_time/max(total_generated - resumed_from, 1):.3f} seconds")
+    if rolling:
+        print(f"Files saved as: {', '.join(entry['file'] for entry in writer.files)} (manifest: {writer.manifest_path})")
+    else:
+        print(f"File saved as: {filename}")
     
     return total_generated
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate Chinese Q&A pairs in batches.")
+    parser.add_argument("--workers", type=int, default=1, help="number of generator processes (default: 1)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible output")
+    parser.add_argument("--metrics", default=None, metavar="FILE",
+                        help="export stage metrics after every batch (JSON lines, or Prometheus text for *.prom)")
+    parser.add_argument("--pipeline", action="store_true", help="write batches on a separate thread while generating")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"batches that may wait for the writer in --pipeline mode (default: {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY, metavar="N",
+                        help=f"checkpoint every N batches, 0 to disable (default: {DEFAULT_CHECKPOINT_EVERY})")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run from its last checkpoint")
+    parser.add_argument("--rows-per-file", type=int, default=None, metavar="N",
+                        help="roll over to a new numbered file every N rows, listed in a manifest")
+    parser.add_argument("--mb-per-file", type=float, default=None, metavar="MB",
+                        help="roll over to a new numbered file after about MB megabytes of cell text")
+    parser.add_argument("--engine", choices=XLSX_ENGINES, default="openpyxl",
+                        help="xlsx writer: openpyxl, or native for faster streaming saves, rendered on --workers "
+                             "processes (default: openpyxl)")
+    parser.add_argument("--exhausted-policy", choices=ChineseQAGenerator.EXHAUSTED_POLICIES, default="suffix",
+                        help="once the unique questions run out: suffix adds numbered duplicates, error stops "
+                             "before writing (default: suffix)")
+    args = parser.parse_args()
+    if args.resume and (args.pipeline or args.rows_per_file or args.mb_per_file):
+        parser.error("--resume cannot be combined with --pipeline, --rows-per-file or --mb-per-file")
+    return args
+
 def main():
     """Main function for batch generation."""
     print("Enhanced Chinese Q&A Batch Generator")
     print("=" * 60)
     
+    args = parse_args()
+    
     # Configuration
     filename = "chinese_qa_data100000.xlsx"
     total_count = 100000
@@ -85,10 +213,21 @@ def main():
     print(f"- Target file: {filename}")
     print(f"- Total Q&A pairs: {total_count}")
     print(f"- Batch size: {batch_size}")
+    print(f"- Workers: {args.workers}")
     print(f"- Estimated batches: {total_count // batch_size + (1 if total_count % batch_size else 0)}")
     
     # Start generation
-    batch_generate_qa(filename, total_count, batch_size)
+    try:
+        batch_generate_qa(filename, total_count, batch_size, args.workers, args.seed, args.metrics,
+                          args.pipeline, args.queue_size, args.checkpoint_every, args.resume,
+                          args.rows_per_file, args.mb_per_file, args.engine, args.exhausted_policy)
+    except QuestionSpaceExhausted as e:
+        print(f"Error: {e}")
+    except KeyboardInterrupt:
+        if args.pipeline or args.rows_per_file or args.mb_per_file or args.checkpoint_every <= 0:
+            print(f"\nInterrupted. The Q&A pairs written so far were saved to '{filename}'.")
+        else:
+            print(f"\nInterrupted. Run again with --resume to continue from the last checkpoint.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
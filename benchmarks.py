@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the generation, writing, loading, sizing and cutting hot paths.
+
+Every case runs in its own subprocess so its peak RSS is its own. Results (rows/sec and peak
+RSS) can be saved as a JSON baseline; later runs are compared against it and the script exits
+non-zero when a case is slower or bigger than the baseline by more than the threshold.
+
+    python benchmarks.py --save-baseline          # record benchmark_baseline.json
+    python benchmarks.py                          # compare against it
+    python benchmarks.py --sizes 1000 --only generate_qa_pairs write_to_excel_new
+    python benchmarks.py --startup                # cold-start times against their budgets
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.25
+# Cold-start budget in seconds for short runs, from launching the interpreter to exit (best of STARTUP_REPEATS)
+STARTUP_BUDGET_SECONDS = {
+    "import_chinese_qa_generator": 0.35,
+    "append_qa_20": 0.75,
+    "check_progress": 1.0,
+}
+STARTUP_REPEATS = 3
+STARTUP_FIXTURE_ROWS = 10000
+# Roughly what one row of the random message files costs on disk, used to turn a row count into a target size
+MESSAGE_ROW_BYTES = 48
+
+
+def _generator(**kwargs):
+    from chinese_qa_generator import ChineseQAGenerator
+    # 100k rows is more than the question space holds, so allow suffixed questions
+    return ChineseQAGenerator(exhausted_policy="suffix", seed=1234, **kwargs)
+
+
+def _message_file(filename: str, rows: int):
+    from generate_size_excel import HEADERS, generate_message_rows
+    from size_targeting import save_rows
+    save_rows(filename, "随机消息数据", HEADERS, generate_message_rows(rows, random.Random(1234)))
+
+
+def bench_generate_unique_question(rows, tmp):
+    generator = _generator()
+    start = time.perf_counter()
+    for _ in range(rows):
+        generator.generate_unique_question()
+    return rows, time.perf_counter() - start
+
+
+def bench_generate_answer(rows, tmp):
+    generator = _generator()
+    records = [generator.generate_question_record() for _ in range(rows)]
+    start = time.perf_counter()
+    for record in records:
+        generator.generate_answer(record.question, record)
+    return rows, time.perf_counter() - start
+
+
+def bench_generate_qa_pairs(rows, tmp):
+    generator = _generator()
+    start = time.perf_counter()
+    generator.generate_qa_pairs(rows)
+    return rows, time.perf_counter() - start
+
+
+def bench_write_to_excel_new(rows, tmp):
+    generator = _generator(sidecar=False)
+    qa_pairs = generator.generate_qa_pairs(rows)
+    start = time.perf_counter()
+    generator.write_to_excel(qa_pairs, os.path.join(tmp, "new.xlsx"))
+    return rows, time.perf_counter() - start
+
+
+def bench_write_to_excel_native(rows, tmp):
+    generator = _generator(sidecar=False)
+    qa_pairs = generator.generate_qa_pairs(rows)
+    start = time.perf_counter()
+    generator.write_to_excel(qa_pairs, os.path.join(tmp, "native.xlsx"), engine="native")
+    return rows, time.perf_counter() - start
+
+
+def bench_write_to_excel_append(rows, tmp):
+    filename = os.path.join(tmp, "append.xlsx")
+    generator = _generator(sidecar=False)
+    generator.write_to_excel(generator.generate_qa_pairs(rows), filename)
+    qa_pairs = generator.generate_qa_pairs(rows)
+    start = time.perf_counter()
+    generator.write_to_excel(qa_pairs, filename, append=True)
+    return rows, time.perf_counter() - start
+
+
+def bench_load_existing_questions(rows, tmp):
+    filename = os.path.join(tmp, "existing.xlsx")
+    generator = _generator(sidecar=False)
+    generator.write_to_excel(generator.generate_qa_pairs(rows), filename, streaming=True)
+    start = time.perf_counter()
+    generator.load_existing_questions(filename)
+    return rows, time.perf_counter() - start
+
+
+def bench_create_excel_with_size(rows, tmp):
+    from generate_size_excel import create_excel_with_size
+    target_mb = rows * MESSAGE_ROW_BYTES / (1024 * 1024)
+    start = time.perf_counter()
+    total, _ = create_excel_with_size(target_mb, os.path.join(tmp, "sized.xlsx"), seed=1234)
+    return total, time.perf_counter() - start
+
+
+def bench_create_excel_with_size_native(rows, tmp):
+    from generate_size_excel import create_excel_with_size
+    target_mb = rows * MESSAGE_ROW_BYTES / (1024 * 1024)
+    start = time.perf_counter()
+    total, _ = create_excel_with_size(target_mb, os.path.join(tmp, "sized.xlsx"), seed=1234, engine="native")
+    return total, time.perf_counter() - start
+
+
+def bench_cut_excel_file_size(rows, tmp):
+    from cut_file_size import cut_excel_file_size
+    filename = os.path.join(tmp, "cut.xlsx")
+    _message_file(filename, rows)
+    target_mb = os.path.getsize(filename) / 2 / (1024 * 1024)
+    start = time.perf_counter()
+    cut_excel_file_size(filename, target_mb)
+    return rows, time.perf_counter() - start
+
+
+def bench_precise_cut_excel_size(rows, tmp):
+    from precise_cut import precise_cut_excel_size
+    filename = os.path.join(tmp, "precise.xlsx")
+    _message_file(filename, rows)
+    target_mb = os.path.getsize(filename) / 2 / (1024 * 1024)
+    start = time.perf_counter()
+    precise_cut_excel_size(filename, target_mb)
+    return rows, time.perf_counter() - start
+
+
+BENCHMARKS = {
+    "generate_unique_question": bench_generate_unique_question,
+    "generate_answer": bench_generate_answer,
+    "generate_qa_pairs": bench_generate_qa_pairs,
+    "write_to_excel_new": bench_write_to_excel_new,
+    "write_to_excel_native": bench_write_to_excel_native,
+    "write_to_excel_append": bench_write_to_excel_append,
+    "load_existing_questions": bench_load_existing_questions,
+    "create_excel_with_size": bench_create_excel_with_size,
+    "create_excel_with_size_native": bench_create_excel_with_size_native,
+    "cut_excel_file_size": bench_cut_excel_file_size,
+    "precise_cut_excel_size": bench_precise_cut_excel_size,
+}
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_case(name: str, rows: int) -> dict:
+    """Run one case in this process, with the library's progress output silenced."""
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        processed, seconds = BENCHMARKS[name](rows, tmp)
+    return {"rows": processed, "seconds": round(seconds, 4),
+            "rows_per_sec": round(processed / max(seconds, 1e-9), 1), "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+def run_case_isolated(name: str, rows: int) -> dict:
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-case", name, str(rows)],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmark {name}/{rows} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Regressions of `results` against `baseline` cases: slower or bigger by more than `threshold`."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result["rows_per_sec"] < base["rows_per_sec"] * (1 - threshold):
+            regressions.append(f"{key}: {result['rows_per_sec']:,.0f} rows/sec vs baseline {base['rows_per_sec']:,.0f}")
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{key}: peak RSS {result['peak_rss_mb']:.1f}MB vs baseline {base['peak_rss_mb']:.1f}MB")
+    return regressions
+
+
+def startup_cases(tmp: str) -> dict:
+    """Code for each startup case, run with `python -c`; files are prepared in `tmp`."""
+    filename = os.path.join(tmp, "startup.xlsx")
+    generator = _generator()
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator.write_to_excel(generator.generate_qa_pairs(STARTUP_FIXTURE_ROWS), filename, streaming=True)
+    return {
+        "import_chinese_qa_generator": "import chinese_qa_generator",
+        "append_qa_20": f"from append_qa import append_qa_pairs; append_qa_pairs({os.path.join(tmp, 'append.xlsx')!r}, 20)",
+        "check_progress": f"from check_progress import check_progress; check_progress({filename!r})",
+    }, filename
+
+
+def run_startup(code: str, setup=None) -> float:
+    """Best wall time of STARTUP_REPEATS fresh interpreters running `code`, calling `setup()` before each."""
+    best = float("inf")
+    for _ in range(STARTUP_REPEATS):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(f"startup case failed:\n{result.stderr}")
+        best = min(best, elapsed)
+    return best
+
+
+def check_startup() -> list:
+    """Run every startup case and return the ones over budget."""
+    over = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cases, fixture = startup_cases(tmp)
+        copy_fixture = lambda: [shutil.copy(path, os.path.join(tmp, "append" + path[len(fixture):]))
+                                for path in (fixture, fixture + ".qidx") if os.path.exists(path)]
+        for name, code in cases.items():
+            seconds = run_startup(code, copy_fixture if name == "append_qa_20" else None)
+            budget = STARTUP_BUDGET_SECONDS[name]
+            print(f"startup/{name:<34} {seconds:>8.3f}s (budget {budget:.2f}s)")
+            if seconds > budget:
+                over.append(f"startup/{name}: {seconds:.3f}s vs budget {budget:.2f}s")
+    return over
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Q&A and message file hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="row counts to run (default: 1k 10k 100k)")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help=f"baseline JSON file (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown / RSS growth as a fraction (default: 0.25)")
+    parser.add_argument("--startup", action="store_true", help="measure cold-start times against their budgets")
+    parser.add_argument("--run-case", nargs=2, metavar=("NAME", "ROWS"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.run_case:
+        name, rows = args.run_case
+        print(json.dumps(run_case(name, int(rows))))
+        return
+    if args.startup:
+        over = check_startup()
+        if over:
+            print("\nOVER BUDGET:")
+            for line in over:
+                print(f"- {line}")
+            sys.exit(1)
+        return
+
+    print("Benchmarks")
+    print("=" * 60)
+    results = {}
+    for name in args.only or BENCHMARKS:
+        for rows in args.sizes:
+            key = f"{name}/{rows}"
+            result = run_case_isolated(name, rows)
+            results[key] = result
+            print(f"{key:<40} {result['rows_per_sec']:>12,.0f} rows/sec {result['peak_rss_mb']:>8.1f}MB peak RSS")
+
+    if args.save_baseline:
+        baseline = {"python": platform.python_version(), "platform": platform.platform(), "cases": results}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline["cases"] = {**json.load(f).get("cases", {}), **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one.")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["cases"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nREGRESSIONS (threshold {args.threshold:.0%}):")
+        for regression in regressions:
+            print(f"- {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline} (threshold {args.threshold:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
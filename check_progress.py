@@ -3,7 +3,8 @@
 
 import os
 import time
-from openpyxl import load_workbook
+from qa_sinks import iter_existing_rows, read_first_rows
+from sidecar_index import SidecarIndex
 
 def check_progress(filename: str = "chinese_qa_50000.xlsx"):
     """Check the progress of Q&A generation."""
@@ -13,11 +14,13 @@ def check_progress(filename: str = "chinese_qa_50000.xlsx"):
         return
     
     try:
-        wb = load_workbook(filename)
-        ws = wb.active
-        
-        # Count rows (excluding header)
-        total_rows = ws.max_row - 1  # Subtract header row
+        # Count rows (excluding header): the sidecar index knows, otherwise stream the sheet once
+        sidecar = SidecarIndex.load(filename)
+        if sidecar is not None:
+            total_rows = sidecar.row_count
+            sidecar.close()
+        else:
+            total_rows = sum(len(batch) for batch in iter_existing_rows(filename))
         
         print(f"Progress Check for {filename}")
         print("=" * 50)
@@ -30,12 +33,9 @@ def check_progress(filename: str = "chinese_qa_50000.xlsx"):
             # Show some sample data
             print(f"\nSample Q&A pairs:")
             print("-" * 50)
-            for row in range(2, min(7, ws.max_row + 1)):
-                question = ws.cell(row=row, column=1).value
-                answer_type = ws.cell(row=row, column=2).value
-                answer = ws.cell(row=row, column=3).value
-                
-                print(f"{row-1:2d}. 问题: {question}")
+            sample = read_first_rows(filename, 5)
+            for row, (question, answer_type, answer) in enumerate(sample, 1):
+                print(f"{row:2d}. 问题: {question}")
                 print(f"    回答类型: {answer_type}")
                 print(f"    回答: {answer[:50]}{'...' if len(answer) > 50 else ''}")
                 print()
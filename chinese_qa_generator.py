@@ -6,257 +6,504 @@ Generates random Chinese questions and answers, then writes them to Excel.
 """
 
 import random
-import pandas as pd
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from typing import List, Dict
+import numpy as np
+from functools import lru_cache
+from typing import List, Dict, Iterator, NamedTuple, Optional, Tuple
 import re
 import os
+from time import perf_counter
+
+from question_space import QuestionSpace, QuestionSampler, QuestionSpaceExhausted
+from dedup_index import DEDUP_BACKENDS, LayeredIndex, make_dedup_index
+from sidecar_index import SidecarIndex, snapshot_index, update_sidecar
+from qa_parallel import ShardedGeneration
+from reproducible import make_rng, child_rng, numpy_rng, save_workbook
+from qa_metrics import Metrics
+from qa_rolling import DEFAULT_PARALLEL, RollingWriter
+from qa_vocabulary import (ALL_TOPICS, ANSWER_COMPONENTS, ANSWER_PATTERNS, ANSWER_TOPIC_SLOTS, ANSWER_TYPES,
+                           QUESTION_TEMPLATES, TOPICS)
+from qa_sinks import (HEADERS, MAX_SHEET_ROWS, WriterSession, batched, column_width, sink_class,
+                      output_format, iter_existing_rows, read_column_lengths, update_column_lengths, qa_row)
+
+MAX_ANSWER_LENGTH = 200
+
+
+class QuestionRecord(NamedTuple):
+    """A generated question plus the template and topics it was rendered from."""
+    question: str
+    template_id: int
+    # Indices into question_space.topics
+    topic_ids: Tuple[int, ...]
+
+
+class AnswerPlan(NamedTuple):
+    """An answer pattern compiled once: where each component slot draws from and how long it can get."""
+    pattern: str
+    # One entry per component slot; each entry is a tuple of pools, a pool is picked then a value from it
+    slots: Tuple[Tuple[Tuple[str, ...], ...], ...]
+    # Worst-case rendered length excluding the topic
+    max_fixed_length: int
+    # Per slot, which of the question's topics fills it (None draws from the slot's pools)
+    topic_refs: Tuple[Optional[int], ...] = ()
+
+    @property
+    def arity(self) -> int:
+        return len(self.slots)
+
+    def max_length(self, topic_length: int) -> int:
+        return self.max_fixed_length + topic_length
+
+    def fits(self, topic_length: int) -> bool:
+        """True if no topic of this length can push the answer past MAX_ANSWER_LENGTH."""
+        return self.max_length(topic_length) <= MAX_ANSWER_LENGTH
+
+
+@lru_cache(maxsize=16)
+def _compile_answer_plans(answer_patterns: tuple, answer_components: tuple, answer_topic_slots: tuple,
+                          category_pools: tuple):
+    """AnswerPlans for a vocabulary, plus each plan's pools flattened into arrays for batch draws."""
+    topic_slot_length = max(len(topic) for pool in category_pools for topic in pool)
+    topic_slots = dict(answer_topic_slots)
+    
+    answer_plans = []
+    for pattern in answer_patterns:
+        # The first component keyword found in the pattern decides the pool for every slot;
+        # patterns without one draw topics from a random category
+        slot = category_pools
+        slot_length = topic_slot_length
+        for keyword, components in answer_components:
+            if keyword in pattern:
+                slot = (components,)
+                slot_length = max(len(component) for component in components)
+                break
+        
+        placeholders = pattern.count('{}')
+        components_needed = placeholders - 1
+        topic_refs = topic_slots.get(pattern, ())
+        slot_lengths = [topic_slot_length if slot_index < len(topic_refs) and topic_refs[slot_index] is not None
+                        else slot_length for slot_index in range(components_needed)]
+        fixed_length = len(pattern) - 2 * placeholders + sum(slot_lengths)
+        answer_plans.append(AnswerPlan(pattern, (slot,) * components_needed, fixed_length, topic_refs))
+    
+    plan_pools = []
+    for plan in answer_plans:
+        pools = plan.slots[0] if plan.slots else ((),)
+        lengths = np.array([len(pool) for pool in pools])
+        values = np.array([value for pool in pools for value in pool] or [""], dtype=object)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        for array in (lengths, values, offsets):
+            array.flags.writeable = False
+        plan_pools.append((values, offsets, lengths))
+    return tuple(answer_plans), tuple(plan_pools), topic_slot_length
+
 
 class ChineseQAGenerator:
-    def __init__(self):
-        self.used_questions = set()
+    EXHAUSTED_POLICIES = ("error", "suffix")
+
+    def __init__(self, exhausted_policy: str = "error", workers: int = 1, seed: Optional[int] = None,
+                 rng: Optional[random.Random] = None, dedup_backend: str = "set", sidecar: bool = True,
+                 metrics: Optional[Metrics] = None):
+        """
+        exhausted_policy decides what happens once every unique question has been used:
+        "error" raises QuestionSpaceExhausted, "suffix" keeps going by adding a random
+        numeric suffix to a question (the historical behaviour).
         
-        # More diverse question templates
-        self.question_templates = [
-            # Basic questions
-            "什么是{}？", "{}是什么？", "{}的特点是什么？", "{}的作用是什么？",
-            "{}的定义是什么？", "{}的分类有哪些？", "{}的历史是什么？", "{}的原理是什么？",
-            "{}的优势是什么？", "{}的缺点是什么？", "{}的发展趋势是什么？", "{}的应用场景有哪些？",
-            
-            # More specific questions
-            "{}如何工作？", "{}的工作原理是什么？", "{}的核心技术是什么？", "{}的关键要素是什么？",
-            "{}的实现方式有哪些？", "{}的架构设计是什么？", "{}的性能指标是什么？", "{}的优化方法是什么？",
-            "{}的部署流程是什么？", "{}的维护策略是什么？", "{}的扩展性如何？", "{}的安全性如何？",
-            
-            # Comparative questions
-            "{}与{}有什么区别？", "{}相比{}有什么优势？", "{}和{}哪个更好？",
-            "{}与{}的异同点是什么？", "{}相对于{}有什么特点？",
-            
-            # Process questions
-            "如何实现{}？", "如何优化{}？", "如何部署{}？", "如何维护{}？",
-            "如何扩展{}？", "如何测试{}？", "如何监控{}？", "如何升级{}？",
-            
-            # Problem-solving questions
-            "{}常见问题有哪些？", "{}的故障排除方法是什么？", "{}的性能瓶颈在哪里？",
-            "{}的安全风险是什么？", "{}的兼容性问题是什么？", "{}的扩展限制是什么？",
-            
-            # Future-oriented questions
-            "{}的未来发展方向是什么？", "{}的技术演进趋势是什么？", "{}的市场前景如何？",
-            "{}的替代方案有哪些？", "{}的升级路径是什么？", "{}的创新点在哪里？"
-        ]
+        workers > 1 makes generate_qa_pairs run on a process pool, each worker owning a
+        disjoint shard of the question space. The same (seed, workers) gives the same output.
         
-        # Expanded topics with more specific categories
-        self.topics = {
-            "AI_ML": [
-                "机器学习算法", "深度学习模型", "神经网络", "自然语言处理", "计算机视觉",
-                "强化学习", "迁移学习", "联邦学习", "图神经网络", "Transformer模型",
-                "卷积神经网络", "循环神经网络", "生成对抗网络", "自编码器", "支持向量机",
-                "决策树", "随机森林", "梯度提升", "聚类算法", "降维技术"
-            ],
-            "BigData": [
-                "大数据处理", "数据挖掘", "数据仓库", "数据湖", "流数据处理",
-                "批处理系统", "实时分析", "数据可视化", "数据治理", "数据质量",
-                "数据安全", "数据隐私", "数据备份", "数据恢复", "数据迁移"
-            ],
-            "Cloud": [
-                "云计算平台", "容器技术", "微服务架构", "服务网格", "无服务器计算",
-                "云原生应用", "混合云", "多云管理", "云安全", "云监控",
-                "云存储", "云数据库", "云网络", "云负载均衡", "云弹性伸缩"
-            ],
-            "DevOps": [
-                "持续集成", "持续部署", "DevOps工具链", "自动化测试", "配置管理",
-                "容器编排", "服务发现", "日志管理", "监控告警", "性能优化",
-                "故障恢复", "蓝绿部署", "金丝雀发布", "滚动更新", "回滚策略"
-            ],
-            "Security": [
-                "网络安全", "数据加密", "身份认证", "访问控制", "漏洞扫描",
-                "入侵检测", "防火墙", "VPN技术", "零信任架构", "安全审计",
-                "威胁情报", "安全运营", "应急响应", "合规管理", "风险评估"
-            ],
-            "Database": [
-                "关系型数据库", "NoSQL数据库", "分布式数据库", "数据库优化", "索引策略",
-                "事务管理", "并发控制", "数据备份", "数据恢复", "数据库监控",
-                "数据库安全", "数据库迁移", "分库分表", "读写分离", "缓存策略"
-            ],
-            "Mobile": [
-                "移动应用开发", "跨平台开发", "原生开发", "混合开发", "移动UI设计",
-                "移动性能优化", "移动安全", "推送通知", "移动支付", "移动广告",
-                "移动分析", "移动测试", "应用商店", "版本管理", "热更新"
-            ],
-            "Web": [
-                "前端框架", "后端开发", "API设计", "RESTful接口", "GraphQL",
-                "Web安全", "性能优化", "SEO优化", "响应式设计", "渐进式应用",
-                "单页应用", "服务端渲染", "静态站点生成", "CDN加速", "缓存策略"
-            ]
-        }
+        All sampling goes through `rng` (or a Random seeded with `seed`), so a seeded generator
+        reproduces its rows and saves byte-identical workbooks.
         
-        # Flatten topics for easier access
-        self.all_topics = []
-        for category_topics in self.topics.values():
-            self.all_topics.extend(category_topics)
+        dedup_backend picks how used questions are remembered: "set" keeps every string,
+        "fingerprint" keeps 64-bit fingerprints only (see dedup_index.FingerprintIndex).
         
-        self.answer_types = ["纯文本", "富文本"]
+        With sidecar=True every workbook written gets a `.qidx` sidecar index next to it, so
+        later appends can skip scanning the workbook for existing questions.
         
-        # More complex answer patterns
-        self.answer_patterns = [
-            # Basic patterns
-            "{}是一种{}技术，主要用于{}。",
-            "{}指的是{}，具有{}的特点。",
-            "{}的核心是{}，通过{}实现功能。",
-            "{}包括{}，其中最重要的是{}。",
-            "{}的发展经历了{}，目前处于{}阶段。",
-            
-            # Technical patterns
-            "{}通过{}算法实现{}功能，能够{}。",
-            "{}基于{}架构设计，采用{}技术，支持{}。",
-            "{}利用{}原理，结合{}方法，实现{}。",
-            "{}采用{}模式，集成{}组件，提供{}服务。",
-            "{}运用{}策略，优化{}性能，提升{}效率。",
-            
-            # Process patterns
-            "{}的实现过程包括{}、{}和{}三个主要步骤。",
-            "{}的部署流程涉及{}配置、{}测试和{}监控。",
-            "{}的维护工作包括{}检查、{}更新和{}优化。",
-            "{}的扩展方案通过{}架构、{}技术和{}策略实现。",
-            
-            # Comparison patterns
-            "{}相比{}具有{}优势，但在{}方面存在{}限制。",
-            "{}与{}的主要区别在于{}，前者{}，后者{}。",
-            "{}和{}各有特点，{}适合{}场景，{}适合{}场景。",
-            
-            # Problem-solving patterns
-            "{}常见问题包括{}、{}和{}，解决方案分别是{}、{}和{}。",
-            "{}的性能瓶颈主要在{}，可以通过{}、{}和{}方法优化。",
-            "{}的安全风险包括{}、{}和{}，需要采取{}、{}和{}措施。",
-            
-            # Future patterns
-            "{}的发展趋势是{}，未来将向{}方向发展，预计{}。",
-            "{}的技术演进包括{}、{}和{}，将带来{}影响。",
-            "{}的市场前景广阔，主要应用在{}、{}和{}领域。"
-        ]
+        Stage timings and counters (rows generated, collisions, fallbacks, bytes written) go to
+        `self.metrics`, a qa_metrics.Metrics that can be passed in to share across objects.
+        """
+        if exhausted_policy not in self.EXHAUSTED_POLICIES:
+            raise ValueError(f"exhausted_policy must be one of {self.EXHAUSTED_POLICIES}")
+        if dedup_backend not in DEDUP_BACKENDS:
+            raise ValueError(f"dedup_backend must be one of {DEDUP_BACKENDS}")
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.exhausted_policy = exhausted_policy
+        self.workers = workers
+        self.seed = seed
+        self.rng = make_rng(seed, rng)
+        self.dedup_backend = dedup_backend
+        self.sidecar = sidecar
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.used_questions = make_dedup_index(dedup_backend)
+        # Questions from existing files that are still in the space: drawing one is a collision
+        self._preloaded = 0
+        self._sampler = None
+        self._sharded = None
         
-        # Answer components for more variety
-        self.answer_components = {
-            "技术": ["先进技术", "创新技术", "前沿技术", "核心技术", "基础技术", "成熟技术", "新兴技术"],
-            "功能": ["数据处理", "信息传输", "智能分析", "自动化控制", "实时监控", "预测分析", "决策支持"],
-            "特点": ["高效性", "可靠性", "可扩展性", "安全性", "易用性", "灵活性", "稳定性"],
-            "阶段": ["起步阶段", "发展阶段", "成熟阶段", "创新阶段", "转型阶段", "优化阶段"],
-            "影响": ["提高效率", "降低成本", "改善体验", "促进创新", "推动发展", "增强竞争力"],
-            "方式": ["算法优化", "硬件升级", "软件改进", "架构重构", "流程优化", "策略调整"],
-            "架构": ["分布式架构", "微服务架构", "云原生架构", "事件驱动架构", "分层架构"],
-            "算法": ["机器学习算法", "深度学习算法", "优化算法", "搜索算法", "排序算法"],
-            "协议": ["HTTP协议", "TCP协议", "WebSocket协议", "MQTT协议", "REST协议"],
-            "标准": ["行业标准", "技术标准", "安全标准", "性能标准", "质量标准"]
-        }
+        # Shared, read-only default vocabulary (see qa_vocabulary); assign new values to customise
+        self.question_templates = QUESTION_TEMPLATES
+        self.topics = TOPICS
+        self.all_topics = ALL_TOPICS
+        self.answer_types = ANSWER_TYPES
+        self.answer_patterns = ANSWER_PATTERNS
+        self.answer_topic_slots = ANSWER_TOPIC_SLOTS
+        self.answer_components = ANSWER_COMPONENTS
+        
+        self.compile_answer_plans()
 
-    def generate_unique_question(self) -> str:
-        attempts = 0
-        while attempts < 200:  # Increased attempts for more variety
-            template = random.choice(self.question_templates)
-            
-            # Choose topics based on template type
-            if "与" in template or "相比" in template:
-                # For comparative questions, need two different topics
-                topic1 = random.choice(self.all_topics)
-                topic2 = random.choice(self.all_topics)
-                while topic2 == topic1:
-                    topic2 = random.choice(self.all_topics)
-                try:
-                    question = template.format(topic1, topic2)
-                except IndexError:
-                    # Fallback for templates that don't match expected format
-                    question = template.format(topic1)
-            else:
-                topic = random.choice(self.all_topics)
-                try:
-                    question = template.format(topic)
-                except IndexError:
-                    # Fallback for templates that don't match expected format
-                    question = f"什么是{topic}？"
-            
+    def compile_answer_plans(self):
+        """Compile answer_patterns into AnswerPlans. Call again after changing patterns, components or topics.
+
+        Compiled plans are cached by vocabulary, so generators with the same tables share them.
+        """
+        self.answer_plans, self._plan_pools, self._longest_topic = _compile_answer_plans(
+            tuple(self.answer_patterns),
+            tuple((keyword, tuple(components)) for keyword, components in self.answer_components.items()),
+            tuple((pattern, tuple(refs)) for pattern, refs in self.answer_topic_slots.items()),
+            tuple(tuple(category_topics) for category_topics in self.topics.values()))
+
+    def _get_sampler(self) -> QuestionSampler:
+        # Built lazily so edits to question_templates/topics after __init__ are picked up
+        if self._sampler is None:
+            space = QuestionSpace(self.question_templates, self.all_topics)
+            self._sampler = QuestionSampler(space, self.rng.getrandbits(64))
+        return self._sampler
+
+    @property
+    def question_space(self) -> QuestionSpace:
+        return self._get_sampler().space
+
+    def _get_sharded(self) -> ShardedGeneration:
+        if self._sharded is None:
+            seed = self.seed if self.seed is not None else self.rng.getrandbits(64)
+            self._sharded = ShardedGeneration(self, self.workers, seed)
+        return self._sharded
+
+    def spawn_rng(self, *labels) -> random.Random:
+        """Cheap independent child stream, e.g. spawn_rng("worker", 3) for a parallel worker."""
+        seed = self.seed if self.seed is not None else self.rng.getrandbits(64)
+        return child_rng(seed, *labels)
+
+    def get_state(self) -> dict:
+        """Picklable sampling state (RNG, question sampler or shards, used questions) for checkpoints."""
+        state = {"rng": self.rng.getstate(), "used_questions": snapshot_index(self.used_questions),
+                 "preloaded": self._preloaded}
+        if self._sampler is not None:
+            state["sampler"] = (self._sampler.key, self._sampler.get_state())
+        if self._sharded is not None:
+            state["sharded"] = self._sharded.get_state()
+        return state
+
+    def set_state(self, state: dict):
+        """Continue from a get_state() snapshot: later draws repeat those the snapshotted generator would make."""
+        if "sampler" in state:
+            key, sampler_state = state["sampler"]
+            self._sampler = QuestionSampler(QuestionSpace(self.question_templates, self.all_topics), key)
+            self._sampler.set_state(sampler_state)
+        if "sharded" in state:
+            self._get_sharded().set_state(state["sharded"])
+        self.rng.setstate(state["rng"])
+        self.used_questions = state["used_questions"]
+        self._preloaded = state.get("preloaded", 0)
+
+    def remaining_questions(self) -> int:
+        """Unique questions still available to this generator, less those already in loaded files."""
+        if self.workers > 1:
+            undrawn = self._get_sharded().remaining
+        else:
+            undrawn = self._get_sampler().remaining
+        return max(undrawn - self._preloaded, 0)
+
+    def _count_collisions(self, count: int):
+        """Record `count` drawn questions that were already used, each one a preloaded question."""
+        self.metrics.incr("collisions", count)
+        self._preloaded = max(self._preloaded - count, 0)
+
+    def check_capacity(self, count: int):
+        """Raise QuestionSpaceExhausted up front if `count` questions cannot all be unique."""
+        if self.exhausted_policy == "error" and count > self.remaining_questions():
+            raise QuestionSpaceExhausted(
+                f"Requested {count} unique questions but only {self.remaining_questions()} remain "
+                f"(question space holds {self.question_space.size}); "
+                f"use exhausted_policy='suffix' to allow numbered duplicates")
+
+    def _draw_unique_record(self) -> Optional[QuestionRecord]:
+        """Next unused question from the question space, or None once the space is used up."""
+        start = perf_counter()
+        sampler = self._get_sampler()
+        record = None
+        while True:
+            draw = sampler.draw(self.rng)
+            if draw is None:
+                break
+            question = sampler.space.render(*draw)
+            # Each index is drawn once; this only skips questions loaded from an existing file
             if question not in self.used_questions:
                 self.used_questions.add(question)
-                return question
-            attempts += 1
+                record = QuestionRecord(question, *draw)
+                break
+            self._count_collisions(1)
+        self.metrics.add_time("sample", perf_counter() - start)
+        return record
+
+    def generate_question_record(self) -> QuestionRecord:
+        """Generate a unique question together with the template and topic ids it came from."""
+        record = self._draw_unique_record()
+        if record is not None:
+            return record
+        
+        sampler = self._get_sampler()
+        if self.exhausted_policy == "error":
+            raise QuestionSpaceExhausted(
+                f"All {sampler.space.size} unique questions have been used")
         
         # Add random number and timestamp to make unique
-        question = f"{question}（{random.randint(1, 99999)}-{random.randint(1000, 9999)}）"
+        template_id = self.rng.randrange(len(sampler.space.templates))
+        topic_ids = sampler.space.decode_local(template_id, self.rng.randrange(sampler.space.template_sizes[template_id]))
+        question = f"{sampler.space.render(template_id, topic_ids)}（{self.rng.randint(1, 99999)}-{self.rng.randint(1000, 9999)}）"
         self.used_questions.add(question)
-        return question
+        self.metrics.incr("fallbacks")
+        return QuestionRecord(question, template_id, topic_ids)
+
+    def generate_unique_question(self) -> str:
+        return self.generate_question_record().question
 
-    def generate_answer(self, question: str) -> str:
-        # Extract topic from question
-        topic_match = re.search(r'[什么是如何与相比]*([^？\s]+)[？\s]', question)
-        topic = topic_match.group(1) if topic_match else random.choice(self.all_topics)
+    def generate_answer(self, question: str, record: Optional[QuestionRecord] = None) -> str:
+        if record is not None:
+            topics = [self.question_space.topics[topic_id] for topic_id in record.topic_ids]
+        else:
+            # Extract topic from question
+            topic_match = re.search(r'[什么是如何与相比]*([^？\s]+)[？\s]', question)
+            topics = [topic_match.group(1) if topic_match else self.rng.choice(self.all_topics)]
+        topic = topics[0]
         
-        pattern = random.choice(self.answer_patterns)
+        plan = self.rng.choice(self.answer_plans)
+        if plan.topic_refs:
+            components = [topics[ref] if ref is not None and ref < len(topics) else self._draw_component(slot)
+                          for slot, ref in zip(plan.slots, plan.topic_refs)]
+        else:
+            components = [self._draw_component(slot) for slot in plan.slots]
+        return self._render_answer(plan, topic, components)
+
+    def _draw_component(self, pools: Tuple[Tuple[str, ...], ...]) -> str:
+        # A keyword slot has a single pool; choosing it would spend a draw the original if-chain never made
+        return self.rng.choice(pools[0] if len(pools) == 1 else self.rng.choice(pools))
+
+    @staticmethod
+    def _render_answer(plan: AnswerPlan, topic: str, components: List[str]) -> str:
+        answer = plan.pattern.format(topic, *components)
         
-        # Generate components based on pattern complexity
-        components_needed = pattern.count('{}') - 1
-        components = []
+        # Ensure answer is within 200 characters; only possible when the plan's worst case exceeds it
+        if not plan.fits(len(topic)) and len(answer) > MAX_ANSWER_LENGTH:
+            answer = answer[:MAX_ANSWER_LENGTH - 3] + "..."
         
-        for i in range(components_needed):
-            if "技术" in pattern:
-                components.append(random.choice(self.answer_components["技术"]))
-            elif "功能" in pattern:
-                components.append(random.choice(self.answer_components["功能"]))
-            elif "特点" in pattern:
-                components.append(random.choice(self.answer_components["特点"]))
-            elif "阶段" in pattern:
-                components.append(random.choice(self.answer_components["阶段"]))
-            elif "影响" in pattern:
-                components.append(random.choice(self.answer_components["影响"]))
-            elif "方式" in pattern:
-                components.append(random.choice(self.answer_components["方式"]))
-            elif "架构" in pattern:
-                components.append(random.choice(self.answer_components["架构"]))
-            elif "算法" in pattern:
-                components.append(random.choice(self.answer_components["算法"]))
-            elif "协议" in pattern:
-                components.append(random.choice(self.answer_components["协议"]))
-            elif "标准" in pattern:
-                components.append(random.choice(self.answer_components["标准"]))
-            else:
-                # Use a random topic from a different category
-                category = random.choice(list(self.topics.keys()))
-                components.append(random.choice(self.topics[category]))
+        return answer
+
+    def generate_qa_pair(self, record: Optional[QuestionRecord] = None) -> Dict[str, str]:
+        """One Q&A pair, for `record` or a newly drawn unique question."""
+        if record is None:
+            record = self.generate_question_record()
+        start = perf_counter()
+        answer = self.generate_answer(record.question, record)
+        answer_type = self.rng.choice(self.answer_types)
+        self.metrics.add_time("answer", perf_counter() - start)
+        self.metrics.incr("rows_generated")
         
-        answer = pattern.format(topic, *components)
+        return {
+            "标准问题": record.question,
+            "回答类型": answer_type,
+            "问题回答1": answer
+        }
+
+    def generate_qa_pairs(self, count: int) -> List[Dict[str, str]]:
+        self.check_capacity(count)
+        if self.workers > 1:
+            qa_pairs = []
+            # Pairs already used here are dropped, so pull until `count` new ones have come back
+            while len(qa_pairs) < count:
+                qa_pairs.extend(self._generate_qa_pairs_parallel(count - len(qa_pairs)))
+            return qa_pairs
+        
+        qa_pairs = self._generate_qa_batch(count)
+        # Only short once the space is used up, where the exhausted policy takes over
+        qa_pairs.extend(self.generate_qa_pair() for _ in range(count - len(qa_pairs)))
+        return qa_pairs
+
+    def _generate_qa_batch(self, count: int) -> List[Dict[str, str]]:
+        """
+        Up to `count` Q&A pairs with all random draws made as NumPy arrays.
+
+        Same distributions as generate_qa_pair: templates uniform among those with questions
+        left, then a uniform answer plan, pool, component and answer type. Strings are built
+        per template and per plan from topic and component tables. The NumPy stream is seeded
+        from self.rng, so seeded runs stay reproducible.
+        """
+        np_rng = numpy_rng(self.rng)
+        questions, firsts, seconds = self._draw_unique_questions(count, np_rng)
+        start = perf_counter()
+        topics = self.question_space.topic_array
+        # Records have one or two topics; a plan slot referring to a missing one draws instead
+        topic_columns = (topics[firsts], topics[np.maximum(seconds, 0)])
+        topic_present = (np.ones(len(questions), dtype=bool), seconds >= 0)
         
-        # Ensure answer is within 200 characters
-        if len(answer) > 200:
-            answer = answer[:197] + "..."
+        plan_ids = np_rng.integers(len(self.answer_plans), size=len(questions))
+        answers = np.empty(len(questions), dtype=object)
+        for plan_id in np.unique(plan_ids).tolist():
+            plan = self.answer_plans[plan_id]
+            values, offsets, lengths = self._plan_pools[plan_id]
+            rows = np.flatnonzero(plan_ids == plan_id)
+            columns = [topic_columns[0][rows]]
+            for ref in plan.topic_refs or (None,) * plan.arity:
+                pool_ids = np_rng.integers(len(lengths), size=len(rows))
+                drawn = values[offsets[pool_ids] + np_rng.integers(lengths[pool_ids])]
+                if ref is not None and ref < len(topic_columns):
+                    drawn = np.where(topic_present[ref][rows], topic_columns[ref][rows], drawn)
+                columns.append(drawn)
+            rendered = list(map(plan.pattern.format, *columns))
+            if plan.max_length(self._longest_topic) > MAX_ANSWER_LENGTH:
+                rendered = [answer if len(answer) <= MAX_ANSWER_LENGTH else answer[:MAX_ANSWER_LENGTH - 3] + "..."
+                            for answer in rendered]
+            answers[rows] = rendered
+        answer_types = np.asarray(self.answer_types, dtype=object)[np_rng.integers(len(self.answer_types), size=len(questions))]
         
-        return answer
+        qa_pairs = [{"标准问题": question, "回答类型": answer_type, "问题回答1": answer}
+                    for question, answer_type, answer in zip(questions, answer_types.tolist(), answers.tolist())]
+        self.metrics.add_time("answer", perf_counter() - start, len(qa_pairs))
+        self.metrics.incr("rows_generated", len(qa_pairs))
+        return qa_pairs
 
-    def generate_qa_pairs(self, count: int) -> List[Dict[str, str]]:
+    def _draw_unique_questions(self, count: int, np_rng) -> Tuple[List[str], "np.ndarray", "np.ndarray"]:
+        """Up to `count` unused questions and their topic ids; fewer only once the space is used up."""
+        start = perf_counter()
+        sampler = self._get_sampler()
+        space = sampler.space
+        questions, firsts, seconds = [], [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        while len(questions) < count:
+            template_ids, local_indices = sampler.draw_batch(count - len(questions), np_rng)
+            if not len(template_ids):
+                break
+            first, second = space.decode_local_batch(template_ids, local_indices)
+            rendered = space.render_batch(template_ids, first, second)
+            # Each index is drawn once; this only skips questions loaded from an existing file
+            fresh = np.fromiter((question not in self.used_questions for question in rendered), dtype=bool, count=len(rendered))
+            if not fresh.all():
+                self._count_collisions(int(len(rendered) - fresh.sum()))
+                rendered = [question for question, keep in zip(rendered, fresh) if keep]
+                first, second = first[fresh], second[fresh]
+            self.used_questions.update(rendered)
+            questions.extend(rendered)
+            firsts.append(first)
+            seconds.append(second)
+        self.metrics.add_time("sample", perf_counter() - start, len(questions))
+        return questions, np.concatenate(firsts), np.concatenate(seconds)
+
+    def iter_qa_pairs(self, count: Optional[int] = None, chunk_size: int = 10000) -> Iterator[Dict[str, str]]:
+        """
+        Yield Q&A pairs one at a time, so memory does not grow with `count`.
+
+        count=None keeps going until the question space is used up (it never falls back to
+        suffixed questions). The capacity check runs when iteration starts. Pairs are generated
+        `chunk_size` at a time, on the pool with workers > 1.
+        """
+        if self.workers > 1:
+            yield from self._iter_qa_pairs_parallel(count, chunk_size)
+            return
+        
+        if count is None:
+            while True:
+                qa_pairs = self._generate_qa_batch(chunk_size)
+                yield from qa_pairs
+                if len(qa_pairs) < chunk_size:
+                    return
+        
+        self.check_capacity(count)
+        for start in range(0, count, chunk_size):
+            yield from self.generate_qa_pairs(min(chunk_size, count - start))
+
+    def iter_qa_batches(self, batch_size: int = 1000, count: Optional[int] = None) -> Iterator[List[Dict[str, str]]]:
+        """Like iter_qa_pairs, but yields lists of `batch_size` pairs (the last may be shorter)."""
+        return batched(self.iter_qa_pairs(count, chunk_size=batch_size), batch_size)
+
+    def _iter_qa_pairs_parallel(self, count: Optional[int], chunk_size: int) -> Iterator[Dict[str, str]]:
+        if count is not None:
+            self.check_capacity(count)
+        sharded = self._get_sharded()
+        left = count
+        while left is None or left > 0:
+            size = min(chunk_size, sharded.remaining if left is None else left)
+            if size <= 0:
+                return
+            # Pairs already used here are dropped, so count what actually comes back
+            qa_pairs = self._generate_qa_pairs_parallel(size)
+            if left is not None:
+                left -= len(qa_pairs)
+            yield from qa_pairs
+
+    def _generate_qa_pairs_parallel(self, count: int) -> List[Dict[str, str]]:
+        """Generate on the worker pool; shards are merged in order, dropping questions already used here."""
         qa_pairs = []
-        for i in range(count):
-            question = self.generate_unique_question()
-            answer = self.generate_answer(question)
-            answer_type = random.choice(self.answer_types)
-            
-            qa_pairs.append({
-                "标准问题": question,
-                "回答类型": answer_type,
-                "问题回答1": answer
-            })
+        with self.metrics.stage("generate_parallel"):
+            for qa in self._get_sharded().generate(count):
+                if qa["标准问题"] not in self.used_questions:
+                    self.used_questions.add(qa["标准问题"])
+                    qa_pairs.append(qa)
+                else:
+                    self._count_collisions(1)
+        self.metrics.incr("rows_generated", len(qa_pairs))
         return qa_pairs
 
+    def close(self):
+        """Shut down the worker pool used by parallel generation, if any."""
+        if self._sharded is not None:
+            self._sharded.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _absorb_existing(self, existing):
+        """Count the questions of an existing output file as used, and those in the space as unavailable."""
+        if len(existing):
+            # The sampler's own space if it exists; building the sampler here would shift the seeded RNG stream
+            space = self._sampler.space if self._sampler is not None else QuestionSpace(self.question_templates, self.all_topics)
+            self._preloaded += sum(question in existing and question not in self.used_questions
+                                   for questions in space.iter_questions() for question in questions)
+        if isinstance(existing, SidecarIndex):
+            if not isinstance(self.used_questions, LayeredIndex):
+                self.used_questions = LayeredIndex(self.used_questions)
+            # An in-memory copy: the mapping itself is closed once the append has rewritten the sidecar
+            self.used_questions.add_base(existing.to_fingerprint_index(), existing.path)
+        else:
+            self.used_questions.update(existing)
+
     def load_existing_questions(self, filename: str) -> set:
-        """Load existing questions from Excel file to avoid duplicates."""
-        existing_questions = set()
+        """Load existing questions from Excel file to avoid duplicates.
+
+        Returns a set, or a FingerprintIndex when the generator uses the fingerprint backend.
+        If the workbook has an up-to-date sidecar index, that is memory-mapped and returned
+        instead of scanning the workbook.
+        """
+        with self.metrics.stage("dedup_load"):
+            return self._load_existing_questions(filename)
+
+    def _load_existing_questions(self, filename: str):
+        if self.sidecar:
+            sidecar = SidecarIndex.load(filename)
+            if sidecar is not None:
+                print(f"Loaded {len(sidecar)} existing questions from {sidecar.path}")
+                return sidecar
+        
+        existing_questions = make_dedup_index(self.dedup_backend)
         if os.path.exists(filename):
             try:
-                wb = load_workbook(filename)
-                ws = wb.active
-                
                 # Read existing questions from column A (starting from row 2)
-                for row in range(2, ws.max_row + 1):
-                    question = ws.cell(row=row, column=1).value
-                    if question:
-                        existing_questions.add(question)
+                for batch in iter_existing_rows(filename):
+                    existing_questions.update(row[0] for row in batch if row[0])
                 
                 print(f"Loaded {len(existing_questions)} existing questions from {filename}")
             except Exception as e:
@@ -264,17 +511,36 @@ class ChineseQAGenerator:
         
         return existing_questions
 
-    def write_to_excel(self, qa_pairs: List[Dict[str, str]], filename: str = "chinese_qa_data.xlsx", append: bool = False):
-        """Write Q&A pairs to Excel file with proper formatting."""
+    def write_to_excel(self, qa_pairs: List[Dict[str, str]], filename: str = "chinese_qa_data.xlsx", append: bool = False,
+                       streaming: bool = False, engine: str = "openpyxl"):
+        """Write Q&A pairs to Excel file with proper formatting.
+
+        With streaming=True rows go through a write-only workbook, keeping memory flat for large runs.
+        Rows beyond one sheet's limit (MAX_SHEET_ROWS) always stream, continuing on further sheets.
+        engine="native" writes the sheet XML directly (see xlsx_writer), always streaming, and
+        renders it on the generator's worker processes when workers > 1.
+        """
+        if streaming or engine != "openpyxl" or len(qa_pairs) >= MAX_SHEET_ROWS:
+            return self._write_to_excel_streaming(qa_pairs, filename, append, engine)
+        from openpyxl import Workbook, load_workbook
+        from openpyxl.styles import Font, PatternFill, Alignment
+        from openpyxl.utils import get_column_letter
         
         if append and os.path.exists(filename):
             # Load existing workbook
-            wb = load_workbook(filename)
+            with self.metrics.stage("load_workbook"):
+                wb = load_workbook(filename)
             ws = wb.active
             
             # Load existing questions to avoid duplicates
             existing_questions = self.load_existing_questions(filename)
-            self.used_questions.update(existing_questions)
+            self._absorb_existing(existing_questions)
+            existing_lengths = None
+            if isinstance(existing_questions, SidecarIndex):
+                # Work from the in-memory copy and unmap the sidecar, which is replaced after the save
+                sidecar, existing_lengths = existing_questions, existing_questions.column_lengths
+                existing_questions = sidecar.to_fingerprint_index()
+                sidecar.close()
             
             # Filter out questions that already exist
             new_qa_pairs = []
@@ -283,10 +549,14 @@ class ChineseQAGenerator:
                     new_qa_pairs.append(qa)
                 else:
                     print(f"Skipping duplicate question: {qa['标准问题']}")
+                    self.metrics.incr("duplicates_skipped")
             
             if not new_qa_pairs:
                 print("No new questions to add - all questions already exist in the file.")
                 return
+            if len(wb.worksheets) > 1 or ws.max_row + len(new_qa_pairs) > MAX_SHEET_ROWS:
+                wb.close()
+                return self._write_to_excel_streaming(new_qa_pairs, filename, append)
             
             qa_pairs = new_qa_pairs
             start_row = ws.max_row + 1
@@ -304,38 +574,174 @@ class ChineseQAGenerator:
                 cell.fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
                 cell.alignment = Alignment(horizontal="center", vertical="center")
             
+            existing_questions = existing_lengths = None
             start_row = 2
         
         # Write data
-        for row_idx, qa_pair in enumerate(qa_pairs, start_row):
-            ws.cell(row=row_idx, column=1, value=qa_pair["标准问题"])
-            ws.cell(row=row_idx, column=2, value=qa_pair["回答类型"])
-            ws.cell(row=row_idx, column=3, value=qa_pair["问题回答1"])
+        with self.metrics.stage("write_rows"):
+            for row_idx, qa_pair in enumerate(qa_pairs, start_row):
+                ws.cell(row=row_idx, column=1, value=qa_pair["标准问题"])
+                ws.cell(row=row_idx, column=2, value=qa_pair["回答类型"])
+                ws.cell(row=row_idx, column=3, value=qa_pair["问题回答1"])
         
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+        # Auto-adjust column widths from the running maxima, folding in only the new rows
+        column_lengths = update_column_lengths(self._existing_column_lengths(ws, existing_questions, existing_lengths),
+                                               (qa_row(qa) for qa in qa_pairs))
+        for col, length in enumerate(column_lengths, 1):
+            ws.column_dimensions[get_column_letter(col)].width = column_width(length)
         
-        wb.save(filename)
+        with self.metrics.stage("save"):
+            save_workbook(wb, filename, deterministic=self.seed is not None)
+        self.metrics.incr("rows_written", len(qa_pairs))
+        self.metrics.incr("bytes_written", os.path.getsize(filename))
+        if self.sidecar:
+            with self.metrics.stage("sidecar"):
+                update_sidecar(filename, existing_questions, (qa["标准问题"] for qa in qa_pairs), ws.max_row - 1, column_lengths)
         action = "appended to" if append else "created"
         print(f"Excel file '{filename}' has been {action} successfully!")
         print(f"Added {len(qa_pairs)} new Q&A pairs.")
 
-    def generate_and_save(self, count: int = 50, filename: str = "chinese_qa_data.xlsx", append: bool = False):
+    def _existing_column_lengths(self, ws, existing, sidecar_lengths: Optional[List[int]] = None) -> List[int]:
+        """Per-column max lengths already in `ws`: from the sidecar if loaded, else from the saved column widths."""
+        lengths = update_column_lengths([0] * len(HEADERS), [HEADERS])
+        if sidecar_lengths is not None:
+            return [max(a, b) for a, b in zip(lengths, sidecar_lengths)]
+        if existing is not None:
+            from openpyxl.utils import get_column_letter
+            for col in range(1, len(HEADERS) + 1):
+                letter = get_column_letter(col)
+                if letter in ws.column_dimensions and ws.column_dimensions[letter].width:
+                    lengths[col - 1] = max(lengths[col - 1], int(ws.column_dimensions[letter].width) - 2)
+        return lengths
+
+    def _write_to_excel_streaming(self, qa_pairs: List[Dict[str, str]], filename: str, append: bool,
+                                  engine: str = "openpyxl"):
+        """Streaming variant of write_to_excel; appending rewrites the file in one read-only pass."""
+        excel_sink = sink_class("xlsx", engine)
+        options = {"workers": self.workers} if engine == "native" and self.workers > 1 else {}
+        rows = [qa_row(qa) for qa in qa_pairs]
+        lengths = update_column_lengths([0] * 3, rows)
+        appending = append and os.path.exists(filename)
+        
+        if not appending:
+            with self.metrics.stage("save"), excel_sink(filename, lengths, self.seed is not None, **options) as sink:
+                sink.write_values(rows)
+            existing_questions = None
+        else:
+            sidecar = SidecarIndex.load(filename) if self.sidecar else None
+            if sidecar is not None:
+                existing_lengths = sidecar.column_lengths
+                sidecar.close()
+            else:
+                existing_lengths = read_column_lengths(filename)
+            lengths = [max(a, b) for a, b in zip(lengths, existing_lengths)]
+            existing_questions = make_dedup_index(self.dedup_backend)
+            
+            tmp_filename = filename + ".tmp"
+            with self.metrics.stage("save"), excel_sink(tmp_filename, lengths, self.seed is not None, **options) as sink:
+                for batch in iter_existing_rows(filename):
+                    existing_questions.update(row[0] for row in batch if row[0])
+                    sink.write_values(batch)
+                
+                new_rows = []
+                for row in rows:
+                    if row[0] not in existing_questions:
+                        new_rows.append(row)
+                    else:
+                        print(f"Skipping duplicate question: {row[0]}")
+                        self.metrics.incr("duplicates_skipped")
+                sink.write_values(new_rows)
+            os.replace(tmp_filename, filename)
+            
+            self._absorb_existing(existing_questions)
+            print(f"Loaded {len(existing_questions)} existing questions from {filename}")
+            rows = new_rows
+        
+        self.metrics.incr("rows_written", len(rows))
+        self.metrics.incr("bytes_written", os.path.getsize(filename))
+        if self.sidecar:
+            with self.metrics.stage("sidecar"):
+                update_sidecar(filename, existing_questions, (row[0] for row in rows), sink.rows_written, sink.column_lengths)
+        if appending and not rows:
+            print("No new questions to add - all questions already exist in the file.")
+            return
+        
+        action = "appended to" if appending else "created"
+        print(f"Excel file '{filename}' has been {action} successfully!")
+        print(f"Added {len(rows)} new Q&A pairs.")
+
+    def open_writer(self, filename: str = "chinese_qa_data.xlsx", append: bool = False,
+                    format: Optional[str] = None, journal: bool = False, state: Optional[dict] = None,
+                    engine: str = "openpyxl", count: Optional[int] = None) -> WriterSession:
+        """Open a writer session that takes batches and finalizes the file once.
+
+        The output format ("xlsx", "csv", "jsonl" or "parquet") is `format` or the file extension;
+        xlsx is written by `engine` ("openpyxl" or "native"); the native engine renders on the
+        generator's worker processes when workers > 1.
+        `journal` and `state` make the session checkpointable and resume one (see qa_checkpoint).
+        With `count`, check_capacity(count) runs once the questions already in the file are known,
+        and the session is abandoned untouched if they leave too few.
+
+        Usage:
+            with generator.open_writer(filename, append=True) as writer:
+                writer.write_batch(generator.generate_qa_pairs(1000))
+        """
+        session = WriterSession(filename, append, deterministic=self.seed is not None,
+                                dedup_backend=self.dedup_backend, sidecar=self.sidecar, format=format,
+                                metrics=self.metrics, journal=journal, state=state, engine=engine,
+                                workers=self._render_workers(filename, format, engine))
+        if session.appending and not session.resumed:
+            self._absorb_existing(session.existing)
+            print(f"Loaded {session.existing_count} existing questions from {filename}")
+        if count is not None:
+            try:
+                self.check_capacity(count)
+            except QuestionSpaceExhausted:
+                session.abandon()
+                raise
+        return session
+
+    def _render_workers(self, filename: str, format: Optional[str], engine: str) -> int:
+        """Processes the writer renders xlsx on: the generator's workers, for the native engine."""
+        return self.workers if engine == "native" and output_format(filename, format) == "xlsx" else 1
+
+    def open_rolling_writer(self, filename: str = "chinese_qa_data.xlsx", max_rows: Optional[int] = None,
+                            max_bytes: Optional[int] = None, format: Optional[str] = None,
+                            parallel: int = DEFAULT_PARALLEL, engine: str = "openpyxl") -> RollingWriter:
+        """Open a writer that splits the output over name_0001.xlsx, name_0002.xlsx, ... (see qa_rolling).
+
+        A new file starts at `max_rows` rows or about `max_bytes` bytes of cell text, and
+        name.manifest.json lists every file with its row range.
+        """
+        return RollingWriter(filename, max_rows, max_bytes, deterministic=self.seed is not None,
+                             dedup_backend=self.dedup_backend, sidecar=self.sidecar, format=format,
+                             metrics=self.metrics, parallel=parallel, engine=engine)
+
+    def write_qa_pairs(self, qa_pairs: List[Dict[str, str]], filename: str, append: bool = False,
+                       format: Optional[str] = None):
+        """Write Q&A pairs in any sink format (see qa_sinks.SINK_FORMATS), skipping questions already in the file."""
+        with self.open_writer(filename, append, format) as writer:
+            written = writer.write_batch(qa_pairs)
+        
+        if writer.appending and not written:
+            print("No new questions to add - all questions already exist in the file.")
+            return
+        action = "appended to" if writer.appending else "created"
+        print(f"{writer.format.upper()} file '{filename}' has been {action} successfully!")
+        print(f"Added {written} new Q&A pairs.")
+
+    def generate_and_save(self, count: int = 50, filename: str = "chinese_qa_data.xlsx", append: bool = False,
+                          streaming: bool = False, format: Optional[str] = None):
+        """Generate `count` pairs and save them; the format is `format` or the file extension."""
         print(f"Generating {count} unique Chinese Q&A pairs...")
         qa_pairs = self.generate_qa_pairs(count)
         
-        print(f"Writing data to Excel file '{filename}'...")
-        self.write_to_excel(qa_pairs, filename, append)
+        if output_format(filename, format) == "xlsx":
+            print(f"Writing data to Excel file '{filename}'...")
+            self.write_to_excel(qa_pairs, filename, append, streaming=streaming)
+        else:
+            print(f"Writing data to '{filename}'...")
+            self.write_qa_pairs(qa_pairs, filename, append, format)
         
         print(f"Successfully generated {len(qa_pairs)} Q&A pairs!")
         return qa_pairs
@@ -4,16 +4,37 @@
 from openpyxl import load_workbook
 import os
 import shutil
+from excel_truncate import backup_path, truncate_workbook, print_report
+from size_targeting import MB
 
-def cut_excel_file_size(input_filename: str, target_size_mb: float = 19.0):
-    """Cut Excel file size to target size by removing rows."""
+def cut_excel_file_size(input_filename: str, target_size_mb: float = 19.0, streaming: bool = True):
+    """Cut Excel file size to target size by removing rows.
+
+    With streaming=True (the default) the first N data rows are streamed into a new file, with N
+    the largest prefix that fits (see excel_truncate); otherwise rows are deleted in place.
+    """
     
     if not os.path.exists(input_filename):
         print(f"Error: File '{input_filename}' does not exist.")
         return
     
+    if streaming:
+        current_size_mb = os.path.getsize(input_filename) / (1024 * 1024)
+        print(f"Current file size: {current_size_mb:.2f}MB")
+        print(f"Target size: {target_size_mb:.2f}MB")
+        if current_size_mb <= target_size_mb:
+            print("File is already smaller than target size. No changes needed.")
+            return
+        try:
+            result = truncate_workbook(input_filename, int(target_size_mb * MB))
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        print_report(result, target_size_mb, "FILE SIZE REDUCTION COMPLETED!", input_filename)
+        return
+    
     # Create backup
-    backup_filename = input_filename.replace('.xlsx', '_backup.xlsx')
+    backup_filename = backup_path(input_filename)
     shutil.copy2(input_filename, backup_filename)
     print(f"Created backup: {backup_filename}")
     
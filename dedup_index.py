@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dedup indexes for generated questions.
+
+"set" is an exact Python set of question strings (the default). "fingerprint" keeps only a
+64-bit fingerprint per question and needs roughly 8.5 bytes per question instead of the
+100+ bytes a set of Chinese strings costs, for runs with tens of millions of rows.
+"""
+
+import hashlib
+import heapq
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+from typing import Callable, Iterable, Iterator, Optional
+
+DEDUP_BACKENDS = ("set", "fingerprint")
+
+
+def fingerprint(question: str) -> int:
+    """Stable 64-bit fingerprint of a question (BLAKE2b, independent of PYTHONHASHSEED)."""
+    return int.from_bytes(hashlib.blake2b(question.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class FingerprintIndex:
+    """
+    Set of questions stored as 64-bit fingerprints.
+
+    Fingerprints are spread over 2**bucket_bits buckets by their top bits; each bucket is a
+    sorted array('Q') searched with bisect, so every operation stays in C and a question
+    costs 8 bytes plus array slack.
+
+    Collision bound: with n questions stored, a lookup of a new question wrongly reports it
+    present with probability at most n / 2**64. Over m lookups the chance of any false hit is
+    at most m * n / 2**64, about 5e-4 for n = m = 10**8. A false hit only ever causes a unique
+    question to be skipped, never a duplicate to be written.
+
+    Exact-verification fallback: pass `verify`, a callable returning whether a question is
+    really present (for example a scan of the source file). It is consulted only when a
+    fingerprint matches, so it runs for real duplicates and the rare collision, and a
+    collision it rejects is remembered exactly in a small side set.
+    """
+
+    def __init__(self, questions: Iterable[str] = (), bucket_bits: int = 14,
+                 verify: Optional[Callable[[str], bool]] = None):
+        self._shift = 64 - bucket_bits
+        self._buckets = [None] * (1 << bucket_bits)
+        self._count = 0
+        self._verify = verify
+        self._collisions = set()
+        self.fingerprint_hits = 0
+        self.update(questions)
+
+    @classmethod
+    def from_fingerprints(cls, sorted_fingerprints: Iterable[int], bucket_bits: int = 14) -> "FingerprintIndex":
+        """Build an index straight from ascending, distinct fingerprints (e.g. a sidecar's)."""
+        index = cls(bucket_bits=bucket_bits)
+        for value in sorted_fingerprints:
+            slot = value >> index._shift
+            bucket = index._buckets[slot]
+            if bucket is None:
+                bucket = index._buckets[slot] = array("Q")
+            bucket.append(value)
+            index._count += 1
+        return index
+
+    def _find(self, value: int):
+        bucket = self._buckets[value >> self._shift]
+        if bucket is None:
+            return None, 0, False
+        pos = bisect_left(bucket, value)
+        return bucket, pos, pos < len(bucket) and bucket[pos] == value
+
+    def _hit(self, question: str) -> bool:
+        """A fingerprint matched; decide whether `question` is really present."""
+        self.fingerprint_hits += 1
+        if self._verify is None or question in self._collisions:
+            return True
+        return self._verify(question)
+
+    def __contains__(self, question: str) -> bool:
+        _, _, found = self._find(fingerprint(question))
+        return found and self._hit(question)
+
+    def add(self, question: str):
+        value = fingerprint(question)
+        bucket, pos, found = self._find(value)
+        if found:
+            if self._verify is not None and question not in self._collisions and not self._verify(question):
+                self._collisions.add(question)
+                self._count += 1
+            return
+        if bucket is None:
+            bucket = self._buckets[value >> self._shift] = array("Q")
+        bucket.insert(pos, value)
+        self._count += 1
+
+    def update(self, questions: Iterable[str]):
+        """Add questions, or merge another FingerprintIndex without needing its strings."""
+        if isinstance(questions, FingerprintIndex):
+            self._merge(questions)
+            return
+        for question in questions:
+            self.add(question)
+
+    def _merge(self, other: "FingerprintIndex"):
+        if other._shift != self._shift:
+            raise ValueError("cannot merge fingerprint indexes with different bucket_bits")
+        for slot, other_bucket in enumerate(other._buckets):
+            if other_bucket is None:
+                continue
+            bucket = self._buckets[slot]
+            if bucket is None:
+                self._buckets[slot] = array("Q", other_bucket)
+                self._count += len(other_bucket)
+                continue
+            merged = array("Q", sorted(set(bucket).union(other_bucket)))
+            self._count += len(merged) - len(bucket)
+            self._buckets[slot] = merged
+        self._collisions.update(other._collisions)
+        self._count += len(other._collisions)
+
+    def __len__(self):
+        return self._count
+
+    def iter_fingerprints(self) -> Iterator[int]:
+        """All stored fingerprints in ascending order (buckets are keyed by the top bits)."""
+        for bucket in self._buckets:
+            if bucket is not None:
+                yield from bucket
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the fingerprint arrays."""
+        return sum(len(bucket) * bucket.itemsize + 64
+                   for bucket in self._buckets if bucket is not None) + 8 * len(self._buckets)
+
+
+class LayeredIndex:
+    """
+    Read-only base indexes (such as sidecars) under an in-memory overlay that takes all
+    additions. A base is replaced by a newer one added for the same path, which defaults to
+    the base's own `path` attribute.
+    """
+
+    def __init__(self, overlay, bases: Iterable = (), paths: Iterable[Optional[str]] = ()):
+        self.overlay = overlay
+        self.bases = []
+        self.paths = []
+        paths = list(paths)
+        for i, base in enumerate(bases):
+            self.add_base(base, paths[i] if i < len(paths) else None)
+
+    def add_base(self, base, path: Optional[str] = None):
+        path = path if path is not None else getattr(base, "path", None)
+        if path is not None and path in self.paths:
+            self.bases[self.paths.index(path)] = base
+            return
+        self.bases.append(base)
+        self.paths.append(path)
+
+    def __contains__(self, question: str) -> bool:
+        if question in self.overlay:
+            return True
+        return any(question in base for base in self.bases)
+
+    def add(self, question: str):
+        self.overlay.add(question)
+
+    def update(self, questions: Iterable[str]):
+        self.overlay.update(questions)
+
+    def __len__(self):
+        if not self.bases:
+            return len(self.overlay)
+        # Layers can share questions (a sidecar and the rows appended after it), so count distinct fingerprints
+        return sum(1 for _ in groupby(iter_sorted_fingerprints(self)))
+
+
+def iter_sorted_fingerprints(index) -> Iterator[int]:
+    """
+    Ascending fingerprints of any dedup index (set, FingerprintIndex, SidecarIndex or LayeredIndex).
+    A question held by several layers of a LayeredIndex appears once per layer.
+    """
+    if isinstance(index, LayeredIndex):
+        return heapq.merge(*(iter_sorted_fingerprints(layer) for layer in [index.overlay] + index.bases))
+    if hasattr(index, "iter_fingerprints"):
+        return index.iter_fingerprints()
+    return iter(sorted(fingerprint(question) for question in index))
+
+
+def make_dedup_index(backend: str = "set", questions: Iterable[str] = ()):
+    """Create an empty (or pre-filled) dedup index for `backend`."""
+    if backend == "set":
+        return set(questions)
+    if backend == "fingerprint":
+        return FingerprintIndex(questions)
+    raise ValueError(f"dedup backend must be one of {DEDUP_BACKENDS}")
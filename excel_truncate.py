@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Truncate a workbook to a target file size by streaming its first N data rows into a new file.
+
+Rows are streamed in read-only mode, never held in memory: once to measure, then up to the cut
+to check the last step and to write. openpyxl writes write-only sheets with inline strings, so
+the only part of the output that grows with N is the deflated sheet XML. `PrefixSizes`
+re-creates that XML and deflates it the same way the zip writer does, which gives the file size
+for any N without saving the workbook. The largest N that fits is found by bisecting those
+sizes, the output is written once, and the written size is checked against the prediction.
+"""
+
+import io
+import os
+import zipfile
+import zlib
+from bisect import bisect_right
+from copy import copy
+from itertools import islice
+from typing import Iterator, NamedTuple, Optional
+from xml.sax.saxutils import escape
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+
+from qa_sinks import read_column_widths
+from size_targeting import MB
+
+SHEET_PART = "xl/worksheets/sheet1.xml"
+# docProps/core.xml carries the save time, which moves its compressed size by a byte or two
+SIZE_MARGIN = 16
+
+
+class TruncateResult(NamedTuple):
+    original_size: int
+    final_size: int
+    original_rows: int
+    final_rows: int
+    writes: int
+    backup_filename: Optional[str]
+
+
+def _cell_xml(ref: str, value) -> str:
+    """The <c> element openpyxl writes for `value` in a write-only sheet."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}" t="n"><v>{"%.16g" % value}</v></c>'
+    text = str(value)
+    if text == "":
+        return f'<c r="{ref}" t="inlineStr" />'
+    stripped = text.strip()
+    space = ' xml:space="preserve"' if stripped and stripped != text else ""
+    return f'<c r="{ref}" t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+class SheetCopy:
+    """
+    Title, styled header and column widths of a single-sheet workbook, with its data rows
+    read lazily in read-only mode on every pass, so memory does not grow with the row count.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        wb = load_workbook(filename, read_only=True)
+        try:
+            if len(wb.worksheets) > 1:
+                raise ValueError(f"{filename} has {len(wb.worksheets)} sheets; only single-sheet workbooks "
+                                 f"can be truncated")
+            ws = wb.worksheets[0]
+            self.title = ws.title
+            self.header = [(cell.value, copy(cell.font), copy(cell.fill), copy(cell.alignment))
+                           for row in ws.iter_rows(max_row=1) for cell in row]
+        finally:
+            wb.close()
+        self.widths = read_column_widths(filename)
+
+    def iter_rows(self, limit: Optional[int] = None) -> Iterator[tuple]:
+        """The data rows (all, or the first `limit`), read in one read-only pass."""
+        if limit == 0:
+            return
+        wb = load_workbook(self.filename, read_only=True)
+        try:
+            max_row = None if limit is None else limit + 1
+            yield from wb.worksheets[0].iter_rows(min_row=2, max_row=max_row, values_only=True)
+        finally:
+            wb.close()
+
+    def save(self, target, count: int) -> int:
+        """Write the header and the first `count` rows to `target`; returns the size in bytes."""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(self.title)
+        for col, width in sorted(self.widths.items()):
+            ws.column_dimensions[get_column_letter(col)].width = width
+
+        header_row = []
+        for value, font, fill, alignment in self.header:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.font, cell.fill, cell.alignment = font, fill, alignment
+            header_row.append(cell)
+        ws.append(header_row)
+        for row in self.iter_rows(count):
+            ws.append(row)
+
+        wb.save(target)
+        if isinstance(target, io.BytesIO):
+            return len(target.getvalue())
+        return os.path.getsize(target)
+
+    def iter_row_xml(self, limit: Optional[int] = None) -> Iterator[bytes]:
+        """Sheet XML of each data row (all, or the first `limit`), as openpyxl writes it."""
+        for r, row in enumerate(self.iter_rows(limit), 2):
+            cells = "".join(_cell_xml(f"{get_column_letter(col)}{r}", value)
+                            for col, value in enumerate(row, 1))
+            yield f'<row r="{r}">{cells}</row>'.encode("utf-8")
+
+
+class _Deflater:
+    """Raw deflate stream as zipfile writes it, tracking how many bytes it has emitted."""
+
+    def __init__(self, head: bytes):
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self.written = len(self._compressor.compress(head))
+
+    def feed(self, data: bytes):
+        self.written += len(self._compressor.compress(data))
+
+    def size_with(self, tail: bytes) -> int:
+        """Compressed size if the stream ended with `tail` now; the stream itself is untouched."""
+        pending = self._compressor.copy()
+        return self.written + len(pending.compress(tail)) + len(pending.flush())
+
+    def copy(self) -> "_Deflater":
+        clone = _Deflater.__new__(_Deflater)
+        clone._compressor = self._compressor.copy()
+        clone.written = self.written
+        return clone
+
+
+class PrefixSizes:
+    """
+    Predicted file size for the first N rows of a `SheetCopy`, for any N.
+
+    One header-only save gives everything except the sheet XML. The rows' XML is then deflated
+    in a single pass, and at every `step` rows a copy of the compressor is flushed with the
+    sheet's closing XML to get the exact compressed size there. `largest_fitting` bisects those
+    checkpoints and replays the one step that crosses the target row by row.
+
+    Given `target_bytes`, the pass also keeps the compressor at the last checkpoint under it and
+    the XML of the step after it, so that step is replayed without reading the rows again.
+    """
+
+    def __init__(self, sheet: SheetCopy, step: int = 1000, target_bytes: Optional[int] = None):
+        self.sheet = sheet
+        self.step = step
+        buffer = io.BytesIO()
+        header_size = sheet.save(buffer, 0)
+        with zipfile.ZipFile(buffer) as archive:
+            compressed_sheet = archive.getinfo(SHEET_PART).compress_size
+            xml = archive.read(SHEET_PART)
+        split = xml.index(b"</sheetData>")
+        self._head, self._tail = xml[:split], xml[split:]
+        # Zip headers and every other part do not depend on the number of rows
+        self._fixed = header_size - compressed_sheet
+
+        deflater = _Deflater(self._head)
+        self.checkpoints = []
+        # (checkpoint index, compressor there, XML of up to `step` rows after it)
+        self._replay = None
+        self.rows = 0
+        self._checkpoint(deflater, target_bytes)
+        for self.rows, row_xml in enumerate(sheet.iter_row_xml(), 1):
+            deflater.feed(row_xml)
+            if self._replay is not None and len(self._replay[2]) < step:
+                self._replay[2].append(row_xml)
+            if self.rows % step == 0:
+                self._checkpoint(deflater, target_bytes)
+        if self.rows % step:
+            self._checkpoint(deflater, target_bytes)
+
+    def _checkpoint(self, deflater: _Deflater, target_bytes: Optional[int]):
+        size = self._fixed + deflater.size_with(self._tail)
+        self.checkpoints.append(size)
+        if target_bytes is not None and size <= target_bytes:
+            self._replay = (len(self.checkpoints) - 1, deflater.copy(), [])
+
+    def largest_fitting(self, target_bytes: int) -> int:
+        """Largest N whose predicted size is at most `target_bytes` (0 if only the header fits)."""
+        i = bisect_right(self.checkpoints, target_bytes)
+        if i == len(self.checkpoints):
+            return self.rows
+        if i == 0:
+            return 0
+        start = (i - 1) * self.step
+
+        if self._replay is not None and self._replay[0] == i - 1:
+            deflater, rows = self._replay[1].copy(), self._replay[2]
+        else:
+            # The row that crosses the target is within the next step, so read no further than that
+            deflater = _Deflater(self._head)
+            rows = self.sheet.iter_row_xml(min(start + self.step, self.rows))
+            for row_xml in islice(rows, start):
+                deflater.feed(row_xml)
+
+        best = start
+        for index, row_xml in enumerate(rows, start + 1):
+            deflater.feed(row_xml)
+            if self._fixed + deflater.size_with(self._tail) > target_bytes:
+                break
+            best = index
+        return best
+
+
+def backup_path(filename: str) -> str:
+    """name.xlsx -> name_backup.xlsx; only the extension is looked at, so it never equals `filename`."""
+    root, ext = os.path.splitext(filename)
+    return f"{root}_backup{ext}"
+
+
+def truncate_workbook(filename: str, target_bytes: int, backup: bool = True, max_writes: int = 3) -> TruncateResult:
+    """
+    Keep the largest prefix of data rows of `filename` that fits in `target_bytes`.
+
+    `filename` must hold a single sheet; other workbooks raise ValueError. The output is written
+    to a temporary file and renamed over `filename`. With `backup`, the original is renamed to
+    `<name>_backup.xlsx` instead of copied, so no extra full copy is made.
+    """
+    original_size = os.path.getsize(filename)
+    print(f"Measuring prefix sizes of {filename}...")
+    sheet = SheetCopy(filename)
+    sizes = PrefixSizes(sheet, target_bytes=target_bytes - SIZE_MARGIN)
+    print(f"Read {sizes.rows:,} data rows")
+
+    tmp_filename = filename + ".tmp"
+    budget = target_bytes - SIZE_MARGIN
+    writes = 0
+    while True:
+        count = sizes.largest_fitting(budget)
+        size = sheet.save(tmp_filename, count)
+        writes += 1
+        print(f"Wrote {count:,} data rows, Size: {size / MB:.2f}MB")
+        if size <= target_bytes or count == 0 or writes >= max_writes:
+            break
+        # The prediction missed (unusual cell types); shrink the budget by the miss and retry
+        budget -= size - target_bytes
+
+    backup_filename = None
+    if backup:
+        backup_filename = backup_path(filename)
+        os.replace(filename, backup_filename)
+        print(f"Moved original to backup: {backup_filename}")
+    os.replace(tmp_filename, filename)
+    return TruncateResult(original_size, size, sizes.rows + 1, count + 1, writes, backup_filename)
+
+
+def print_report(result: TruncateResult, target_size_mb: float, title: str, filename: str):
+    original_size_mb = result.original_size / MB
+    final_size_mb = result.final_size / MB
+    target_bytes = int(target_size_mb * MB)
+    print(f"\n" + "=" * 50)
+    print(title)
+    print(f"Original size: {original_size_mb:.2f}MB")
+    print(f"Final size: {final_size_mb:.2f}MB ({result.final_size:,} bytes, target {target_bytes:,})")
+    print(f"Size reduction: {original_size_mb - final_size_mb:.2f}MB")
+    print(f"Original rows: {result.original_rows}")
+    print(f"Final rows: {result.final_rows}")
+    print(f"Rows removed: {result.original_rows - result.final_rows}")
+    print(f"Writes: {result.writes}")
+    print(f"Target achieved: {'Yes' if result.final_size <= target_bytes else 'No'}")
+    print(f"File: {filename}")
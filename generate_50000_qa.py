@@ -2,90 +2,150 @@
 # -*- coding: utf-8 -*-
 
 from chinese_qa_generator import ChineseQAGenerator
+from question_space import QuestionSpaceExhausted
+from qa_checkpoint import DEFAULT_CHECKPOINT_EVERY, CheckpointedRun
+from sidecar_index import SidecarIndex
+import argparse
 import os
 import time
 
-def generate_50000_qa(filename: str = "chinese_qa_50000.xlsx", batch_size: int = 1000):
-    """Generate exactly 50,000 unique Q&A pairs with progress tracking."""
+def generate_50000_qa(filename: str = "chinese_qa_50000.xlsx", batch_size: int = 1000, workers: int = 1, seed: int = None,
+                      metrics_file: str = None, checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY, resume: bool = False,
+                      exhausted_policy: str = "suffix"):
+    """Generate exactly 50,000 unique Q&A pairs with progress tracking.
+
+    The run is checkpointed every `checkpoint_every` batches (0 disables it), and `resume`
+    continues an interrupted run from its last checkpoint (see qa_checkpoint).
+
+    `exhausted_policy` is passed to ChineseQAGenerator: the default "suffix" lets an append go past
+    the unique question space with numbered duplicates, "error" stops before writing anything.
+    """
+    checkpointing = checkpoint_every > 0 or resume
     
     total_count = 50000
     print(f"Starting generation of {total_count} unique Q&A pairs...")
     print(f"Target file: {filename}")
     print(f"Batch size: {batch_size}")
+    print(f"Workers: {workers}")
+    if metrics_file:
+        print(f"Metrics file: {metrics_file}")
+    if checkpointing:
+        print(f"Checkpoint every {checkpoint_every} batches")
     print("=" * 60)
     
-    generator = ChineseQAGenerator()
+    generator = ChineseQAGenerator(exhausted_policy=exhausted_policy, workers=workers, seed=seed)
+    run = CheckpointedRun(filename, {"total_count": total_count, "batch_size": batch_size, "seed": seed,
+                                     "workers": workers, "exhausted_policy": exhausted_policy}, checkpoint_every)
+    if resume and run.resume(generator):
+        if run.finalized:
+            print(f"The interrupted run had already saved '{filename}'; nothing left to do.")
+            run.finish()
+            return run.rows_committed
+        print(f"Resuming from checkpoint: {run.rows_committed}/{total_count} Q&A pairs already written.")
+    elif resume:
+        print("No checkpoint found; starting a new run.")
+    generator.check_capacity(total_count - run.rows_committed)
     
     # Check if file exists
     file_exists = os.path.exists(filename)
-    if file_exists:
+    if file_exists and not run.resumed:
         print(f"Found existing file '{filename}'. Will append new Q&A pairs.")
-        # Load existing questions to avoid duplicates
-        existing_questions = generator.load_existing_questions(filename)
-        generator.used_questions.update(existing_questions)
-        print(f"Loaded {len(existing_questions)} existing questions to avoid duplicates.")
-    else:
+    elif not file_exists:
         print(f"Creating new file '{filename}'.")
     
-    total_generated = 0
-    batch_num = 1
+    resumed_from = total_generated = run.rows_committed
+    batch_num = run.batches + 1
     start_time = time.time()
     
-    while total_generated < total_count:
-        current_batch_size = min(batch_size, total_count - total_generated)
-        
-        print(f"\n--- Batch {batch_num} ---")
-        print(f"Generating {current_batch_size} Q&A pairs...")
-        
-        batch_start_time = time.time()
-        
-        # Generate batch
-        qa_pairs = generator.generate_qa_pairs(current_batch_size)
-        
-        # Write to Excel
-        if batch_num == 1 and not file_exists:
-            generator.write_to_excel(qa_pairs, filename, append=False)
-        else:
-            generator.write_to_excel(qa_pairs, filename, append=True)
-        
-        batch_time = time.time() - batch_start_time
-        total_generated += len(qa_pairs)
-        
-        print(f"Batch {batch_num} completed in {batch_time:.2f} seconds")
-        print(f"Generated: {len(qa_pairs)} Q&A pairs")
-        print(f"Total progress: {total_generated}/{total_count} ({total_generated/total_count*100:.1f}%)")
-        
-        # Progress statistics
-        elapsed_time = time.time() - start_time
-        avg_time_per_qa = elapsed_time / total_generated
-        remaining_qa = total_count - total_generated
-        estimated_remaining_time = remaining_qa * avg_time_per_qa
-        
-        print(f"Average time per Q&A: {avg_time_per_qa:.3f} seconds")
-        print(f"Estimated remaining time: {estimated_remaining_time/60:.1f} minutes")
-        
-        batch_num += 1
+    # Checked again once the questions already in an appended file are known
+    writer = generator.open_writer(filename, append=file_exists, journal=checkpointing, state=run.session_state,
+                                   count=total_count - run.rows_committed)
+    print(f"Unique questions available: {generator.remaining_questions():,}")
+    
+    with writer:
+        if checkpointing:
+            run.begin(generator, writer)
+        while total_generated < total_count:
+            current_batch_size = min(batch_size, total_count - total_generated)
+            
+            print(f"\n--- Batch {batch_num} ---")
+            print(f"Generating {current_batch_size} Q&A pairs...")
+            
+            batch_start_time = time.time()
+            
+            # Generate batch
+            qa_pairs = generator.generate_qa_pairs(current_batch_size)
+            
+            # Stream batch into the open workbook
+            written = writer.write_batch(qa_pairs)
+            
+            batch_time = time.time() - batch_start_time
+            total_generated += written
+            
+            print(f"Batch {batch_num} completed in {batch_time:.2f} seconds")
+            print(f"Generated: {written} Q&A pairs")
+            print(f"Total progress: {total_generated}/{total_count} ({total_generated/total_count*100:.1f}%)")
+            
+            if checkpointing and run.after_batch(generator, writer, written):
+                print(f"Checkpoint saved at {total_generated} Q&A pairs")
+            
+            # Progress statistics
+            elapsed_time = time.time() - start_time
+            avg_time_per_qa = elapsed_time / max(total_generated - resumed_from, 1)
+            remaining_qa = total_count - total_generated
+            estimated_remaining_time = remaining_qa * avg_time_per_qa
+            
+            print(f"Average time per Q&A: {avg_time_per_qa:.3f} seconds")
+            print(f"Estimated remaining time: {estimated_remaining_time/60:.1f} minutes")
+            
+            if metrics_file:
+                generator.metrics.export(metrics_file)
+            
+            batch_num += 1
+    
+    run.finish()
+    generator.close()
+    if metrics_file:
+        generator.metrics.export(metrics_file)
     
     total_time = time.time() - start_time
     print(f"\n" + "=" * 60)
     print(f"GENERATION COMPLETED!")
     print(f"Total Q&A pairs generated: {total_generated}")
     print(f"Total time: {total_time/60:.1f} minutes")
-    print(f"Average time per Q&A: {total_time/total_generated:.3f} seconds")
+    print(f"Average time per Q&A: {total_time/max(total_generated - resumed_from, 1):.3f} seconds")
     print(f"File saved as: {filename}")
     
     # Verify uniqueness
     print(f"\nVerifying uniqueness...")
-    generator.load_existing_questions(filename)
-    print(f"Total unique questions in file: {len(generator.used_questions)}")
+    existing = generator.load_existing_questions(filename)
+    print(f"Total unique questions in file: {len(existing)}")
+    if isinstance(existing, SidecarIndex):
+        existing.close()
     
     return total_generated
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate Chinese Q&A pairs in batches.")
+    parser.add_argument("--workers", type=int, default=1, help="number of generator processes (default: 1)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible output")
+    parser.add_argument("--metrics", default=None, metavar="FILE",
+                        help="export stage metrics after every batch (JSON lines, or Prometheus text for *.prom)")
+    parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY, metavar="N",
+                        help=f"checkpoint every N batches, 0 to disable (default: {DEFAULT_CHECKPOINT_EVERY})")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run from its last checkpoint")
+    parser.add_argument("--exhausted-policy", choices=ChineseQAGenerator.EXHAUSTED_POLICIES, default="suffix",
+                        help="once the unique questions run out: suffix adds numbered duplicates, error stops "
+                             "before writing (default: suffix)")
+    return parser.parse_args()
+
 def main():
     """Main function for 50,000 Q&A generation."""
     print("50,000 Chinese Q&A Generator")
     print("=" * 60)
     
+    args = parse_args()
+    
     # Configuration
     filename = "chinese_qa_50000.xlsx"
     batch_size = 1000  # Process in batches of 1000
@@ -94,14 +154,25 @@ def main():
     print(f"- Target file: {filename}")
     print(f"- Total Q&A pairs: 50,000")
     print(f"- Batch size: {batch_size}")
+    print(f"- Workers: {args.workers}")
     print(f"- Estimated batches: {50000 // batch_size + (1 if 50000 % batch_size else 0)}")
     print(f"- Question templates available: 49")
     print(f"- Topic categories: 8")
     print(f"- Total topics available: 125")
     print(f"- Answer patterns available: 23")
+    print(f"- Unique questions available: {len(ChineseQAGenerator().question_space):,}")
     
     # Start generation
-    generate_50000_qa(filename, batch_size)
+    try:
+        generate_50000_qa(filename, batch_size, args.workers, args.seed, args.metrics, args.checkpoint_every, args.resume,
+                          args.exhausted_policy)
+    except QuestionSpaceExhausted as e:
+        print(f"Error: {e}")
+    except KeyboardInterrupt:
+        if args.checkpoint_every <= 0:
+            print(f"\nInterrupted. The Q&A pairs written so far were saved to '{filename}'.")
+        else:
+            print(f"\nInterrupted. Run again with --resume to continue from the last checkpoint.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch sampling of random message rows for the size-targeted message files.
+
+Every random choice for a batch of rows is drawn as one NumPy array per column, and strings are
+assembled from object arrays of the vocabulary and from precomputed ID, date and time tables.
+The distributions match the row-at-a-time generators: a uniform pattern with uniform words,
+an optional suffix with probability 0.5, and uniform IDs, timestamps and column values.
+"""
+
+from functools import lru_cache
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+MESSAGE_TYPES = ["信息", "警告", "错误", "成功", "提示"]
+PRIORITIES = ["高", "中", "低"]
+SOURCES = ["系统", "用户", "应用", "服务", "数据库"]
+STATUSES = ["活跃", "待处理", "已完成", "已取消", "暂停"]
+
+
+class MessagePattern(NamedTuple):
+    """A message template and, per placeholder, the words it draws from."""
+    template: str
+    slots: Tuple[Sequence[str], ...]
+
+
+@lru_cache(maxsize=None)
+def _id_table() -> np.ndarray:
+    # MSG_10000 .. MSG_99999, as randint(10000, 99999) draws them
+    return np.array([f"MSG_{number}" for number in range(10000, 100000)], dtype=object)
+
+
+@lru_cache(maxsize=None)
+def _date_table() -> np.ndarray:
+    return np.array([f"2024-{month:02d}-{day:02d} " for month in range(1, 13) for day in range(1, 29)], dtype=object)
+
+
+@lru_cache(maxsize=None)
+def _time_table() -> np.ndarray:
+    return np.array([f"{hour:02d}:{minute:02d}:{second:02d}"
+                     for hour in range(24) for minute in range(60) for second in range(60)], dtype=object)
+
+
+def _choose(np_rng: np.random.Generator, values: Sequence[str], count: int) -> np.ndarray:
+    return np.asarray(values, dtype=object)[np_rng.integers(len(values), size=count)]
+
+
+def render_patterns(np_rng: np.random.Generator, patterns: Sequence[MessagePattern], count: int) -> np.ndarray:
+    """`count` strings, each from a uniformly chosen pattern filled with uniformly chosen words."""
+    pattern_ids = np_rng.integers(len(patterns), size=count)
+    messages = np.empty(count, dtype=object)
+    for pattern_id in np.unique(pattern_ids).tolist():
+        pattern = patterns[pattern_id]
+        rows = np.flatnonzero(pattern_ids == pattern_id)
+        columns = [_choose(np_rng, words, len(rows)) for words in pattern.slots]
+        messages[rows] = list(map(pattern.template.format, *columns))
+    return messages
+
+
+def sample_message_rows(np_rng: np.random.Generator, count: int, patterns: Sequence[MessagePattern],
+                        suffixes: Sequence[MessagePattern], suffix_probability: float = 0.5) -> List[tuple]:
+    """`count` rows of (ID, message, type, timestamp, priority, source, status)."""
+    messages = render_patterns(np_rng, patterns, count)
+    with_suffix = np.flatnonzero(np_rng.random(count) < suffix_probability)
+    messages[with_suffix] += render_patterns(np_rng, suffixes, len(with_suffix))
+    messages += "。"
+
+    ids = _id_table()[np_rng.integers(90000, size=count)]
+    timestamps = _date_table()[np_rng.integers(12 * 28, size=count)] + _time_table()[np_rng.integers(86400, size=count)]
+    columns = (ids, messages, _choose(np_rng, MESSAGE_TYPES, count), timestamps, _choose(np_rng, PRIORITIES, count),
+               _choose(np_rng, SOURCES, count), _choose(np_rng, STATUSES, count))
+    return list(zip(*(column.tolist() for column in columns)))
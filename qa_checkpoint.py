@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Checkpoints for long-running batch generation.
+
+A checkpointed run writes through a journaled WriterSession and, every few batches, pickles
+the generator's sampling state, the session's dedup index and counters, the rows committed and
+the byte offset of the output (or its journal) to `name.ckpt`, via a temporary file that is
+renamed in. Resuming restores that state and truncates the output back to the offset, so rows
+already written are neither regenerated nor rescanned; rows written after the last checkpoint
+are generated again, identically. A resumed run writes the same rows as an uninterrupted one
+with the same batch size.
+
+Usage:
+    run = CheckpointedRun(filename, {"total_count": 100000, "batch_size": 1000})
+    if resume:
+        run.resume(generator)
+    with generator.open_writer(filename, append, journal=True, state=run.session_state) as writer:
+        run.begin(generator, writer)
+        while run.rows_committed < 100000:
+            run.after_batch(generator, writer, writer.write_batch(generator.generate_qa_pairs(1000)))
+    run.finish()
+"""
+
+import os
+import pickle
+from typing import Optional
+
+from reproducible import replace_file
+
+CHECKPOINT_SUFFIX = ".ckpt"
+DEFAULT_CHECKPOINT_EVERY = 10
+_VERSION = 1
+
+
+def checkpoint_path(filename: str) -> str:
+    return filename + CHECKPOINT_SUFFIX
+
+
+def _file_signature(filename: str) -> Optional[tuple]:
+    if not os.path.exists(filename):
+        return None
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class CheckpointedRun:
+    """
+    Checkpoints of one batch loop writing `filename`, taken every `every` batches.
+
+    `job` holds the run's settings (total count, batch size, seed, workers...); a checkpoint is
+    only resumed by a run with the same settings.
+    """
+
+    def __init__(self, filename: str, job: dict, every: int = DEFAULT_CHECKPOINT_EVERY):
+        self.filename = filename
+        self.path = checkpoint_path(filename)
+        self.job = dict(job)
+        self.every = every
+        self.rows_committed = 0
+        self.batches = 0
+        self.state = None
+        # Rewritten formats leave the output untouched until it is replaced on close
+        self._signature = _file_signature(filename)
+
+    def resume(self, generator) -> bool:
+        """Restore `generator` from the checkpoint of an interrupted run; False if there is none."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as f:
+            state = pickle.load(f)
+        if state["version"] != _VERSION or state["job"] != self.job:
+            raise ValueError(f"{self.path} was written for {state['job']}, not {self.job}; "
+                             f"delete it to start over")
+        self.state = state
+        self.rows_committed = state["rows_committed"]
+        self.batches = state["batches"]
+        self._signature = state["signature"]
+        generator.set_state(state["generator"])
+        return True
+
+    @property
+    def resumed(self) -> bool:
+        return self.state is not None
+
+    @property
+    def session_state(self) -> Optional[dict]:
+        """The WriterSession state to reopen the output with, or None when starting fresh."""
+        return self.state["session"] if self.state is not None else None
+
+    @property
+    def finalized(self) -> bool:
+        """Whether the interrupted run had already replaced its output before removing the checkpoint."""
+        return (self.state is not None and not self.state["session"]["in_place"]
+                and _file_signature(self.filename) != self._signature)
+
+    def save(self, generator, session):
+        state = {
+            "version": _VERSION,
+            "job": self.job,
+            "rows_committed": self.rows_committed,
+            "batches": self.batches,
+            "signature": self._signature,
+            "generator": generator.get_state(),
+            "session": session.get_state(),
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        replace_file(tmp_path, self.path)
+
+    def begin(self, generator, session):
+        """Checkpoint the starting point of a fresh run, so an early interruption resumes too."""
+        if not self.resumed:
+            self.save(generator, session)
+
+    def after_batch(self, generator, session, written: int) -> bool:
+        """Count a written batch and checkpoint every `every` batches; returns whether it did."""
+        self.rows_committed += written
+        self.batches += 1
+        if self.every and self.batches % self.every == 0:
+            self.save(generator, session)
+            return True
+        return False
+
+    def finish(self):
+        """Remove the checkpoint once the output has been finalized."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Merge Q&A outputs (partial runs, per-worker shards, rolling files) into one file.
+
+Each input is an xlsx, CSV, JSONL or Parquet file, or the manifest of rolling output. Inputs are
+read in batches (xlsx in read-only mode) and written through a WriterSession, so memory holds one
+batch plus the dedup index however large the inputs are. The first occurrence of a question wins,
+in input order; later copies are dropped and counted against the source they came from. Every row
+costs one index lookup, so a merge runs in time linear in the total rows.
+
+The default "fingerprint" index keeps about 9 bytes per question (see dedup_index).
+"""
+
+import argparse
+import os
+from typing import Iterator, List, NamedTuple, Optional
+
+from dedup_index import DEDUP_BACKENDS
+from qa_metrics import Metrics
+from qa_rolling import MANIFEST_SUFFIX, iter_rolling_rows
+from qa_sinks import HEADERS, SINK_FORMATS, WriterSession, output_format
+from xlsx_writer import XLSX_ENGINES
+
+
+class MergeSource(NamedTuple):
+    """What one input contributed to a merge."""
+    path: str
+    rows: int
+    written: int
+    duplicates: int
+    blank: int
+
+
+def iter_source_rows(path: str, batch_size: int = 1000) -> Iterator[List[tuple]]:
+    """Yield the data rows of an output file or rolling manifest in batches of full-width tuples."""
+    if path.endswith(MANIFEST_SUFFIX):
+        batches = iter_rolling_rows(path, batch_size)
+    else:
+        batches = SINK_FORMATS[output_format(path)].read_rows(path, batch_size)
+    width = len(HEADERS)
+    for batch in batches:
+        # CSV rows may be ragged and xlsx rows are cut at the last filled cell
+        yield [row if len(row) == width else (tuple(row) + (None,) * width)[:width] for row in batch]
+
+
+def merge_outputs(inputs: List[str], output: str, format: Optional[str] = None, append: bool = False,
+                  dedup_backend: str = "fingerprint", engine: str = "openpyxl", workers: int = 1,
+                  deterministic: bool = False, sidecar: bool = True, batch_size: int = 1000,
+                  metrics: Optional[Metrics] = None) -> List[MergeSource]:
+    """
+    Stream the rows of `inputs` into `output`, skipping questions already written.
+
+    With append=True an existing `output` is kept and its questions count as already written.
+    Rows without a question are dropped. Returns one MergeSource per input, in order.
+    """
+    target = os.path.abspath(output)
+    if any(os.path.abspath(path) == target for path in inputs):
+        raise ValueError(f"{output} cannot be both an input and the output of a merge")
+    missing = [path for path in inputs if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"merge inputs not found: {', '.join(missing)}")
+
+    metrics = metrics if metrics is not None else Metrics()
+    sources = []
+    with WriterSession(output, append=append, deterministic=deterministic, dedup_backend=dedup_backend,
+                       sidecar=sidecar, format=format, metrics=metrics, engine=engine, workers=workers) as session:
+        for path in inputs:
+            rows = written = blank = 0
+            with metrics.stage("merge_read"):
+                for batch in iter_source_rows(path, batch_size):
+                    rows += len(batch)
+                    kept = [row for row in batch if row[0] and str(row[0]).strip()]
+                    blank += len(batch) - len(kept)
+                    written += session.write_values(kept)
+            metrics.incr("rows_read", rows)
+            sources.append(MergeSource(path, rows, written, rows - written - blank, blank))
+    return sources
+
+
+def print_report(sources: List[MergeSource], output: str):
+    width = max(len(source.path) for source in sources)
+    print(f"{'Source':<{width}}  {'Rows':>10}  {'Written':>10}  {'Duplicates':>10}  {'Blank':>6}")
+    for source in sources:
+        print(f"{source.path:<{width}}  {source.rows:>10,}  {source.written:>10,}  "
+              f"{source.duplicates:>10,}  {source.blank:>6,}")
+    total_rows = sum(source.rows for source in sources)
+    total_written = sum(source.written for source in sources)
+    total_duplicates = sum(source.duplicates for source in sources)
+    print(f"{'Total':<{width}}  {total_rows:>10,}  {total_written:>10,}  "
+          f"{total_duplicates:>10,}  {sum(source.blank for source in sources):>6,}")
+    print(f"Merged into: {output}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Merge Q&A files into one, dropping repeated questions.")
+    parser.add_argument("inputs", nargs="+", metavar="INPUT",
+                        help="xlsx, CSV, JSONL or Parquet files, or rolling output manifests (*.manifest.json)")
+    parser.add_argument("-o", "--output", required=True, help="merged file; its extension picks the format")
+    parser.add_argument("--append", action="store_true", help="keep the rows already in the output")
+    parser.add_argument("--dedup-backend", choices=DEDUP_BACKENDS, default="fingerprint",
+                        help="question index: fingerprint (about 9 bytes per question) or set (default: fingerprint)")
+    parser.add_argument("--engine", choices=XLSX_ENGINES, default="openpyxl",
+                        help="xlsx writer for xlsx output (default: openpyxl)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="render processes for xlsx output with --engine native (default: 1)")
+    parser.add_argument("--metrics", default=None, metavar="FILE",
+                        help="export merge metrics when done (JSON lines, or Prometheus text for *.prom)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    metrics = Metrics()
+    try:
+        sources = merge_outputs(args.inputs, args.output, append=args.append, dedup_backend=args.dedup_backend,
+                                engine=args.engine, workers=args.workers, metrics=metrics)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        return
+    print_report(sources, args.output)
+    if args.metrics:
+        metrics.export(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
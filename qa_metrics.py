@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stage timers and counters for generation runs.
+
+Hot paths record with `add_time` and `incr`, coarse stages with `with metrics.stage(name):`.
+A run's metrics can be read with `snapshot()` or exported as a JSON line or in the Prometheus
+text format (for the node_exporter textfile collector), e.g. after every batch of a long run.
+Updates and reads take a lock, so a pipelined run can export from its writer thread while the
+producer thread keeps recording.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+
+class Metrics:
+    def __init__(self, prefix: str = "qa"):
+        self.prefix = prefix
+        self.counters = defaultdict(int)
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1):
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+            self.stage_calls[stage] += calls
+
+    @contextmanager
+    def stage(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - start)
+
+    def _copy(self):
+        """Consistent copies of the counters, stage seconds and stage calls."""
+        with self._lock:
+            return dict(self.counters), dict(self.stage_seconds), dict(self.stage_calls)
+
+    def merge(self, other: "Metrics"):
+        """Add the counters and stage times of `other`, e.g. from work done on another thread."""
+        counters, stage_seconds, stage_calls = other._copy()
+        with self._lock:
+            for name, value in counters.items():
+                self.counters[name] += value
+            for stage, seconds in stage_seconds.items():
+                self.stage_seconds[stage] += seconds
+                self.stage_calls[stage] += stage_calls[stage]
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.stage_seconds.clear()
+            self.stage_calls.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        counters, stage_seconds, stage_calls = self._copy()
+        return {
+            "timestamp": round(time.time(), 3),
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "counters": counters,
+            "stages": {stage: {"calls": stage_calls[stage], "seconds": round(seconds, 6)}
+                       for stage, seconds in stage_seconds.items()},
+        }
+
+    def to_json_line(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        p = self.prefix
+        counters, stage_seconds, stage_calls = self._copy()
+        lines = []
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {value}")
+        if stage_seconds:
+            lines.append(f"# HELP {p}_stage_seconds_total Time spent in each stage.")
+            lines.append(f"# TYPE {p}_stage_seconds_total counter")
+            lines.extend(f'{p}_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}'
+                         for stage, seconds in sorted(stage_seconds.items()))
+            lines.append(f"# TYPE {p}_stage_calls_total counter")
+            lines.extend(f'{p}_stage_calls_total{{stage="{stage}"}} {calls}'
+                         for stage, calls in sorted(stage_calls.items()))
+        lines.append(f"# TYPE {p}_uptime_seconds gauge")
+        lines.append(f"{p}_uptime_seconds {time.time() - self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """Append a JSON line to `path`, or replace it with Prometheus text if it ends in .prom."""
+        if path.endswith(".prom"):
+            # Write then rename so a scraper never reads a half-written file
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        else:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(self.to_json_line() + "\n")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sharded Q&A generation across worker processes.
+The question space is split into disjoint shards, one per worker, so workers never need to
+exchange dedup state. Each shard has its own seed, so a (seed, workers) pair is reproducible.
+"""
+
+from collections.abc import Mapping
+from typing import List, Dict
+
+from question_space import QuestionSpace, QuestionSampler, QuestionSpaceExhausted
+from dedup_index import make_dedup_index
+from reproducible import child_rng
+from qa_vocabulary import DEFAULT_VOCABULARY
+
+# Generator attributes copied into each worker so customised vocabularies carry over
+CONFIG_ATTRIBUTES = tuple(DEFAULT_VOCABULARY)
+
+_worker_generator = None
+_worker_space = None
+
+
+def _init_worker(config: dict, exhausted_policy: str, dedup_backend: str):
+    global _worker_generator, _worker_space
+    from chinese_qa_generator import ChineseQAGenerator
+
+    generator = ChineseQAGenerator(exhausted_policy=exhausted_policy, dedup_backend=dedup_backend)
+    for name, value in config.items():
+        setattr(generator, name, value)
+    generator.compile_answer_plans()
+    _worker_generator = generator
+    _worker_space = QuestionSpace(generator.question_templates, generator.all_topics)
+
+
+def _generate_shard(task: tuple):
+    """Generate `count` pairs from one shard, starting from and returning the shard's state."""
+    shard, shards, key, sampler_state, rng_state, count = task
+    generator = _worker_generator
+
+    sampler = QuestionSampler(_worker_space, key, shard, shards)
+    sampler.set_state(sampler_state)
+    generator._sampler = sampler
+    # Shards are disjoint, so the worker only needs to dedup within this task
+    generator.used_questions = make_dedup_index(generator.dedup_backend)
+    generator.rng.setstate(rng_state)
+
+    qa_pairs = generator.generate_qa_pairs(count) if count else []
+    return qa_pairs, sampler.get_state(), generator.rng.getstate()
+
+
+class ShardedGeneration:
+    """Holds per-shard sampler and RNG state in the parent and farms batches out to a process pool."""
+
+    def __init__(self, generator, workers: int, seed: int):
+        self.workers = workers
+        self.seed = seed
+        self.exhausted_policy = generator.exhausted_policy
+        self.dedup_backend = generator.dedup_backend
+        self.key = child_rng(seed, "key").getrandbits(64)
+
+        space = QuestionSpace(generator.question_templates, generator.all_topics)
+        self.sampler_states = [QuestionSampler(space, self.key, shard, workers).get_state()
+                               for shard in range(workers)]
+        self.rng_states = [child_rng(seed, "shard", shard).getstate() for shard in range(workers)]
+        # Workers start with the shared default tables, so only customised ones are sent over
+        self._config = {}
+        for name in CONFIG_ATTRIBUTES:
+            value = getattr(generator, name)
+            if value is not DEFAULT_VOCABULARY[name]:
+                self._config[name] = dict(value) if isinstance(value, Mapping) else value
+        self._pool = None
+
+    @property
+    def remaining(self) -> int:
+        return sum(state[2] for state in self.sampler_states)
+
+    def get_state(self) -> tuple:
+        return self.key, tuple(self.sampler_states), tuple(self.rng_states)
+
+    def set_state(self, state: tuple):
+        self.key, sampler_states, rng_states = state
+        self.sampler_states = list(sampler_states)
+        self.rng_states = list(rng_states)
+
+    def split(self, count: int) -> List[int]:
+        """Spread `count` evenly over shards, spilling past any shard that runs out of questions."""
+        remaining = [state[2] for state in self.sampler_states]
+        counts = [0] * self.workers
+        left = count
+        while left:
+            open_shards = [shard for shard in range(self.workers) if counts[shard] < remaining[shard]]
+            if not open_shards:
+                break
+            share, extra = divmod(left, len(open_shards))
+            for i, shard in enumerate(open_shards):
+                take = min(share + (1 if i < extra else 0), remaining[shard] - counts[shard])
+                counts[shard] += take
+                left -= take
+
+        if left:
+            if self.exhausted_policy == "error":
+                raise QuestionSpaceExhausted(
+                    f"Requested {count} unique questions but only {self.remaining} remain")
+            # Shard 0 falls back to suffixed questions for the overflow
+            counts[0] += left
+        return counts
+
+    def generate(self, count: int) -> List[Dict[str, str]]:
+        counts = self.split(count)
+        if self._pool is None:
+            import multiprocessing
+            self._pool = multiprocessing.Pool(self.workers, _init_worker, (self._config, self.exhausted_policy, self.dedup_backend))
+
+        tasks = [(shard, self.workers, self.key, self.sampler_states[shard], self.rng_states[shard], counts[shard])
+                 for shard in range(self.workers)]
+        qa_pairs = []
+        for shard, (shard_pairs, sampler_state, rng_state) in enumerate(self._pool.map(_generate_shard, tasks, chunksize=1)):
+            self.sampler_states[shard] = sampler_state
+            self.rng_states[shard] = rng_state
+            qa_pairs.extend(shard_pairs)
+        return qa_pairs
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pipelined generation: the calling thread generates batches while a writer thread writes them.
+
+Batches pass through a bounded queue, so a slow sink blocks the producer instead of letting
+generated rows pile up in memory. With workers > 1 the producer mostly waits on the process
+pool, which lets the writer run while the next batch is generated.
+
+If the producer fails or is interrupted (Ctrl-C), the batches already queued are still written
+before the writer stops, so the session closing afterwards finalizes a valid file. A second
+Ctrl-C while draining drops the queued batches. If the writer fails, the producer stops and the
+writer's exception is raised in the calling thread.
+"""
+
+import threading
+from queue import Full, Queue
+from time import perf_counter
+from typing import Callable, Iterable, List, Optional
+
+from qa_metrics import Metrics
+
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+class _WriterThread(threading.Thread):
+    def __init__(self, queue: Queue, write_batch: Callable[[list], int],
+                 on_written: Optional[Callable[[int, int], None]], metrics: Metrics):
+        super().__init__(name="qa-writer", daemon=True)
+        self.queue = queue
+        self.write_batch = write_batch
+        self.on_written = on_written
+        self.metrics = metrics
+        self.abort = threading.Event()
+        self.written = 0
+        self.error = None
+
+    def run(self):
+        try:
+            while True:
+                start = perf_counter()
+                batch = self.queue.get()
+                self.metrics.add_time("writer_wait", perf_counter() - start)
+                if batch is _DONE or self.abort.is_set():
+                    return
+                written = self.write_batch(batch)
+                self.written += written
+                if self.on_written is not None:
+                    self.on_written(len(batch), written)
+        except BaseException as e:
+            self.error = e
+
+
+def _put(queue: Queue, item, writer: _WriterThread) -> bool:
+    """Block until `item` is queued; False if the writer has stopped and never will take it."""
+    while True:
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            if not writer.is_alive():
+                return False
+
+
+def _finish(queue: Queue, writer: _WriterThread):
+    """Let the writer drain the queue and stop; Ctrl-C while waiting drops what is left."""
+    while writer.is_alive():
+        try:
+            _put(queue, _DONE, writer)
+            writer.join()
+        except KeyboardInterrupt:
+            writer.abort.set()
+
+
+def run_pipeline(batches: Iterable[List], write_batch: Callable[[list], int],
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 on_written: Optional[Callable[[int, int], None]] = None,
+                 metrics: Optional[Metrics] = None) -> int:
+    """
+    Write every batch of `batches` with `write_batch` on a writer thread; returns the rows written.
+
+    At most `queue_size` batches wait in the queue. `on_written(batch_length, written)` runs on
+    the writer thread after each batch. Time the producer spends blocked on a full queue is
+    recorded as the `queue_wait` stage, the writer's idle time as `writer_wait`.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    queue = Queue(maxsize=max(queue_size, 1))
+    writer = _WriterThread(queue, write_batch, on_written, metrics)
+    writer.start()
+    try:
+        for batch in batches:
+            if not writer.is_alive():
+                break
+            if not batch:
+                continue
+            start = perf_counter()
+            queued = _put(queue, batch, writer)
+            metrics.add_time("queue_wait", perf_counter() - start)
+            if not queued:
+                break
+    finally:
+        _finish(queue, writer)
+
+    if writer.error is not None:
+        raise writer.error
+    return writer.written
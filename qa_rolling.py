@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rolling output: one dataset split over numbered files (name_0001.xlsx, name_0002.xlsx, ...).
+
+A new file is started once the current one holds `max_rows` rows or about `max_bytes` bytes of
+cell text (UTF-8, before compression, so compressed formats come out smaller). Within a file,
+xlsx rows still continue on a new sheet at Excel's sheet limit. A finished file is finalized
+(saved, renamed into place and indexed) on a background thread while the next one fills, with
+up to `parallel` files finalizing at once.
+
+`name.manifest.json` lists every file with its global row range (1-based, inclusive), its
+sheets, its size and its sidecar question index, and is rewritten as each file is finalized.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from dedup_index import make_dedup_index
+from reproducible import replace_file
+from sidecar_index import sidecar_path
+from qa_metrics import Metrics
+from qa_pipeline import DEFAULT_QUEUE_SIZE, run_pipeline
+from qa_sinks import SINK_FORMATS, WriterSession, batched, output_format, qa_row
+
+MANIFEST_SUFFIX = ".manifest.json"
+DEFAULT_PARALLEL = 2
+
+
+def shard_filename(filename: str, number: int) -> str:
+    """name.xlsx -> name_0001.xlsx for number 1."""
+    root, ext = os.path.splitext(filename)
+    return f"{root}_{number:04d}{ext}"
+
+
+def manifest_path(filename: str) -> str:
+    return os.path.splitext(filename)[0] + MANIFEST_SUFFIX
+
+
+def read_manifest(filename: str) -> dict:
+    """The manifest of rolling output written as `filename` (or the manifest path itself)."""
+    path = filename if filename.endswith(MANIFEST_SUFFIX) else manifest_path(filename)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_rolling_rows(filename: str, batch_size: int = 1000) -> Iterator[List[tuple]]:
+    """Yield the data rows of every file listed in the manifest, in row order."""
+    manifest = read_manifest(filename)
+    directory = os.path.dirname(manifest_path(filename))
+    read_rows = SINK_FORMATS[manifest["format"]].read_rows
+    for shard in manifest["files"]:
+        yield from read_rows(os.path.join(directory, shard["file"]), batch_size)
+
+
+def _row_bytes(row: tuple) -> int:
+    return sum(len(value.encode("utf-8")) for value in row if value)
+
+
+class RollingWriter:
+    """
+    Writer over numbered output files with the WriterSession interface (write_batch,
+    write_stream, write_pipelined, close). Questions are deduplicated across all files.
+    Existing files with the same names are overwritten.
+    """
+
+    def __init__(self, filename: str, max_rows: Optional[int] = None, max_bytes: Optional[int] = None,
+                 deterministic: bool = False, dedup_backend: str = "set", sidecar: bool = True,
+                 format: Optional[str] = None, metrics: Optional[Metrics] = None, parallel: int = DEFAULT_PARALLEL,
+                 engine: str = "openpyxl"):
+        if not max_rows and not max_bytes:
+            raise ValueError("rolling output needs max_rows or max_bytes")
+        self.filename = filename
+        self.format = output_format(filename, format)
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.deterministic = deterministic
+        self.engine = engine
+        self.dedup_backend = dedup_backend
+        self.sidecar = sidecar
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.manifest_path = manifest_path(filename)
+        self.questions = make_dedup_index(dedup_backend)
+        self.files = []
+        self.rows_written = 0
+        self.skipped = 0
+        self.closed = False
+        self._executor = ThreadPoolExecutor(max(parallel, 1), thread_name_prefix="qa-finalize")
+        self._parallel = max(parallel, 1)
+        self._pending = []
+        self._session = None
+        self._entry = None
+        self._bytes = 0
+        self._opened = 0
+
+    def _open_next(self):
+        self._opened += 1
+        shard = shard_filename(self.filename, self._opened)
+        # Each file keeps its own metrics, merged once it is finalized, since finalizing runs on another thread
+        self._session = WriterSession(shard, deterministic=self.deterministic, dedup_backend=self.dedup_backend,
+                                      sidecar=self.sidecar, format=self.format, metrics=Metrics(), engine=self.engine)
+        self._entry = {"file": os.path.basename(shard), "rows": [self.rows_written + 1, self.rows_written]}
+        self._bytes = 0
+
+    def _room(self, rows: List[tuple], start: int):
+        """How many of rows[start:] fit into the current file, and their bytes of cell text."""
+        end = len(rows)
+        if self.max_rows:
+            end = min(end, start + self.max_rows - self._session.rows_written)
+        size = 0
+        if self.max_bytes:
+            for i in range(start, end):
+                row_size = _row_bytes(rows[i])
+                # A file always takes at least one row, however large
+                if self._bytes + size + row_size > self.max_bytes and (i > start or self._session.rows_written):
+                    return i - start, size
+                size += row_size
+        return end - start, size
+
+    def write_batch(self, qa_pairs: List[Dict[str, str]]) -> int:
+        """Write the questions of `qa_pairs` not yet in any file; returns the number written."""
+        rows = []
+        for qa in qa_pairs:
+            row = qa_row(qa)
+            if row[0] in self.questions:
+                self.skipped += 1
+                continue
+            self.questions.add(row[0])
+            rows.append(row)
+        self.metrics.incr("duplicates_skipped", len(qa_pairs) - len(rows))
+
+        start = 0
+        while start < len(rows):
+            if self._session is None:
+                self._open_next()
+            take, size = self._room(rows, start)
+            if take == 0:
+                self._finish_current()
+                continue
+            self._session.write_values(rows[start:start + take])
+            self._bytes += size
+            self.rows_written += take
+            self._entry["rows"][1] = self.rows_written
+            start += take
+            if self.max_rows and self._session.rows_written >= self.max_rows:
+                self._finish_current()
+        return len(rows)
+
+    def write_stream(self, qa_pairs: Iterable[Dict[str, str]], batch_size: int = 1000) -> int:
+        return sum(self.write_batch(batch) for batch in batched(qa_pairs, batch_size))
+
+    def write_pipelined(self, batches: Iterable[List[Dict[str, str]]], queue_size: int = DEFAULT_QUEUE_SIZE,
+                        on_written=None) -> int:
+        """Generate and write on separate threads, as WriterSession.write_pipelined."""
+        return run_pipeline(batches, self.write_batch, queue_size, on_written, self.metrics)
+
+    def _finish_current(self):
+        """Hand the current file to a background thread for finalizing."""
+        if self._session is None:
+            return
+        session, entry = self._session, self._entry
+        self._session = self._entry = None
+        # Bound the files finalizing at once; each holds its temporary sheet data on disk
+        while len(self._pending) >= self._parallel:
+            self._collect(self._pending[0])
+        self._pending.append((session, entry, self._executor.submit(session.close)))
+
+    def _collect(self, pending):
+        session, entry, future = pending
+        future.result()
+        self._pending.remove(pending)
+        directory = os.path.dirname(self.manifest_path)
+        path = os.path.join(directory, entry["file"])
+        entry["bytes"] = os.path.getsize(path)
+        if session.sheets:
+            first = entry["rows"][0]
+            entry["sheets"] = []
+            for title, rows in session.sheets:
+                entry["sheets"].append({"name": title, "rows": [first, first + rows - 1]})
+                first += rows
+        entry["question_index"] = os.path.basename(sidecar_path(path)) if self.sidecar else None
+        entry["questions"] = len(session.questions)
+        self.files.append(entry)
+        self.metrics.merge(session.metrics)
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {
+            "format": self.format,
+            "rows": self.files[-1]["rows"][1] if self.files else 0,
+            "max_rows": self.max_rows,
+            "max_bytes": self.max_bytes,
+            "complete": self.closed,
+            "files": self.files,
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        replace_file(tmp_path, self.manifest_path)
+
+    def close(self):
+        if self.closed:
+            return
+        if self._session is None and not self._opened:
+            self._open_next()
+        self._finish_current()
+        while self._pending:
+            self._collect(self._pending[0])
+        self._executor.shutdown()
+        self.closed = True
+        self._write_manifest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,669 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Output sinks for Chinese Q&A data.
+Streams Q&A rows to disk as they are produced instead of building a full workbook in memory.
+
+Every sink has `write_values(rows)`, `write_rows(qa_pairs)`, `close()` and `rows_written`, and
+a `read_rows(filename, batch_size)` that yields the data rows of an existing file. Sinks with
+`appends_in_place` (CSV, JSONL) append to an existing file directly; the others (xlsx, Parquet)
+are rewritten with the existing rows copied in first.
+"""
+
+# openpyxl is imported where it is used, so runs that never touch a workbook skip its import time
+from typing import Callable, List, Dict, Iterable, Optional
+import xml.etree.ElementTree as ET
+import csv
+import json
+import os
+from contextlib import closing
+from itertools import islice
+from time import perf_counter
+
+from dedup_index import LayeredIndex, make_dedup_index
+from reproducible import replace_file, save_workbook
+from sidecar_index import SidecarIndex, snapshot_index, update_sidecar
+from qa_metrics import Metrics
+from qa_pipeline import DEFAULT_QUEUE_SIZE, run_pipeline
+from xlsx_writer import XlsxWriter
+
+SHEET_TITLE = "中文问答数据"
+FIELDS = ["标准问题", "回答类型", "问题回答1"]
+HEADERS = ["标准问题 (必填)", "回答类型 (必填)", "问题回答1 (必填)"]
+MAX_COLUMN_WIDTH = 50
+# Excel's row limit per sheet, header included
+MAX_SHEET_ROWS = 1048576
+PARQUET_ROW_GROUP_SIZE = 100000
+JOURNAL_SUFFIX = ".journal.jsonl"
+
+_SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def update_column_lengths(lengths: List[int], rows: Iterable[Iterable]) -> List[int]:
+    """Fold the string lengths of `rows` into the running per-column maxima."""
+    for row in rows:
+        for col, value in enumerate(row):
+            if value is None:
+                continue
+            length = len(str(value))
+            if length > lengths[col]:
+                lengths[col] = length
+    return lengths
+
+
+def column_width(max_length: int) -> int:
+    """Excel column width for a column whose longest value has `max_length` characters."""
+    return min(max_length + 2, MAX_COLUMN_WIDTH)
+
+
+def read_column_widths(filename: str) -> Dict[int, float]:
+    """Read the <cols> widths of the active sheet of an existing workbook, keyed by 1-based column."""
+    from openpyxl import load_workbook
+    widths = {}
+    wb = load_workbook(filename, read_only=True)
+    try:
+        with wb.active._get_source() as src:
+            for _, elem in ET.iterparse(src, events=("start",)):
+                if elem.tag == _SHEET_NS + "sheetData":
+                    break
+                if elem.tag == _SHEET_NS + "col" and elem.get("width"):
+                    for col in range(int(elem.get("min")), int(elem.get("max")) + 1):
+                        widths[col] = float(elem.get("width"))
+    finally:
+        wb.close()
+    return widths
+
+
+def read_column_lengths(filename: str, columns: int = len(HEADERS)) -> List[int]:
+    """Recover per-column lengths from the <cols> widths of an existing workbook without reading its rows."""
+    lengths = [0] * columns
+    for col, width in read_column_widths(filename).items():
+        if col <= columns:
+            lengths[col - 1] = max(lengths[col - 1], int(width) - 2)
+    return lengths
+
+
+def iter_existing_rows(filename: str, batch_size: int = 1000):
+    """Yield the data rows of every sheet of an existing Q&A workbook in batches, using a read-only pass."""
+    from openpyxl import load_workbook
+    wb = load_workbook(filename, read_only=True)
+    try:
+        batch = []
+        for ws in wb.worksheets:
+            for row in ws.iter_rows(min_row=2, max_col=len(HEADERS), values_only=True):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    finally:
+        wb.close()
+
+
+def read_first_rows(filename: str, count: int) -> List[tuple]:
+    """Up to `count` data rows from the start of a Q&A workbook; the workbook is closed before returning."""
+    with closing(iter_existing_rows(filename, batch_size=count)) as batches:
+        return next(batches, [])
+
+
+def batched(items: Iterable, size: int) -> Iterable[list]:
+    """Split `items` into lists of `size` (the last may be shorter), consuming it lazily."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def qa_row(qa_pair: Dict[str, str]) -> tuple:
+    return tuple(qa_pair[field] for field in FIELDS)
+
+
+class StreamingExcelSink:
+    """
+    Write-only Excel sink.
+
+    Rows are streamed into the sheet as they are written, so memory stays flat regardless of
+    row count. Column widths must be known before the first row reaches the file, so they are
+    sized from `column_lengths` plus the first batch passed to `write_rows`; `column_lengths`
+    keeps the running maxima over all rows afterwards. A sheet full at `sheet_rows` data rows
+    (Excel's limit by default) continues on a new sheet; `sheets` lists (title, rows) per sheet.
+    """
+
+    appends_in_place = False
+    read_rows = staticmethod(iter_existing_rows)
+
+    def __init__(self, filename: str, column_lengths: Optional[List[int]] = None, deterministic: bool = False,
+                 sheet_rows: int = MAX_SHEET_ROWS - 1):
+        self.filename = filename
+        self.deterministic = deterministic
+        self.sheet_rows = sheet_rows
+        self.rows_written = 0
+        self.sheets = []
+        self.column_lengths = update_column_lengths(
+            list(column_lengths) if column_lengths else [0] * len(HEADERS), [HEADERS])
+        self._ws = None
+        self._open_workbook()
+
+    def _open_workbook(self):
+        from openpyxl import Workbook
+        self._wb = Workbook(write_only=True)
+
+    def _open_sheet(self):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment
+        from openpyxl.utils import get_column_letter
+        title = self._sheet_title()
+        self.sheets.append([title, 0])
+        self._ws = self._wb.create_sheet(title)
+        for col, length in enumerate(self.column_lengths, 1):
+            self._ws.column_dimensions[get_column_letter(col)].width = column_width(length)
+
+        header_row = []
+        for header in HEADERS:
+            cell = WriteOnlyCell(self._ws, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+            header_row.append(cell)
+        self._ws.append(header_row)
+
+    def _append(self, rows: List[tuple]):
+        for row in rows:
+            self._ws.append(row)
+
+    def _sheet_title(self) -> str:
+        return SHEET_TITLE if not self.sheets else f"{SHEET_TITLE}_{len(self.sheets) + 1}"
+
+    def write_values(self, rows: List[tuple]):
+        """Write raw row tuples in column order."""
+        # Running maxima cover every row written; only those known at open time size the columns
+        update_column_lengths(self.column_lengths, rows)
+        if self._ws is None:
+            self._open_sheet()
+        start = 0
+        while start < len(rows):
+            sheet = self.sheets[-1]
+            if sheet[1] >= self.sheet_rows:
+                self._open_sheet()
+                sheet = self.sheets[-1]
+            end = min(len(rows), start + self.sheet_rows - sheet[1])
+            self._append(rows[start:end])
+            sheet[1] += end - start
+            start = end
+        self.rows_written += len(rows)
+
+    def write_rows(self, qa_pairs: List[Dict[str, str]]):
+        self.write_values([qa_row(qa) for qa in qa_pairs])
+
+    def close(self):
+        if self._ws is None:
+            self._open_sheet()
+        self._save()
+
+    def _save(self):
+        save_workbook(self._wb, self.filename, self.deterministic)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class NativeExcelSink(StreamingExcelSink):
+    """
+    StreamingExcelSink on the native writer (see xlsx_writer): the same sheets, header style and
+    column widths, with rows formatted straight into the zip stream instead of through openpyxl
+    and repeated values such as the answer type kept in a shared-strings table. With workers > 1
+    the rows are rendered and compressed on a process pool.
+    """
+
+    def __init__(self, filename: str, column_lengths: Optional[List[int]] = None, deterministic: bool = False,
+                 sheet_rows: int = MAX_SHEET_ROWS - 1, workers: int = 1):
+        self.workers = workers
+        super().__init__(filename, column_lengths, deterministic, sheet_rows)
+
+    def _open_workbook(self):
+        self._writer = XlsxWriter(self.filename, self.deterministic, workers=self.workers)
+
+    def _open_sheet(self):
+        title = self._sheet_title()
+        self.sheets.append([title, 0])
+        self._writer.add_sheet(title, HEADERS, [column_width(length) for length in self.column_lengths],
+                               center_header=True)
+        self._ws = title
+
+    def _append(self, rows: List[tuple]):
+        self._writer.append_rows(rows)
+
+    def _save(self):
+        self._writer.close()
+
+
+class CsvSink:
+    """UTF-8 CSV sink with the same header row as the Excel output."""
+
+    appends_in_place = True
+
+    def __init__(self, filename: str, append: bool = False):
+        self.filename = filename
+        self.rows_written = 0
+        write_header = not (append and os.path.exists(filename) and os.path.getsize(filename))
+        self._file = open(filename, "a" if append else "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        if write_header:
+            self._writer.writerow(HEADERS)
+
+    @staticmethod
+    def read_rows(filename: str, batch_size: int = 1000):
+        with open(filename, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            batch = []
+            for row in reader:
+                batch.append(tuple(row))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def write_values(self, rows: List[tuple]):
+        self._writer.writerows(rows)
+        self.rows_written += len(rows)
+
+    def sync(self) -> int:
+        """Flush written rows to disk; returns the file's length in bytes."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def write_rows(self, qa_pairs: List[Dict[str, str]]):
+        self.write_values([qa_row(qa) for qa in qa_pairs])
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class JsonlSink:
+    """JSON Lines sink: one object per Q&A pair, keyed by the Q&A field names."""
+
+    appends_in_place = True
+
+    def __init__(self, filename: str, append: bool = False):
+        self.filename = filename
+        self.rows_written = 0
+        self._file = open(filename, "a" if append else "w", encoding="utf-8")
+
+    @staticmethod
+    def read_rows(filename: str, batch_size: int = 1000):
+        with open(filename, encoding="utf-8") as f:
+            batch = []
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                batch.append(tuple(record.get(field) for field in FIELDS))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def write_values(self, rows: List[tuple]):
+        self._file.writelines(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n" for row in rows)
+        self.rows_written += len(rows)
+
+    def sync(self) -> int:
+        """Flush written rows to disk; returns the file's length in bytes."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def write_rows(self, qa_pairs: List[Dict[str, str]]):
+        self.write_values([qa_row(qa) for qa in qa_pairs])
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+class ParquetSink:
+    """
+    Parquet sink with one string column per Q&A field. Rows are buffered and written in row
+    groups of `row_group_size`, so memory is bounded by one row group.
+    """
+
+    appends_in_place = False
+
+    def __init__(self, filename: str, column_lengths: Optional[List[int]] = None, deterministic: bool = False,
+                 row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+        pa = _import_pyarrow()
+        self.filename = filename
+        self.rows_written = 0
+        self.row_group_size = row_group_size
+        self._schema = pa.schema([(field, pa.string()) for field in FIELDS])
+        self._writer = pa.parquet.ParquetWriter(filename, self._schema)
+        self._buffer = []
+
+    @staticmethod
+    def read_rows(filename: str, batch_size: int = 1000):
+        pa = _import_pyarrow()
+        for batch in pa.parquet.ParquetFile(filename).iter_batches(batch_size=batch_size, columns=FIELDS):
+            columns = [batch.column(field).to_pylist() for field in FIELDS]
+            yield list(zip(*columns))
+
+    def _flush(self, rows: List[tuple]):
+        pa = _import_pyarrow()
+        columns = list(zip(*rows))
+        table = pa.Table.from_arrays([pa.array(column, pa.string()) for column in columns], schema=self._schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+
+    def write_values(self, rows: List[tuple]):
+        self._buffer.extend(rows)
+        self.rows_written += len(rows)
+        while len(self._buffer) >= self.row_group_size:
+            self._flush(self._buffer[:self.row_group_size])
+            del self._buffer[:self.row_group_size]
+
+    def write_rows(self, qa_pairs: List[Dict[str, str]]):
+        self.write_values([qa_row(qa) for qa in qa_pairs])
+
+    def close(self):
+        if self._buffer:
+            self._flush(self._buffer)
+            self._buffer = []
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+EXCEL_ENGINES = {
+    "openpyxl": StreamingExcelSink,
+    "native": NativeExcelSink,
+}
+
+SINK_FORMATS = {
+    "xlsx": StreamingExcelSink,
+    "csv": CsvSink,
+    "jsonl": JsonlSink,
+    "parquet": ParquetSink,
+}
+
+
+def output_format(filename: str, format: Optional[str] = None) -> str:
+    """The sink format for `filename`: `format` if given, else taken from the file extension."""
+    if format is None:
+        format = os.path.splitext(filename)[1].lstrip(".").lower()
+    if format not in SINK_FORMATS:
+        raise ValueError(f"output format must be one of {tuple(SINK_FORMATS)}, got {format!r}")
+    return format
+
+
+def sink_class(format: str, engine: str = "openpyxl"):
+    """The sink for `format`; xlsx is written by the given engine (see EXCEL_ENGINES)."""
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"xlsx engine must be one of {tuple(EXCEL_ENGINES)}, got {engine!r}")
+    return EXCEL_ENGINES[engine] if format == "xlsx" else SINK_FORMATS[format]
+
+
+class WriterSession:
+    """
+    Open output that accepts Q&A batches and is finalized once on close.
+
+    The format comes from `format` or the file extension (see SINK_FORMATS). xlsx and Parquet
+    rows are streamed into a temporary file next to `filename` which replaces it on close, so a
+    long run touches the target once instead of once per batch; CSV and JSONL are appended to
+    directly. When appending, existing questions come from the file's sidecar index if it is up
+    to date; otherwise the rows are scanned once on open. Rewritten formats get the existing rows
+    copied into the new file on the first batch, and the sidecar is rewritten on close.
+
+    With journal=True the session can be checkpointed (see qa_checkpoint): rewritten formats
+    append their rows to `filename.journal.jsonl` and build the output from it on close, and
+    `get_state()` syncs the journal (or the in-place output) and snapshots the session. A
+    session opened with that `state` truncates the file back to the snapshot and carries on.
+    Leaving the `with` block on an exception then keeps the journal instead of finalizing.
+
+    `engine` picks the xlsx writer: "openpyxl", or "native" for the faster xlsx_writer, which
+    renders on `workers` processes when that is more than one.
+    """
+
+    def __init__(self, filename: str, append: bool = False, deterministic: bool = False,
+                 dedup_backend: str = "set", sidecar: bool = True, format: Optional[str] = None,
+                 metrics: Optional[Metrics] = None, journal: bool = False, state: Optional[dict] = None,
+                 engine: str = "openpyxl", workers: int = 1):
+        self.filename = filename
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.format = output_format(filename, format)
+        self._sink_class = sink_class(self.format, engine)
+        if workers > 1 and self._sink_class is not NativeExcelSink:
+            raise ValueError("rendering on several workers needs xlsx output with engine='native'")
+        self._sink_options = {"workers": workers} if workers > 1 else {}
+        self.deterministic = deterministic
+        self.sidecar = sidecar
+        self.appending = append and os.path.exists(filename)
+        self.questions = make_dedup_index(dedup_backend)
+        self.existing = self.questions
+        self.existing_count = 0
+        self.existing_rows = 0
+        self.rows_written = 0
+        self.skipped = 0
+        self.column_lengths = update_column_lengths([0] * len(HEADERS), [HEADERS])
+        self._existing_lengths = [0] * len(HEADERS)
+        self._tmp_filename = filename + ".tmp"
+        self.journal = journal or state is not None
+        self.journal_filename = filename + JOURNAL_SUFFIX
+        self.resumed = state is not None
+        self._sink = None
+        self.closed = False
+
+        if self.resumed:
+            self._restore(state)
+        elif self.appending:
+            with self.metrics.stage("dedup_load"):
+                self._load_existing()
+
+    def _load_existing(self):
+        """Collect the questions, row count and column lengths already in the output."""
+        index = SidecarIndex.load(self.filename) if self.sidecar else None
+        if index is not None:
+            self.existing = index
+            self.questions = LayeredIndex(self.questions, [index])
+            self.existing_rows = index.row_count
+            self._existing_lengths = list(index.column_lengths)
+        else:
+            for batch in self._sink_class.read_rows(self.filename):
+                update_column_lengths(self._existing_lengths, batch)
+                self.questions.update(row[0] for row in batch if row[0])
+                self.existing_rows += len(batch)
+        self.existing_count = len(self.existing)
+        self.column_lengths = [max(a, b) for a, b in zip(self.column_lengths, self._existing_lengths)]
+
+    @property
+    def sheets(self) -> List[list]:
+        """(title, rows) of every sheet written so far, for xlsx output."""
+        return getattr(self._sink, "sheets", [])
+
+    @property
+    def _journal_target(self) -> str:
+        """The file a journaled session appends to: the output itself, or the journal."""
+        return self.filename if self._sink_class.appends_in_place else self.journal_filename
+
+    def get_state(self) -> dict:
+        """Sync what has been written and snapshot the session, for a checkpoint."""
+        if not self.journal:
+            raise ValueError("only sessions opened with journal=True can be checkpointed")
+        if self._sink is not None:
+            offset = self._sink.sync()
+        elif self._sink_class.appends_in_place and self.appending:
+            offset = os.path.getsize(self.filename)
+        else:
+            offset = 0
+        return {
+            "offset": offset,
+            "in_place": self._sink_class.appends_in_place,
+            "appending": self.appending,
+            "questions": snapshot_index(self.questions),
+            "existing_count": self.existing_count,
+            "existing_rows": self.existing_rows,
+            "existing_lengths": list(self._existing_lengths),
+            "column_lengths": list(self.column_lengths),
+            "rows_written": self.rows_written,
+            "skipped": self.skipped,
+        }
+
+    def _restore(self, state: dict):
+        """Continue from `state`, dropping whatever was written after it was taken."""
+        self.appending = state["appending"]
+        self.questions = self.existing = state["questions"]
+        self.existing_count = state["existing_count"]
+        self.existing_rows = state["existing_rows"]
+        self._existing_lengths = list(state["existing_lengths"])
+        self.column_lengths = list(state["column_lengths"])
+        self.rows_written = state["rows_written"]
+        self.skipped = state["skipped"]
+
+        target, offset = self._journal_target, state["offset"]
+        size = os.path.getsize(target) if os.path.exists(target) else 0
+        if size < offset:
+            raise ValueError(f"{target} is shorter than its checkpoint ({size} < {offset} bytes); cannot resume")
+        if os.path.exists(target):
+            os.truncate(target, offset)
+
+    def _open_sink(self, first_rows: List[tuple]):
+        if self._sink_class.appends_in_place:
+            self._sink = self._sink_class(self.filename, append=self.appending or self.resumed)
+            return
+        if self.journal:
+            self._sink = JsonlSink(self.journal_filename, append=self.resumed)
+            return
+        lengths = update_column_lengths(list(self._existing_lengths), first_rows)
+        self._sink = self._sink_class(self._tmp_filename, lengths, self.deterministic, **self._sink_options)
+        if self.appending:
+            for batch in self._sink_class.read_rows(self.filename):
+                self._sink.write_values(batch)
+
+    def write_batch(self, qa_pairs: List[Dict[str, str]]) -> int:
+        """Write the questions of `qa_pairs` not yet in the output; returns the number written."""
+        return self.write_values([qa_row(qa) for qa in qa_pairs])
+
+    def write_values(self, values: List[tuple]) -> int:
+        """write_batch for row tuples in column order."""
+        start = perf_counter()
+        rows = []
+        for row in values:
+            if row[0] in self.questions:
+                self.skipped += 1
+                continue
+            self.questions.add(row[0])
+            rows.append(row)
+        update_column_lengths(self.column_lengths, rows)
+
+        if self._sink is None:
+            self._open_sink(rows)
+        self._sink.write_values(rows)
+        self.rows_written += len(rows)
+        self.metrics.add_time("write", perf_counter() - start)
+        self.metrics.incr("rows_written", len(rows))
+        self.metrics.incr("duplicates_skipped", len(values) - len(rows))
+        return len(rows)
+
+    def write_stream(self, qa_pairs: Iterable[Dict[str, str]], batch_size: int = 1000) -> int:
+        """Write pairs from any iterable, such as generator.iter_qa_pairs(), `batch_size` at a time."""
+        return sum(self.write_batch(batch) for batch in batched(qa_pairs, batch_size))
+
+    def write_pipelined(self, batches: Iterable[List[Dict[str, str]]], queue_size: int = DEFAULT_QUEUE_SIZE,
+                        on_written: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        Write batches on a writer thread while the caller keeps generating (see qa_pipeline).
+
+        Pass a lazy source such as generator.iter_qa_batches(); at most `queue_size` batches are
+        held in memory. On error or Ctrl-C the queued batches are written before it returns, so
+        closing the session still finalizes a valid file.
+        """
+        return run_pipeline(batches, self.write_batch, queue_size, on_written, self.metrics)
+
+    def close(self):
+        if self.closed:
+            return
+        if self._sink is None:
+            self._open_sink([])
+        with self.metrics.stage("save"):
+            self._sink.close()
+            if self.journal and not self._sink_class.appends_in_place:
+                self._write_from_journal()
+            elif not self._sink_class.appends_in_place:
+                replace_file(self._tmp_filename, self.filename)
+        self.metrics.incr("bytes_written", os.path.getsize(self.filename))
+        self._release_sidecar()
+        if self.sidecar:
+            with self.metrics.stage("sidecar"):
+                update_sidecar(self.filename, self.questions, (), self.existing_rows + self.rows_written, self.column_lengths)
+        self.closed = True
+
+    def _release_sidecar(self):
+        """Swap a memory-mapped sidecar for its in-memory copy and unmap it, so the file can be replaced."""
+        if isinstance(self.existing, SidecarIndex):
+            sidecar = self.existing
+            self.questions, self.existing = snapshot_index(self.questions), snapshot_index(sidecar)
+            sidecar.close()
+
+    def _write_from_journal(self):
+        """Build the output from the existing rows and the journal, then swap it in."""
+        sink = self._sink_class(self._tmp_filename, self.column_lengths, self.deterministic, **self._sink_options)
+        if self.appending:
+            for batch in self._sink_class.read_rows(self.filename):
+                sink.write_values(batch)
+        for batch in JsonlSink.read_rows(self.journal_filename):
+            sink.write_values(batch)
+        sink.close()
+        replace_file(self._tmp_filename, self.filename)
+        os.remove(self.journal_filename)
+
+    def abandon(self):
+        """Close the output without finalizing it, leaving the journal for a resumed run."""
+        if self._sink is not None and not self.closed:
+            self._sink.close()
+        self._release_sidecar()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.journal:
+            self.abandon()
+        else:
+            self.close()
+        return False
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Indexed question space.
+Every question the generator can produce is addressed by an integer index, so unique questions
+can be drawn without replacement instead of by random retries.
+"""
+
+import random
+from bisect import bisect_right
+from typing import Iterator, List, Tuple, Optional
+
+import numpy as np
+
+_MASK64 = (1 << 64) - 1
+
+
+class QuestionSpaceExhausted(ValueError):
+    """Raised when more unique questions are requested than the question space holds."""
+
+
+class KeyedPermutation:
+    """
+    Pseudo-random permutation of range(size) selected by `key`.
+
+    A 4-round Feistel network over the smallest even bit width covering `size`, with cycle
+    walking to stay inside the range. Lookup is O(1) and needs no per-element storage.
+    """
+
+    def __init__(self, size: int, key: int):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        bits += bits & 1
+        self._half = bits // 2
+        self._mask = (1 << self._half) - 1
+        key_rng = random.Random(key)
+        self._round_keys = [key_rng.getrandbits(64) for _ in range(4)]
+
+    def _round(self, value: int, round_key: int) -> int:
+        value = ((value ^ round_key) * 0x9E3779B97F4A7C15) & _MASK64
+        value ^= value >> 29
+        return value & self._mask
+
+    def _round_array(self, values: np.ndarray, round_key: int) -> np.ndarray:
+        # uint64 multiplication wraps, which is the & _MASK64 of the scalar version
+        values = (values ^ np.uint64(round_key)) * np.uint64(0x9E3779B97F4A7C15)
+        values ^= values >> np.uint64(29)
+        return values & np.uint64(self._mask)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        value = index
+        while True:
+            left, right = value >> self._half, value & self._mask
+            for round_key in self._round_keys:
+                left, right = right, left ^ self._round(right, round_key)
+            value = (left << self._half) | right
+            if value < self.size:
+                return value
+
+    def take(self, indices: np.ndarray) -> np.ndarray:
+        """`self[i]` for every i in `indices`, computed on whole arrays."""
+        half, mask = np.uint64(self._half), np.uint64(self._mask)
+        values = np.asarray(indices, dtype=np.uint64)
+        result = np.empty_like(values)
+        pending = np.arange(len(values))
+        while len(pending):
+            left, right = values >> half, values & mask
+            for round_key in self._round_keys:
+                left, right = right, left ^ self._round_array(right, round_key)
+            values = (left << half) | right
+            inside = values < self.size
+            result[pending[inside]] = values[inside]
+            # Cycle walking: values outside the range go through the network again
+            pending, values = pending[~inside], values[~inside]
+        return result.astype(np.int64)
+
+
+class QuestionSpace:
+    """
+    All questions addressable as indices.
+
+    Templates with one placeholder cover every topic; templates with two placeholders cover
+    every ordered pair of distinct topics. Indices are laid out template by template.
+    """
+
+    def __init__(self, templates: List[str], topics: List[str]):
+        self.templates = list(templates)
+        # Topics listed under several categories would otherwise render identical questions
+        self.topics = list(dict.fromkeys(topics))
+        self.topic_array = np.array(self.topics, dtype=object)
+        self.arity = [template.count("{}") for template in self.templates]
+
+        topic_count = len(self.topics)
+        self.template_sizes = []
+        for template, arity in zip(self.templates, self.arity):
+            if arity == 1:
+                self.template_sizes.append(topic_count)
+            elif arity == 2:
+                self.template_sizes.append(topic_count * (topic_count - 1))
+            else:
+                raise ValueError(f"Question template must have one or two placeholders: {template}")
+
+        self.offsets = [0]
+        for size in self.template_sizes:
+            self.offsets.append(self.offsets[-1] + size)
+        self.size = self.offsets[-1]
+
+    def __len__(self):
+        return self.size
+
+    def decode(self, index: int) -> Tuple[int, Tuple[int, ...]]:
+        """Map a global index to (template id, topic ids)."""
+        template_id = bisect_right(self.offsets, index) - 1
+        return template_id, self.decode_local(template_id, index - self.offsets[template_id])
+
+    def decode_local(self, template_id: int, local_index: int) -> Tuple[int, ...]:
+        if self.arity[template_id] == 1:
+            return (local_index,)
+        first, second = divmod(local_index, len(self.topics) - 1)
+        if second >= first:
+            second += 1
+        return (first, second)
+
+    def decode_local_batch(self, template_ids: np.ndarray, local_indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """decode_local for whole arrays: (first topic ids, second topic ids or -1 for one-topic templates)."""
+        pairs = np.asarray(self.arity)[template_ids] == 2
+        first, second = np.divmod(local_indices, len(self.topics) - 1)
+        second += second >= first
+        return np.where(pairs, first, local_indices), np.where(pairs, second, -1)
+
+    def render_batch(self, template_ids: np.ndarray, firsts: np.ndarray, seconds: np.ndarray) -> List[str]:
+        """render() for whole arrays as returned by decode_local_batch."""
+        questions = np.empty(len(template_ids), dtype=object)
+        for template_id in np.unique(template_ids).tolist():
+            mask = template_ids == template_id
+            columns = [self.topic_array[firsts[mask]]]
+            if self.arity[template_id] == 2:
+                columns.append(self.topic_array[seconds[mask]])
+            questions[mask] = list(map(self.templates[template_id].format, *columns))
+        return questions.tolist()
+
+    def iter_questions(self) -> Iterator[List[str]]:
+        """Every question in index order, one list per template."""
+        for template_id, size in enumerate(self.template_sizes):
+            template_ids = np.full(size, template_id, dtype=np.int64)
+            first, second = self.decode_local_batch(template_ids, np.arange(size, dtype=np.int64))
+            yield self.render_batch(template_ids, first, second)
+
+    def render(self, template_id: int, topic_ids: Tuple[int, ...]) -> str:
+        return self.templates[template_id].format(*(self.topics[topic_id] for topic_id in topic_ids))
+
+    def question(self, index: int) -> str:
+        return self.render(*self.decode(index))
+
+
+class QuestionSampler:
+    """
+    Draws question indices without replacement in O(1) per draw.
+
+    Each template walks its own keyed permutation of its index range. A draw first picks a
+    template uniformly among those with questions left, which keeps the template mix of the
+    original random-retry generator, then takes that template's next permuted index.
+
+    With shards > 1 the sampler only walks slice `shard` of every template's permutation, so
+    samplers sharing a key but holding different shards never produce the same question.
+    """
+
+    def __init__(self, space: QuestionSpace, key: int, shard: int = 0, shards: int = 1):
+        if not 0 <= shard < shards:
+            raise ValueError(f"shard must be in range({shards})")
+        self.space = space
+        self.key = key
+        self.shard = shard
+        self.shards = shards
+        self._permutations = [KeyedPermutation(size, key + template_id)
+                              for template_id, size in enumerate(space.template_sizes)]
+        self._cursors = [size * shard // shards for size in space.template_sizes]
+        self._ends = [size * (shard + 1) // shards for size in space.template_sizes]
+        self._live = [template_id for template_id in range(len(space.templates))
+                      if self._cursors[template_id] < self._ends[template_id]]
+        self.remaining = sum(end - start for start, end in zip(self._cursors, self._ends))
+
+    def get_state(self) -> tuple:
+        return tuple(self._cursors), tuple(self._live), self.remaining
+
+    def set_state(self, state: tuple):
+        cursors, live, self.remaining = state
+        self._cursors = list(cursors)
+        self._live = list(live)
+
+    def draw(self, rng=random) -> Optional[Tuple[int, Tuple[int, ...]]]:
+        """Return the next (template id, topic ids), or None once the space is used up."""
+        if not self._live:
+            return None
+        slot = rng.randrange(len(self._live))
+        template_id = self._live[slot]
+        cursor = self._cursors[template_id]
+        local_index = self._permutations[template_id][cursor]
+        self._cursors[template_id] = cursor + 1
+        if cursor + 1 == self._ends[template_id]:
+            self._live[slot] = self._live[-1]
+            self._live.pop()
+        self.remaining -= 1
+        return template_id, self.space.decode_local(template_id, local_index)
+
+    def draw_batch(self, count: int, np_rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Up to `count` draws at once, as arrays of template ids and template-local indices.
+
+        Templates are picked uniformly among those with questions left, like `draw`. Picks
+        beyond what a template has left are redrawn among the remaining templates, which is
+        what consecutive draws would do once that template runs out. Fewer than `count` draws
+        come back only when the space is used up.
+        """
+        template_count = len(self.space.templates)
+        left = np.asarray(self._ends) - np.asarray(self._cursors)
+        template_ids = np.full(count, -1, dtype=np.int64)
+        pending = np.arange(count)
+        while len(pending) and self._live:
+            live = np.asarray(self._live)
+            picks = live[np_rng.integers(len(live), size=len(pending))]
+            # Keep each template's first `left` picks in draw order, redraw the rest
+            keep = _rank_within_groups(picks) < left[picks]
+            kept = picks[keep]
+            template_ids[pending[keep]] = kept
+            left -= np.bincount(kept, minlength=template_count)
+            self._live = [template_id for template_id in self._live if left[template_id] > 0]
+            pending = pending[~keep]
+
+        template_ids = template_ids[template_ids >= 0]
+        local_indices = np.asarray(self._cursors)[template_ids] + _rank_within_groups(template_ids)
+        for template_id in np.unique(template_ids).tolist():
+            mask = template_ids == template_id
+            local_indices[mask] = self._permutations[template_id].take(local_indices[mask])
+            self._cursors[template_id] += int(mask.sum())
+        self.remaining -= len(template_ids)
+        return template_ids, local_indices
+
+
+def _rank_within_groups(values: np.ndarray) -> np.ndarray:
+    """For each element, how many equal elements come before it."""
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[order] = np.arange(len(values)) - np.searchsorted(ordered, ordered, side="left")
+    return ranks
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for reproducible runs: seeded random streams and timestamp-free, atomic workbook saves.
+"""
+
+import datetime
+import os
+import random
+import shutil
+import numpy as np
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+
+# Written into docProps/core.xml and every zip entry when saving deterministically
+FIXED_TIMESTAMP = datetime.datetime(2024, 1, 1)
+
+
+def make_rng(seed=None, rng: random.Random = None) -> random.Random:
+    """Return `rng` if given, else a new Random seeded with `seed` (None seeds from the OS)."""
+    return rng if rng is not None else random.Random(seed)
+
+
+def child_rng(seed, *labels) -> random.Random:
+    """
+    Independent stream derived from `seed` and `labels`, e.g. child_rng(42, "shard", 3).
+    String seeds are hashed with SHA-512, so nearby labels give unrelated streams.
+    """
+    return random.Random("-".join(str(part) for part in (seed,) + labels))
+
+
+def numpy_rng(rng=random) -> np.random.Generator:
+    """NumPy generator seeded from `rng`, so batch sampling follows the same seed as `rng`."""
+    return np.random.default_rng(rng.getrandbits(64))
+
+
+class _FixedTimeZipFile(ZipFile):
+    """ZipFile that stamps every entry with FIXED_TIMESTAMP instead of the current time."""
+
+    _date_time = FIXED_TIMESTAMP.timetuple()[:6]
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        if not isinstance(zinfo_or_arcname, ZipInfo):
+            zinfo_or_arcname = ZipInfo(zinfo_or_arcname, date_time=self._date_time)
+            zinfo_or_arcname.compress_type = self.compression
+            zinfo_or_arcname.external_attr = 0o600 << 16
+        super().writestr(zinfo_or_arcname, data, compress_type, compresslevel)
+
+    def write(self, filename, arcname=None, compress_type=None, compresslevel=None):
+        zinfo = ZipInfo(arcname or filename, date_time=self._date_time)
+        zinfo.compress_type = compress_type if compress_type is not None else self.compression
+        zinfo.external_attr = 0o600 << 16
+        with open(filename, "rb") as src, self.open(zinfo, "w", force_zip64=True) as dest:
+            shutil.copyfileobj(src, dest, 1024 * 1024)
+
+
+def replace_file(tmp_filename: str, filename: str):
+    """Flush `tmp_filename` to disk and rename it over `filename`, so readers never see a partial file."""
+    with open(tmp_filename, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+
+
+def save_workbook(wb, filename, deterministic: bool = False):
+    """
+    Save `wb` to `filename` (a path or file object). With deterministic=True the document
+    properties and zip entries carry FIXED_TIMESTAMP, so identical content gives a
+    byte-identical file. Paths are written to a temporary file that replaces `filename` once
+    complete, so a run killed mid-save leaves the previous file intact.
+    """
+    if isinstance(filename, (str, os.PathLike)):
+        tmp_filename = os.fspath(filename) + ".tmp"
+        _save_workbook(wb, tmp_filename, deterministic)
+        replace_file(tmp_filename, filename)
+    else:
+        _save_workbook(wb, filename, deterministic)
+
+
+def _save_workbook(wb, filename, deterministic: bool):
+    if not deterministic:
+        wb.save(filename)
+        return
+
+    from openpyxl.writer.excel import ExcelWriter
+    wb.properties.created = FIXED_TIMESTAMP
+    wb.properties.modified = FIXED_TIMESTAMP
+    archive = _FixedTimeZipFile(filename, "w", ZIP_DEFLATED, allowZip64=True)
+    ExcelWriter(wb, archive).save()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent sidecar dedup index for generated workbooks.
+
+Next to `name.xlsx` the writers keep `name.xlsx.qidx`: a sorted array of the 64-bit question
+fingerprints in the workbook plus a little metadata. Appending runs memory-map it instead of
+scanning column A of the whole workbook. The sidecar records the workbook's size, mtime and a
+CRC of its last 64 KB (where the zip central directory lives); if any of them no longer match,
+the sidecar is stale and callers fall back to a full scan.
+"""
+
+import heapq
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Optional
+
+from dedup_index import FingerprintIndex, LayeredIndex, fingerprint, iter_sorted_fingerprints
+
+SIDECAR_SUFFIX = ".qidx"
+
+_MAGIC = b"QIDX0001"
+# magic, workbook size, workbook mtime_ns, workbook tail CRC, row count, fingerprint count, 3 column lengths
+_HEADER = struct.Struct("<8sQqIQQ3Q")
+_HEADER_SIZE = 128
+_TAIL_BYTES = 64 * 1024
+
+
+def sidecar_path(filename: str) -> str:
+    return filename + SIDECAR_SUFFIX
+
+
+def _workbook_signature(filename: str) -> tuple:
+    stat = os.stat(filename)
+    with open(filename, "rb") as f:
+        f.seek(max(0, stat.st_size - _TAIL_BYTES))
+        tail_crc = zlib.crc32(f.read())
+    return stat.st_size, stat.st_mtime_ns, tail_crc
+
+
+class SidecarIndex:
+    """Read-only, memory-mapped view of a sidecar index. Supports `in` and len() like a set."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.workbook_size, self.workbook_mtime_ns, self.workbook_crc,
+         self.row_count, count, *lengths) = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a question index")
+        self.column_lengths = list(lengths)
+        self._snapshot = None
+        self._fingerprints = memoryview(self._mmap)[_HEADER_SIZE:_HEADER_SIZE + 8 * count].cast("Q")
+
+    @classmethod
+    def load(cls, filename: str) -> Optional["SidecarIndex"]:
+        """Open the sidecar of `filename` if it exists and still matches the workbook, else None."""
+        path = sidecar_path(filename)
+        if not (os.path.exists(path) and os.path.exists(filename)):
+            return None
+        try:
+            index = cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        if (index.workbook_size, index.workbook_mtime_ns, index.workbook_crc) != _workbook_signature(filename):
+            index.close()
+            return None
+        return index
+
+    def contains_fingerprint(self, value: int) -> bool:
+        pos = bisect_left(self._fingerprints, value)
+        return pos < len(self._fingerprints) and self._fingerprints[pos] == value
+
+    def __contains__(self, question: str) -> bool:
+        return self.contains_fingerprint(fingerprint(question))
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def iter_fingerprints(self) -> Iterator[int]:
+        return iter(self._fingerprints)
+
+    def to_fingerprint_index(self) -> FingerprintIndex:
+        """In-memory (picklable) copy of the index; built once, since the sidecar is read-only."""
+        if self._snapshot is None:
+            self._snapshot = FingerprintIndex.from_fingerprints(self._fingerprints)
+        return self._snapshot
+
+    def close(self):
+        if getattr(self, "_fingerprints", None) is not None:
+            self._fingerprints.release()
+            self._fingerprints = None
+        if not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
+
+
+def snapshot_index(index):
+    """Picklable form of a dedup index: memory-mapped sidecar layers are copied into memory."""
+    if isinstance(index, SidecarIndex):
+        return index.to_fingerprint_index()
+    if isinstance(index, LayeredIndex):
+        return LayeredIndex(index.overlay, [snapshot_index(base) for base in index.bases], index.paths)
+    return index
+
+
+def write_sidecar(filename: str, sorted_fingerprints: Iterable[int], row_count: int, column_lengths: List[int]):
+    """
+    Write the sidecar for `filename` from ascending fingerprints (duplicates are dropped).
+    Call after the workbook has been saved, since the workbook's current signature is recorded.
+    """
+    path = sidecar_path(filename)
+    tmp_path = path + ".tmp"
+    count = 0
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * _HEADER_SIZE)
+        chunk = array("Q")
+        previous = None
+        for value in sorted_fingerprints:
+            if value == previous:
+                continue
+            previous = value
+            chunk.append(value)
+            if len(chunk) >= 65536:
+                chunk.tofile(f)
+                count += len(chunk)
+                chunk = array("Q")
+        chunk.tofile(f)
+        count += len(chunk)
+
+        size, mtime_ns, tail_crc = _workbook_signature(filename)
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, size, mtime_ns, tail_crc, row_count, count, *column_lengths[:3]))
+    os.replace(tmp_path, path)
+
+
+def update_sidecar(filename: str, existing, new_questions: Iterable[str], row_count: int, column_lengths: List[int]):
+    """Write the sidecar for `filename` holding the `existing` index plus `new_questions`."""
+    new_fingerprints = sorted(fingerprint(question) for question in new_questions)
+    if existing is None:
+        merged = iter(new_fingerprints)
+    else:
+        merged = heapq.merge(iter_sorted_fingerprints(existing), new_fingerprints)
+    write_sidecar(filename, merged, row_count, column_lengths)
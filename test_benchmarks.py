@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+from benchmarks import compare, run_case
+from chinese_qa_generator import ChineseQAGenerator
+
+def test_run_case_reports_throughput_and_rss():
+    result = run_case("generate_qa_pairs", 200)
+    assert result["rows"] == 200
+    assert result["rows_per_sec"] > 0
+    assert result["peak_rss_mb"] > 0
+
+def test_compare_flags_only_regressions_past_threshold():
+    baseline = {"a/1000": {"rows_per_sec": 1000.0, "peak_rss_mb": 100.0},
+                "b/1000": {"rows_per_sec": 1000.0, "peak_rss_mb": 100.0}}
+    results = {"a/1000": {"rows_per_sec": 800.0, "peak_rss_mb": 120.0},
+               "b/1000": {"rows_per_sec": 700.0, "peak_rss_mb": 130.0},
+               "c/1000": {"rows_per_sec": 1.0, "peak_rss_mb": 1.0}}
+    regressions = compare(results, baseline, threshold=0.25)
+    assert len(regressions) == 2
+    assert all(regression.startswith("b/1000") for regression in regressions)
+
+def test_generator_import_skips_heavy_modules():
+    code = "import sys, chinese_qa_generator; print(sorted(m for m in ('pandas', 'openpyxl', 'faker') if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+def test_generators_share_vocabulary_tables():
+    first, second = ChineseQAGenerator(), ChineseQAGenerator()
+    assert first.question_templates is second.question_templates
+    assert first.answer_plans is second.answer_plans
+
+if __name__ == "__main__":
+    test_run_case_reports_throughput_and_rss()
+    test_compare_flags_only_regressions_past_threshold()
+    test_generator_import_skips_heavy_modules()
+    test_generators_share_vocabulary_tables()
+    print("All benchmark tests passed!")
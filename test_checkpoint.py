@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from chinese_qa_generator import ChineseQAGenerator
+from qa_checkpoint import CheckpointedRun, checkpoint_path
+from qa_sinks import JOURNAL_SUFFIX, SINK_FORMATS
+
+JOB = {"total_count": 500, "batch_size": 50}
+
+class Crash(Exception):
+    pass
+
+def run_job(filename, seed=None, crash_after=None, resume=False, append=False):
+    """The batch loop of batch_generator, optionally failing before batch `crash_after`."""
+    generator = ChineseQAGenerator(seed=seed)
+    run = CheckpointedRun(filename, JOB, every=2)
+    if resume:
+        assert run.resume(generator)
+    with generator.open_writer(filename, append=append, journal=True, state=run.session_state) as writer:
+        run.begin(generator, writer)
+        while run.rows_committed < JOB["total_count"]:
+            if run.batches == crash_after:
+                raise Crash
+            qa_pairs = generator.generate_qa_pairs(min(JOB["batch_size"], JOB["total_count"] - run.rows_committed))
+            run.after_batch(generator, writer, writer.write_batch(qa_pairs))
+    run.finish()
+
+def read_questions(filename):
+    return [row[0] for batch in SINK_FORMATS[filename.rsplit(".", 1)[1]].read_rows(filename) for row in batch]
+
+def test_resume_matches_uninterrupted_run():
+    for extension in ("xlsx", "csv"):
+        with tempfile.TemporaryDirectory() as tmp:
+            expected = os.path.join(tmp, "expected." + extension)
+            resumed = os.path.join(tmp, "resumed." + extension)
+            run_job(expected, seed=9)
+            try:
+                # Batch 5 reaches the output after the checkpoint at batch 4 and is dropped on resume
+                run_job(resumed, seed=9, crash_after=5)
+            except Crash:
+                pass
+            assert os.path.exists(checkpoint_path(resumed))
+            # The resumed generator's own seed does not matter; its state comes from the checkpoint
+            run_job(resumed, seed=1234, resume=True)
+
+            assert read_questions(resumed) == read_questions(expected)
+            assert len(set(read_questions(resumed))) == 500
+            assert not os.path.exists(checkpoint_path(resumed))
+            assert not os.path.exists(resumed + JOURNAL_SUFFIX)
+
+def test_resume_appending_run_skips_existing_questions():
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "append.xlsx")
+        generator = ChineseQAGenerator(seed=2)
+        generator.write_qa_pairs(generator.generate_qa_pairs(100), filename)
+        existing = read_questions(filename)
+        try:
+            run_job(filename, crash_after=3, append=True)
+        except Crash:
+            pass
+        # A rewritten format leaves the output untouched until the run finishes
+        assert read_questions(filename) == existing
+        run_job(filename, resume=True)
+
+        questions = read_questions(filename)
+        assert questions[:100] == existing
+        assert len(questions) == len(set(questions)) == 600
+
+def test_finalized_run_is_not_rewritten():
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "done.xlsx")
+        try:
+            run_job(filename, seed=4, crash_after=3)
+        except Crash:
+            pass
+        saved_checkpoint = filename + ".saved"
+        shutil.copy(checkpoint_path(filename), saved_checkpoint)
+        run_job(filename, seed=4, resume=True)
+        # As if the run had been killed after replacing the output but before removing the checkpoint
+        shutil.copy(saved_checkpoint, checkpoint_path(filename))
+
+        run = CheckpointedRun(filename, JOB)
+        assert run.resume(ChineseQAGenerator())
+        assert run.finalized
+
+if __name__ == "__main__":
+    test_resume_matches_uninterrupted_run()
+    test_resume_appending_run_skips_existing_questions()
+    test_finalized_run_is_not_rewritten()
+    print("All checkpoint tests passed!")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import os
+import tempfile
+from chinese_qa_generator import ChineseQAGenerator
+from qa_merge import MergeSource, iter_source_rows, merge_outputs
+from qa_metrics import Metrics
+from qa_sinks import HEADERS, qa_row
+from sidecar_index import SidecarIndex
+
+def read_questions(filename):
+    return [row[0] for batch in iter_source_rows(filename) for row in batch]
+
+def write_shards(tmp, qa_pairs):
+    """Three overlapping shards in different formats, plus rolling output."""
+    generator = ChineseQAGenerator(seed=21)
+    shards = {
+        "a.xlsx": qa_pairs[:300],
+        "b.csv": qa_pairs[200:500],
+        "c.jsonl": qa_pairs[:50] + qa_pairs[500:600],
+    }
+    paths = []
+    for name, pairs in shards.items():
+        paths.append(os.path.join(tmp, name))
+        with generator.open_writer(paths[-1]) as writer:
+            writer.write_batch(pairs)
+    # Writers drop repeats themselves, so add a repeat and a row without a question to the CSV by hand
+    with open(paths[1], "a", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows([qa_row(qa) for qa in qa_pairs[450:460]] + [("", "纯文本", "无问题")])
+    rolled = os.path.join(tmp, "rolled.xlsx")
+    with generator.open_rolling_writer(rolled, max_rows=100) as writer:
+        writer.write_batch(qa_pairs[550:800])
+    paths.append(os.path.join(tmp, "rolled.manifest.json"))
+    return paths
+
+def test_merge_drops_duplicates_per_source():
+    qa_pairs = ChineseQAGenerator(seed=20).generate_qa_pairs(800)
+    expected = [qa["标准问题"] for qa in qa_pairs]
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = write_shards(tmp, qa_pairs)
+        for name, engine in (("merged.xlsx", "native"), ("merged.csv", "openpyxl")):
+            output = os.path.join(tmp, name)
+            metrics = Metrics()
+            sources = merge_outputs(inputs, output, engine=engine, metrics=metrics)
+            assert sources == [
+                MergeSource(inputs[0], 300, 300, 0, 0),
+                MergeSource(inputs[1], 311, 200, 110, 1),
+                MergeSource(inputs[2], 150, 100, 50, 0),
+                MergeSource(inputs[3], 250, 200, 50, 0),
+            ]
+            # First occurrences in input order, which is the original order here
+            assert read_questions(output) == expected
+            assert next(iter_source_rows(output))[0] == qa_row(qa_pairs[0])
+            counters = metrics.snapshot()["counters"]
+            assert counters["rows_read"] == 1011 and counters["rows_written"] == 800
+            assert len(SidecarIndex.load(output)) == 800
+
+        # Appending keeps the output's rows and counts them as already written
+        sources = merge_outputs([inputs[2]], output, append=True)
+        assert sources == [MergeSource(inputs[2], 150, 0, 150, 0)]
+        assert read_questions(output) == expected
+
+def test_merge_rejects_output_among_inputs():
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "self.csv")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(",".join(HEADERS) + "\n")
+        for inputs in ([filename], [os.path.join(tmp, "missing.csv")]):
+            try:
+                merge_outputs(inputs, filename)
+                assert False, "expected an error"
+            except (ValueError, FileNotFoundError):
+                pass
+
+if __name__ == "__main__":
+    test_merge_drops_duplicates_per_source()
+    test_merge_rejects_output_among_inputs()
+    print("All merge tests passed!")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from chinese_qa_generator import ChineseQAGenerator
+from generate_size_excel import create_excel_with_size
+from qa_metrics import Metrics
+
+def test_generator_records_stages_and_counters():
+    generator = ChineseQAGenerator(seed=7, sidecar=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "metrics.xlsx")
+        with generator.open_writer(filename) as writer:
+            writer.write_batch(generator.generate_qa_pairs(200))
+        size = os.path.getsize(filename)
+
+    snapshot = generator.metrics.snapshot()
+    assert snapshot["counters"]["rows_generated"] == 200
+    assert snapshot["counters"]["rows_written"] == 200
+    assert snapshot["counters"]["bytes_written"] == size
+    assert snapshot["stages"]["sample"]["calls"] >= 200
+    assert snapshot["stages"]["answer"]["calls"] == 200
+    assert snapshot["stages"]["save"]["calls"] == 1
+
+def test_size_generator_records_saves():
+    metrics = Metrics()
+    with tempfile.TemporaryDirectory() as tmp:
+        total, _ = create_excel_with_size(0.1, os.path.join(tmp, "sized.xlsx"), seed=3, metrics=metrics)
+    assert metrics.counters["rows_generated"] == total
+    assert metrics.counters["saves"] == metrics.stage_calls["save"] >= 1
+    assert metrics.counters["bytes_written"] > 0
+    assert "calibrate" in metrics.stage_seconds
+
+def test_export_json_lines_and_prometheus():
+    metrics = Metrics()
+    metrics.incr("rows_written", 5)
+    with metrics.stage("save"):
+        pass
+    text = metrics.to_prometheus()
+    assert "qa_rows_written_total 5" in text
+    assert 'qa_stage_calls_total{stage="save"} 1' in text
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = os.path.join(tmp, "metrics.jsonl")
+        metrics.export(jsonl)
+        metrics.export(jsonl)
+        with open(jsonl, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) == 2 and lines[-1]["counters"]["rows_written"] == 5
+
+        prom = os.path.join(tmp, "metrics.prom")
+        metrics.export(prom)
+        metrics.export(prom)
+        with open(prom, encoding="utf-8") as f:
+            assert f.read().count("qa_rows_written_total 5") == 1
+        assert not os.path.exists(prom + ".tmp")
+
+def test_export_while_other_threads_record():
+    """A pipelined run exports on the writer thread while the producer adds new keys."""
+    metrics = Metrics()
+    exporting = threading.Event()
+
+    def record(thread):
+        exporting.wait()
+        for i in range(50000):
+            metrics.incr("rows")
+            metrics.add_time(f"stage_{thread}_{i}", 0.001)
+
+    threads = [threading.Thread(target=record, args=(thread,)) for thread in range(2)]
+    for thread in threads:
+        thread.start()
+    # Switch threads often enough to interleave with the exports' iteration
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        exporting.set()
+        while any(thread.is_alive() for thread in threads):
+            metrics.to_prometheus()
+            metrics.snapshot()
+    finally:
+        sys.setswitchinterval(interval)
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["rows"] == len(snapshot["stages"]) == 100000
+    assert sum(stage["calls"] for stage in snapshot["stages"].values()) == 100000
+
+if __name__ == "__main__":
+    test_generator_records_stages_and_counters()
+    test_size_generator_records_saves()
+    test_export_json_lines_and_prometheus()
+    test_export_while_other_threads_record()
+    print("All metrics tests passed!")
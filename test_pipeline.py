@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import time
+from openpyxl import load_workbook
+from chinese_qa_generator import ChineseQAGenerator
+from qa_pipeline import run_pipeline
+
+def read_questions(filename):
+    ws = load_workbook(filename, read_only=True).active
+    return [row[0] for row in ws.iter_rows(min_row=2, max_col=1, values_only=True)]
+
+def test_pipelined_matches_sequential():
+    with tempfile.TemporaryDirectory() as tmp:
+        sequential = os.path.join(tmp, "sequential.xlsx")
+        pipelined = os.path.join(tmp, "pipelined.xlsx")
+        generator = ChineseQAGenerator(seed=11, sidecar=False)
+        with generator.open_writer(sequential) as writer:
+            writer.write_stream(generator.iter_qa_pairs(950, chunk_size=100), batch_size=100)
+        generator = ChineseQAGenerator(seed=11, sidecar=False)
+        with generator.open_writer(pipelined) as writer:
+            written = writer.write_pipelined(generator.iter_qa_batches(100, count=950), queue_size=2)
+        assert written == 950
+        assert read_questions(pipelined) == read_questions(sequential)
+
+def test_producer_error_leaves_finalized_file():
+    generator = ChineseQAGenerator(seed=5, sidecar=False)
+
+    def batches():
+        yield from generator.iter_qa_batches(100, count=300)
+        raise KeyboardInterrupt
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "interrupted.xlsx")
+        try:
+            with generator.open_writer(filename) as writer:
+                writer.write_pipelined(batches())
+        except KeyboardInterrupt:
+            pass
+        else:
+            assert False, "the interrupt should propagate"
+        assert len(read_questions(filename)) == 300
+        assert not os.path.exists(filename + ".tmp")
+
+def test_writer_error_stops_producer():
+    produced = []
+
+    def batches():
+        for i in range(1000):
+            produced.append(i)
+            yield [i]
+
+    def write_batch(batch):
+        if batch[0] == 3:
+            raise OSError("disk full")
+        return len(batch)
+
+    try:
+        run_pipeline(batches(), write_batch, queue_size=2)
+    except OSError as e:
+        assert str(e) == "disk full"
+    else:
+        assert False, "the writer error should propagate"
+    assert len(produced) < 10
+
+def test_backpressure_bounds_queued_batches():
+    produced = []
+    lag = []
+
+    def batches():
+        for i in range(20):
+            produced.append(i)
+            yield [i]
+
+    def write_batch(batch):
+        time.sleep(0.005)
+        lag.append(len(produced) - batch[0])
+        return len(batch)
+
+    assert run_pipeline(batches(), write_batch, queue_size=3) == 20
+    # The queue, the batch being written and the batch waiting to be queued
+    assert max(lag) <= 3 + 2
+
+if __name__ == "__main__":
+    test_pipelined_matches_sequential()
+    test_producer_error_leaves_finalized_file()
+    test_writer_error_stops_producer()
+    test_backpressure_bounds_queued_batches()
+    print("All pipeline tests passed!")
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import tempfile
+from collections import Counter
+import numpy as np
+from chinese_qa_generator import MAX_ANSWER_LENGTH, ChineseQAGenerator
+from qa_sinks import JsonlSink
+from question_space import KeyedPermutation, QuestionSampler, QuestionSpace, QuestionSpaceExhausted
+
+def test_keyed_permutation_is_bijection():
+    """Every index in the range should appear exactly once."""
+    for size in (1, 2, 7, 121, 1000, 14520):
+        permutation = KeyedPermutation(size, key=42)
+        assert sorted(permutation[i] for i in range(size)) == list(range(size))
+        assert permutation.take(np.arange(size)).tolist() == [permutation[i] for i in range(size)]
+
+def test_question_space_is_exhausted_exactly():
+    """The generator should hand out every question once, then raise."""
+    templates = ["什么是{}？", "{}与{}有什么区别？"]
+    topics = ["云计算", "数据湖", "防火墙", "云计算"]
+    space = QuestionSpace(templates, topics)
+    assert space.size == 3 + 3 * 2
+
+    generator = ChineseQAGenerator()
+    generator.question_templates = templates
+    generator.all_topics = topics
+    questions = [generator.generate_unique_question() for _ in range(space.size)]
+    assert sorted(questions) == sorted(space.question(i) for i in range(space.size))
+
+    try:
+        generator.generate_unique_question()
+        assert False, "expected QuestionSpaceExhausted"
+    except QuestionSpaceExhausted:
+        pass
+
+def test_iter_qa_pairs_stops_when_space_is_used():
+    """Unbounded iteration should yield each question once and stop, even under the suffix policy."""
+    templates = ["什么是{}？", "{}与{}有什么区别？"]
+    topics = ["云计算", "数据湖", "防火墙"]
+    generator = ChineseQAGenerator(exhausted_policy="suffix")
+    generator.question_templates = templates
+    generator.all_topics = topics
+    generator.used_questions.add("什么是云计算？")
+
+    questions = [qa["标准问题"] for qa in generator.iter_qa_pairs()]
+    assert len(questions) == len(set(questions)) == 8
+    assert "什么是云计算？" not in questions
+
+    batches = list(ChineseQAGenerator().iter_qa_batches(4, count=9))
+    assert [len(batch) for batch in batches] == [4, 4, 1]
+
+def test_oversized_request_fails_up_front():
+    generator = ChineseQAGenerator()
+    try:
+        generator.generate_qa_pairs(generator.remaining_questions() + 1)
+        assert False, "expected QuestionSpaceExhausted"
+    except QuestionSpaceExhausted:
+        pass
+    assert len(generator.used_questions) == 0
+
+def small_generator(**kwargs):
+    generator = ChineseQAGenerator(**kwargs)
+    generator.question_templates = ["什么是{}？", "{}与{}有什么区别？"]
+    generator.all_topics = ["云计算", "数据湖", "防火墙", "容器"]
+    return generator
+
+def read_questions(filename):
+    return [row[0] for batch in JsonlSink.read_rows(filename) for row in batch]
+
+def test_append_counts_existing_questions_against_capacity():
+    """Questions already in an appended file leave fewer to draw, so an overflow fails before writing."""
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "small.jsonl")
+        with small_generator(seed=1).open_writer(filename) as writer:
+            writer.write_batch(small_generator(seed=1).generate_qa_pairs(10))
+            # Questions outside the space do not take anything from it
+            writer.write_values([("外部问题", "纯文本", "答案")])
+        existing = read_questions(filename)
+
+        generator = small_generator(seed=2)
+        try:
+            generator.open_writer(filename, append=True, count=7)
+            assert False, "expected QuestionSpaceExhausted"
+        except QuestionSpaceExhausted:
+            pass
+        assert read_questions(filename) == existing
+
+        generator = small_generator(seed=2)
+        with generator.open_writer(filename, append=True, count=6) as writer:
+            assert generator.remaining_questions() == 6
+            resumed = small_generator(seed=3)
+            resumed.set_state(generator.get_state())
+            assert resumed.remaining_questions() == 6
+            assert writer.write_batch(generator.generate_qa_pairs(3)) == 3
+            assert generator.remaining_questions() == 3
+            assert writer.write_batch(generator.generate_qa_pairs(3)) == 3
+        assert len(set(read_questions(filename))) == 17
+        try:
+            generator.generate_qa_pairs(1)
+            assert False, "expected QuestionSpaceExhausted"
+        except QuestionSpaceExhausted:
+            pass
+
+# Keyword order of the if-chain that answer plans replaced
+BASELINE_KEYWORDS = ("技术", "功能", "特点", "阶段", "影响", "方式", "架构", "算法", "协议", "标准")
+
+def baseline_answer(generator, rng, topic):
+    """generate_answer as it was before answer plans: re-check the keywords for every component."""
+    pattern = rng.choice(generator.answer_patterns)
+    components = []
+    for _ in range(pattern.count("{}") - 1):
+        keyword = next((keyword for keyword in BASELINE_KEYWORDS if keyword in pattern), None)
+        if keyword is not None:
+            components.append(rng.choice(generator.answer_components[keyword]))
+        else:
+            category = rng.choice(list(generator.topics.keys()))
+            components.append(rng.choice(generator.topics[category]))
+    answer = pattern.format(topic, *components)
+    return answer if len(answer) <= 200 else answer[:197] + "..."
+
+def test_answer_plans_pick_pools_per_pattern():
+    generator = ChineseQAGenerator()
+    category_pools = tuple(tuple(topics) for topics in generator.topics.values())
+    assert tuple(generator.answer_components) == BASELINE_KEYWORDS
+    assert [plan.pattern for plan in generator.answer_plans] == list(generator.answer_patterns)
+    keyword_plans = 0
+    for plan in generator.answer_plans:
+        assert plan.arity == plan.pattern.count("{}") - 1
+        keyword = next((keyword for keyword in BASELINE_KEYWORDS if keyword in plan.pattern), None)
+        expected = (tuple(generator.answer_components[keyword]),) if keyword else category_pools
+        assert plan.slots == (expected,) * plan.arity
+        keyword_plans += keyword is not None
+    assert 0 < keyword_plans < len(generator.answer_plans)
+
+def test_answer_plan_fits_bounds_rendered_length():
+    generator = ChineseQAGenerator()
+    longest = max(len(topic) for topic in generator.all_topics)
+    for plan in generator.answer_plans:
+        spare = MAX_ANSWER_LENGTH - plan.max_fixed_length
+        assert plan.fits(spare) and not plan.fits(spare + 1)
+        # Longest value in every slot: the worst case the plan was compiled for
+        components = [max((value for pool in pools for value in pool), key=len) for pools in plan.slots]
+        assert len(plan.pattern.format("题" * longest, *components)) <= plan.max_length(longest)
+    long_plan = generator.answer_plans[0]._replace(max_fixed_length=MAX_ANSWER_LENGTH)
+    assert len(generator._render_answer(long_plan, "题" * 10, ["甲" * 200] * long_plan.arity)) == MAX_ANSWER_LENGTH
+
+def test_answer_plans_keep_baseline_answer_order():
+    """Without topic slots, a seeded generator gives the answers of the old if-chain in the same order."""
+    generator = ChineseQAGenerator()
+    generator.answer_topic_slots = {}
+    generator.compile_answer_plans()
+    generator.rng = random.Random(5)
+    reference = random.Random(5)
+    for _ in range(2000):
+        assert generator.generate_answer("什么是云计算？") == baseline_answer(generator, reference, "云计算")
+
+def test_comparison_answers_reuse_both_topics():
+    """Answer patterns with topic slots put both topics of a comparison question into the answer."""
+    # Not in any answer pool, so they can only reach an answer through the question
+    topics = ["甲平台", "乙平台", "丙平台", "丁平台"]
+    generator = ChineseQAGenerator(seed=8)
+    generator.question_templates = [template for template in generator.question_templates if template.count("{}") == 2]
+    generator.all_topics = topics
+    generator.answer_patterns = list(generator.answer_topic_slots)
+    generator.compile_answer_plans()
+
+    for _ in range(20):
+        record = generator.generate_question_record()
+        first, second = (generator.question_space.topics[topic_id] for topic_id in record.topic_ids)
+        answer = generator.generate_answer(record.question, record)
+        assert answer.startswith(first) and second in answer, (record.question, answer)
+    for qa in generator.generate_qa_pairs(30):
+        question, answer = qa["标准问题"], qa["问题回答1"]
+        first, second = sorted((topic for topic in topics if topic in question), key=question.index)
+        assert answer.startswith(first) and second in answer, (question, answer)
+
+def test_parallel_generation_is_deterministic():
+    """Shards are disjoint and the same (seed, workers) gives the same rows."""
+    runs = []
+    for _ in range(2):
+        with ChineseQAGenerator(workers=2, seed=2024) as generator:
+            runs.append(generator.generate_qa_pairs(500) + generator.generate_qa_pairs(500))
+    assert runs[0] == runs[1]
+    questions = [qa["标准问题"] for qa in runs[0]]
+    assert len(set(questions)) == 1000
+
+def test_parallel_generation_skips_preloaded_questions():
+    """Shard rows that collide with an appended file's questions are replaced, not dropped."""
+    with ChineseQAGenerator(workers=2, seed=2024) as generator:
+        seeded = generator.generate_qa_pairs(500)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "preloaded.jsonl")
+        with JsonlSink(filename) as sink:
+            sink.write_rows(seeded[:300])
+        with ChineseQAGenerator(workers=2, seed=2024) as generator:
+            with generator.open_writer(filename, append=True, count=500):
+                qa_pairs = generator.generate_qa_pairs(500)
+            assert len(qa_pairs) == 500
+            questions = {qa["标准问题"] for qa in qa_pairs}
+            assert len(questions) == 500 and not questions & set(read_questions(filename)[:300])
+            assert generator.metrics.snapshot()["counters"]["collisions"] == 300
+            try:
+                generator.generate_qa_pairs(generator.remaining_questions() + 1)
+                assert False, "expected QuestionSpaceExhausted"
+            except QuestionSpaceExhausted:
+                pass
+
+def test_draw_batch_covers_space_once():
+    """Batches mixed with single draws should hand out every question once, then come back short."""
+    space = QuestionSpace(["什么是{}？", "{}与{}有什么区别？", "如何部署{}？"], ["云计算", "数据湖", "防火墙", "容器"])
+    sampler = QuestionSampler(space, key=7)
+    np_rng = np.random.default_rng(7)
+    questions = [space.render(*sampler.draw(random.Random(7)))]
+    while True:
+        template_ids, local_indices = sampler.draw_batch(5, np_rng)
+        firsts, seconds = space.decode_local_batch(template_ids, local_indices)
+        questions.extend(space.render_batch(template_ids, firsts, seconds))
+        if len(template_ids) < 5:
+            break
+    assert sorted(questions) == sorted(space.question(i) for i in range(space.size))
+    assert sampler.remaining == 0
+
+def test_batch_generation_matches_scalar_distribution():
+    """Template, answer plan and answer type frequencies of the batch path should match one-at-a-time draws."""
+    count = 20000
+    batch = ChineseQAGenerator(seed=1)
+    batch_pairs = batch.generate_qa_pairs(count)
+    scalar = ChineseQAGenerator(seed=1)
+    scalar_pairs = [scalar.generate_qa_pair() for _ in range(count)]
+    assert len({qa["标准问题"] for qa in batch_pairs}) == count
+
+    def shares(pairs, key):
+        counts = Counter(key(qa) for qa in pairs)
+        return {value: n / count for value, n in counts.items()}
+
+    answer_prefixes = {pattern.split("{}")[1][:4] for pattern in batch.answer_patterns}
+    for key in (lambda qa: qa["回答类型"],
+                lambda qa: qa["标准问题"][-3:],
+                lambda qa: next((p for p in answer_prefixes if p and p in qa["问题回答1"]), "")):
+        batch_shares, scalar_shares = shares(batch_pairs, key), shares(scalar_pairs, key)
+        for value in set(batch_shares) | set(scalar_shares):
+            assert abs(batch_shares.get(value, 0) - scalar_shares.get(value, 0)) < 0.02, value
+    assert max(len(qa["问题回答1"]) for qa in batch_pairs) <= 200
+
+if __name__ == "__main__":
+    test_keyed_permutation_is_bijection()
+    test_question_space_is_exhausted_exactly()
+    test_iter_qa_pairs_stops_when_space_is_used()
+    test_oversized_request_fails_up_front()
+    test_append_counts_existing_questions_against_capacity()
+    test_answer_plans_pick_pools_per_pattern()
+    test_answer_plan_fits_bounds_rendered_length()
+    test_answer_plans_keep_baseline_answer_order()
+    test_comparison_answers_reuse_both_topics()
+    test_parallel_generation_is_deterministic()
+    test_parallel_generation_skips_preloaded_questions()
+    test_draw_batch_covers_space_once()
+    test_batch_generation_matches_scalar_distribution()
+    print("All question space tests passed!")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+from openpyxl import load_workbook
+from chinese_qa_generator import ChineseQAGenerator
+from qa_rolling import iter_rolling_rows, read_manifest
+from qa_sinks import SHEET_TITLE, StreamingExcelSink, iter_existing_rows, qa_row
+from sidecar_index import SidecarIndex
+
+def test_rolls_files_by_row_count():
+    generator = ChineseQAGenerator(seed=6)
+    qa_pairs = generator.generate_qa_pairs(2500)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "rolled.xlsx")
+        with generator.open_rolling_writer(filename, max_rows=1000) as writer:
+            for start in range(0, 2500, 300):
+                writer.write_batch(qa_pairs[start:start + 300])
+            assert writer.write_batch(qa_pairs[:10]) == 0
+
+        manifest = read_manifest(filename)
+        assert manifest["complete"] and manifest["rows"] == 2500
+        assert [entry["file"] for entry in manifest["files"]] == ["rolled_0001.xlsx", "rolled_0002.xlsx", "rolled_0003.xlsx"]
+        assert [entry["rows"] for entry in manifest["files"]] == [[1, 1000], [1001, 2000], [2001, 2500]]
+        assert [entry["questions"] for entry in manifest["files"]] == [1000, 1000, 500]
+        rows = [row for batch in iter_rolling_rows(filename) for row in batch]
+        assert rows == [qa_row(qa) for qa in qa_pairs]
+        assert len(SidecarIndex.load(os.path.join(tmp, "rolled_0002.xlsx"))) == 1000
+
+def test_rolls_files_by_bytes():
+    generator = ChineseQAGenerator(seed=7)
+    qa_pairs = generator.generate_qa_pairs(1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "rolled.csv")
+        with generator.open_rolling_writer(filename, max_bytes=50000) as writer:
+            writer.write_batch(qa_pairs)
+
+        manifest = read_manifest(filename)
+        assert len(manifest["files"]) > 1
+        # Cell text only, so the files stay under the threshold plus the header and delimiters
+        for entry in manifest["files"]:
+            assert entry["bytes"] < 50000 * 1.2
+        assert [row[0] for batch in iter_rolling_rows(filename) for row in batch] == [qa["标准问题"] for qa in qa_pairs]
+
+def test_sheet_rolls_over_at_row_limit():
+    generator = ChineseQAGenerator(seed=8)
+    rows = [qa_row(qa) for qa in generator.generate_qa_pairs(250)]
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "sheets.xlsx")
+        with StreamingExcelSink(filename, sheet_rows=100) as sink:
+            sink.write_values(rows[:150])
+            sink.write_values(rows[150:])
+        assert sink.sheets == [[SHEET_TITLE, 100], [SHEET_TITLE + "_2", 100], [SHEET_TITLE + "_3", 50]]
+
+        wb = load_workbook(filename, read_only=True)
+        assert all(ws["A1"].value == "标准问题 (必填)" for ws in wb.worksheets)
+        wb.close()
+        assert [row for batch in iter_existing_rows(filename) for row in batch] == rows
+
+if __name__ == "__main__":
+    test_rolls_files_by_row_count()
+    test_rolls_files_by_bytes()
+    test_sheet_rolls_over_at_row_limit()
+    print("All rolling output tests passed!")
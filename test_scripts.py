@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from sidecar_index import SidecarIndex
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def run_script(name, cwd, *args):
+    """Run a script from `cwd`, where its default output files go; returns its printed output."""
+    result = subprocess.run([sys.executable, os.path.join(HERE, name), *args], cwd=cwd,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+def test_default_scripts_write_past_question_space():
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "chinese_qa_data100000.xlsx")
+        # 100,000 rows is more than the question space holds, so the defaults fall back to suffixes
+        assert "Error:" not in run_script("batch_generator.py", tmp)
+        assert SidecarIndex.load(filename).row_count == 100000
+
+        assert "Error:" not in run_script("append_qa.py", tmp)
+        rows = SidecarIndex.load(filename).row_count
+        assert rows > 100000
+
+        assert "Error:" in run_script("append_qa.py", tmp, "--exhausted-policy", "error")
+        assert SidecarIndex.load(filename).row_count == rows
+
+def test_generate_50000_appends_past_question_space():
+    with tempfile.TemporaryDirectory() as tmp:
+        # The file shipped with the repo leaves fewer than 50,000 unused questions
+        filename = shutil.copy(os.path.join(HERE, "chinese_qa_50000.xlsx"), tmp)
+        assert "Error:" in run_script("generate_50000_qa.py", tmp, "--exhausted-policy", "error")
+        assert not os.path.exists(filename + ".qidx")
+
+        assert "Error:" not in run_script("generate_50000_qa.py", tmp)
+        assert SidecarIndex.load(filename).row_count == 100000
+
+if __name__ == "__main__":
+    test_default_scripts_write_past_question_space()
+    test_generate_50000_appends_past_question_space()
+    print("All script tests passed!")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+from openpyxl import load_workbook
+from chinese_qa_generator import ChineseQAGenerator
+from sidecar_index import SidecarIndex
+from qa_sinks import SINK_FORMATS, read_first_rows
+
+try:
+    import pyarrow
+    TEXT_FORMATS = ["csv", "jsonl", "parquet"]
+except ImportError:
+    TEXT_FORMATS = ["csv", "jsonl"]
+
+def read_questions(filename):
+    ws = load_workbook(filename, read_only=True).active
+    return [row[0] for row in ws.iter_rows(min_row=2, max_col=1, values_only=True)]
+
+def test_streaming_matches_default_writer():
+    """Streaming and in-memory writers should produce the same sheet."""
+    generator = ChineseQAGenerator()
+    qa_pairs = generator.generate_qa_pairs(200)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        default_file = os.path.join(tmp, "default.xlsx")
+        streaming_file = os.path.join(tmp, "streaming.xlsx")
+        generator.write_to_excel(qa_pairs, default_file)
+        generator.write_to_excel(qa_pairs, streaming_file, streaming=True)
+
+        expected = load_workbook(default_file).active
+        actual = load_workbook(streaming_file).active
+        assert actual.title == expected.title
+        assert list(actual.values) == list(expected.values)
+        for column in "ABC":
+            assert actual.column_dimensions[column].width == expected.column_dimensions[column].width
+        assert actual["A1"].font.b
+        assert actual["A1"].fill.fgColor.rgb == expected["A1"].fill.fgColor.rgb
+
+def test_writer_session_appends_without_duplicates():
+    """A writer session should append batches once and skip questions already in the file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "session.xlsx")
+
+        generator = ChineseQAGenerator()
+        with generator.open_writer(filename) as writer:
+            for _ in range(3):
+                writer.write_batch(generator.generate_qa_pairs(100))
+        first_run = read_questions(filename)
+        assert len(first_run) == 300
+
+        generator = ChineseQAGenerator()
+        with generator.open_writer(filename, append=True) as writer:
+            written = writer.write_batch(generator.generate_qa_pairs(100))
+            assert writer.write_batch([{"标准问题": first_run[0], "回答类型": "纯文本", "问题回答1": "重复"}]) == 0
+
+        questions = read_questions(filename)
+        assert written == 100
+        assert questions[:300] == first_run
+        assert len(questions) == len(set(questions)) == 400
+
+def test_fingerprint_backend_dedups_appends():
+    """The compact fingerprint index should behave like the set backend for appends."""
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "fingerprint.xlsx")
+        generator = ChineseQAGenerator(dedup_backend="fingerprint")
+        qa_pairs = generator.generate_qa_pairs(200)
+        generator.write_to_excel(qa_pairs, filename)
+
+        generator = ChineseQAGenerator(dedup_backend="fingerprint")
+        with generator.open_writer(filename, append=True) as writer:
+            assert writer.write_batch(qa_pairs[:50]) == 0
+            assert all(qa["标准问题"] in generator.used_questions for qa in qa_pairs)
+            assert writer.write_batch(generator.generate_qa_pairs(100)) == 100
+
+        questions = read_questions(filename)
+        assert len(questions) == len(set(questions)) == 300
+
+def mapped_files(path):
+    """Memory mappings of `path` (or of a replaced file that had that name) held by this process."""
+    with open("/proc/self/maps") as f:
+        return [line for line in f if line.rstrip().split(" ", 5)[-1].strip().startswith(path)]
+
+def test_sidecar_index_is_used_and_invalidated():
+    """Appends should load the sidecar index while it matches the workbook, and scan once it doesn't."""
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "sidecar.xlsx")
+        generator = ChineseQAGenerator()
+        qa_pairs = generator.generate_qa_pairs(200)
+        generator.write_to_excel(qa_pairs, filename)
+        sidecar = SidecarIndex.load(filename)
+        assert len(sidecar) == sidecar.row_count == 200
+        sidecar.close()
+
+        generator = ChineseQAGenerator()
+        with generator.open_writer(filename, append=True) as writer:
+            assert isinstance(writer.existing, SidecarIndex)
+            assert writer.write_batch(qa_pairs[:50]) == 0
+            assert writer.write_batch(generator.generate_qa_pairs(100)) == 100
+        # The session unmaps the sidecar before replacing it; the generator keeps an in-memory copy
+        assert not isinstance(writer.existing, SidecarIndex)
+        assert not mapped_files(filename + ".qidx")
+        sidecar = SidecarIndex.load(filename)
+        assert len(sidecar) == sidecar.row_count == 300
+        sidecar.close()
+
+        # Rewriting the workbook without the sidecar leaves it stale
+        ChineseQAGenerator(sidecar=False).write_to_excel(qa_pairs[:10], filename)
+        assert SidecarIndex.load(filename) is None
+        with ChineseQAGenerator().open_writer(filename, append=True) as writer:
+            assert not isinstance(writer.existing, SidecarIndex)
+            assert writer.existing_count == 10
+
+        questions = read_questions(filename)
+        assert len(questions) == len(set(questions)) == 10
+
+def test_repeated_appends_release_sidecars():
+    """Appends count each question once and leave no sidecar mapped, even after it has been replaced."""
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "appends.xlsx")
+        generator = ChineseQAGenerator(seed=16)
+        for _ in range(5):
+            generator.write_to_excel(generator.generate_qa_pairs(50), filename, append=True)
+            assert not mapped_files(filename + ".qidx")
+        assert len(generator.used_questions) == 250
+        with generator.open_writer(filename, append=True) as writer:
+            writer.write_batch(generator.generate_qa_pairs(50))
+        assert len(generator.used_questions) == len(writer.questions) == 300
+        assert not mapped_files(filename + ".qidx")
+
+def test_other_formats_append_without_duplicates():
+    """CSV, JSONL and Parquet outputs should round-trip and dedup appends like xlsx."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for format in TEXT_FORMATS:
+            filename = os.path.join(tmp, f"qa.{format}")
+            generator = ChineseQAGenerator()
+            qa_pairs = generator.generate_and_save(count=100, filename=filename)
+
+            generator = ChineseQAGenerator()
+            with generator.open_writer(filename, append=True) as writer:
+                assert writer.existing_count == 100
+                assert writer.write_batch(qa_pairs[:10]) == 0
+                assert writer.write_batch(generator.generate_qa_pairs(50)) == 50
+
+            rows = [row for batch in SINK_FORMATS[format].read_rows(filename) for row in batch]
+            assert rows[:100] == [(qa["标准问题"], qa["回答类型"], qa["问题回答1"]) for qa in qa_pairs]
+            questions = [row[0] for row in rows]
+            assert len(questions) == len(set(questions)) == 150
+
+def test_append_widths_track_new_rows():
+    """Appends should widen columns from the new rows and keep exact maxima in the sidecar."""
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "widths.xlsx")
+        generator = ChineseQAGenerator()
+        generator.write_to_excel(generator.generate_qa_pairs(50), filename)
+        long_pair = {"标准问题": "长" * 30, "回答类型": "纯文本", "问题回答1": "短"}
+        generator.write_to_excel([long_pair], filename, append=True)
+        generator.write_to_excel(generator.generate_qa_pairs(5), filename, append=True, streaming=True)
+
+        ws = load_workbook(filename).active
+        rows = list(ws.values)
+        expected = [max(len(str(row[col])) for row in rows) for col in range(3)]
+        assert ws.column_dimensions["A"].width == min(expected[0] + 2, 50) == 32
+        sidecar = SidecarIndex.load(filename)
+        assert sidecar.column_lengths == expected
+        sidecar.close()
+
+def test_seeded_runs_are_byte_identical():
+    """Same seed and config should give the same file, byte for byte."""
+    with tempfile.TemporaryDirectory() as tmp:
+        contents = []
+        for run in range(2):
+            filename = os.path.join(tmp, f"seeded_{run}.xlsx")
+            ChineseQAGenerator(seed=99).generate_and_save(count=100, filename=filename)
+            with open(filename, "rb") as f:
+                contents.append(f.read())
+        assert contents[0] == contents[1]
+
+def test_read_first_rows_closes_workbook():
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "sample.xlsx")
+        qa_pairs = ChineseQAGenerator(seed=8).generate_and_save(count=20, filename=filename)
+        sample = read_first_rows(filename, 5)
+        assert [row[0] for row in sample] == [qa["标准问题"] for qa in qa_pairs[:5]]
+        # A suspended row generator would keep the zip file open
+        open_files = [os.path.realpath(os.path.join("/proc/self/fd", fd)) for fd in os.listdir("/proc/self/fd")
+                      if os.path.islink(os.path.join("/proc/self/fd", fd))]
+        assert os.path.realpath(filename) not in open_files
+
+if __name__ == "__main__":
+    test_streaming_matches_default_writer()
+    test_writer_session_appends_without_duplicates()
+    test_fingerprint_backend_dedups_appends()
+    test_sidecar_index_is_used_and_invalidated()
+    test_repeated_appends_release_sidecars()
+    test_other_formats_append_without_duplicates()
+    test_append_widths_track_new_rows()
+    test_seeded_runs_are_byte_identical()
+    test_read_first_rows_closes_workbook()
+    print("All sink tests passed!")
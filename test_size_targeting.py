@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import tempfile
+from collections import Counter
+from generate_size_excel import create_excel_with_size, generate_message_row, generate_message_rows
+from generate_fixed_size_excel import FixedSizeExcelGenerator
+from excel_truncate import PrefixSizes, SheetCopy, backup_path, truncate_workbook
+from qa_sinks import StreamingExcelSink
+from openpyxl import load_workbook
+
+def test_size_target_is_met_within_tolerance():
+    """Size-targeted files should land within the tolerance after at most two saves."""
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "sized.xlsx")
+        total, size_mb = create_excel_with_size(0.3, filename, seed=7, tolerance=0.01)
+        assert abs(size_mb - 0.3) <= 0.003
+        assert os.path.getsize(filename) == int(size_mb * 1024 * 1024)
+
+        generator = FixedSizeExcelGenerator(seed=7)
+        total, size_mb = generator.create_excel_with_size(0.3, filename, tolerance=0.02)
+        assert abs(size_mb - 0.3) <= 0.006
+
+def test_truncate_keeps_largest_fitting_prefix():
+    """Truncation should keep a prefix of the rows that ends just under the target."""
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "cut.xlsx")
+        create_excel_with_size(0.3, filename, seed=3)
+        original_size = os.path.getsize(filename)
+        original_rows = list(load_workbook(filename).active.values)
+
+        target = 200 * 1024
+        result = truncate_workbook(filename, target)
+        assert result.writes == 1
+        assert target - 200 < os.path.getsize(filename) <= target
+        assert os.path.getsize(result.backup_filename) == original_size
+        rows = list(load_workbook(filename).active.values)
+        assert len(rows) == result.final_rows
+        assert rows == original_rows[:len(rows)]
+
+def test_truncate_backup_names_and_multi_sheet_workbooks():
+    assert backup_path(os.path.join("runs.xlsx.d", "cut.xlsx")) == os.path.join("runs.xlsx.d", "cut_backup.xlsx")
+    assert backup_path("cut.xlsm") == "cut_backup.xlsm" and backup_path("cut") == "cut_backup"
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "runs.xlsx.d")
+        os.mkdir(directory)
+        filename = os.path.join(directory, "cut.xlsx")
+        create_excel_with_size(0.1, filename, seed=4)
+        # The step kept in memory for the target gives the same cut as reading the rows again
+        sheet = SheetCopy(filename)
+        measured = PrefixSizes(sheet, step=50)
+        for target in (60 * 1024, 80 * 1024, 90 * 1024):
+            assert PrefixSizes(sheet, step=50, target_bytes=target).largest_fitting(target) == measured.largest_fitting(target)
+        result = truncate_workbook(filename, 80 * 1024)
+        assert result.backup_filename == os.path.join(directory, "cut_backup.xlsx")
+        assert os.path.getsize(filename) <= 80 * 1024
+
+        # Rows beyond the first sheet would be dropped silently, so such workbooks are refused
+        sheets = os.path.join(tmp, "sheets.xlsx")
+        with StreamingExcelSink(sheets, sheet_rows=100) as sink:
+            sink.write_values([(f"问题{i}", "纯文本", "答案") for i in range(250)])
+        size = os.path.getsize(sheets)
+        try:
+            truncate_workbook(sheets, size // 2)
+            assert False, "expected a ValueError"
+        except ValueError:
+            pass
+        assert os.path.getsize(sheets) == size and sorted(os.listdir(tmp)) == ["runs.xlsx.d", "sheets.xlsx"]
+
+def test_batch_message_rows_match_scalar_distribution():
+    count = 20000
+    rng = random.Random(5)
+    batch_rows = generate_message_rows(count, rng)
+    scalar_rows = [generate_message_row(rng) for _ in range(count)]
+    assert all(isinstance(value, str) for value in batch_rows[0])
+
+    features = [lambda row: row[2], lambda row: row[4], lambda row: row[3][5:7],
+                lambda row: "这种" in row[1], lambda row: "通过" in row[1]]
+    for feature in features:
+        batch_counts = Counter(map(feature, batch_rows))
+        scalar_counts = Counter(map(feature, scalar_rows))
+        for value in set(batch_counts) | set(scalar_counts):
+            assert abs(batch_counts[value] - scalar_counts[value]) / count < 0.02, value
+    assert set(row[0][:4] for row in batch_rows) == {"MSG_"}
+
+if __name__ == "__main__":
+    test_size_target_is_met_within_tolerance()
+    test_truncate_keeps_largest_fitting_prefix()
+    test_truncate_backup_names_and_multi_sheet_workbooks()
+    test_batch_message_rows_match_scalar_distribution()
+    print("All size targeting tests passed!")
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import tempfile
+import zipfile
+from openpyxl import load_workbook
+from chinese_qa_generator import ChineseQAGenerator
+from generate_size_excel import create_excel_with_size
+from excel_truncate import truncate_workbook
+from qa_metrics import Metrics
+from qa_sinks import HEADERS, NativeExcelSink, SHEET_TITLE, iter_existing_rows, qa_row
+import xlsx_writer
+from xlsx_writer import XlsxWriter
+
+def test_native_engine_matches_openpyxl_output():
+    generator = ChineseQAGenerator(seed=11)
+    qa_pairs = generator.generate_qa_pairs(300)
+    with tempfile.TemporaryDirectory() as tmp:
+        expected = os.path.join(tmp, "openpyxl.xlsx")
+        native = os.path.join(tmp, "native.xlsx")
+        generator.write_to_excel(qa_pairs, expected)
+        generator.write_to_excel(qa_pairs, native, engine="native")
+        generator.write_to_excel(qa_pairs[:10] + generator.generate_qa_pairs(50), native, append=True, engine="native")
+
+        wb_expected, wb_native = load_workbook(expected), load_workbook(native)
+        ws_expected, ws_native = wb_expected.active, wb_native.active
+        assert ws_native.title == SHEET_TITLE
+        assert list(ws_native.values)[:301] == list(ws_expected.values)
+        assert ws_native.max_row == 351
+        for col in "ABC":
+            assert ws_native.column_dimensions[col].width == ws_expected.column_dimensions[col].width
+            header, reference = ws_native[f"{col}1"], ws_expected[f"{col}1"]
+            assert header.font.b and header.fill.fgColor.rgb == reference.fill.fgColor.rgb
+            assert header.alignment.horizontal == "center"
+
+def test_writer_cells_sheets_and_shared_strings():
+    rows = [("a & <b>", 1, 2.5), (" padded ", True, None), ("a & <b>", -3, 1e20)]
+    outputs = []
+    for strings in ("inline", "shared"):
+        target = io.BytesIO()
+        with XlsxWriter(target, deterministic=True, strings=strings) as writer:
+            writer.add_sheet("数据", ["文本", "数字", "其他"], [30, 10, 12])
+            writer.append_rows(rows)
+            writer.add_sheet("第二页")
+            writer.append_rows([("x",)])
+        wb = load_workbook(target)
+        assert wb.sheetnames == ["数据", "第二页"]
+        assert list(wb["数据"].values)[1:] == rows
+        assert wb["数据"]["A1"].font.b and wb["数据"].column_dimensions["A"].width == 30
+        assert wb["第二页"]["A1"].value == "x"
+        outputs.append(target.getvalue())
+    assert len(writer.shared_strings) == 6 and writer.shared_string_refs == 7
+
+    again = io.BytesIO()
+    with XlsxWriter(again, deterministic=True, strings="shared") as writer:
+        writer.add_sheet("数据", ["文本", "数字", "其他"], [30, 10, 12])
+        writer.append_rows(rows)
+        writer.add_sheet("第二页")
+        writer.append_rows([("x",)])
+    assert again.getvalue() == outputs[1]
+
+def test_dictionary_encoding_caps_unique_columns():
+    rows = [qa_row(qa) for qa in ChineseQAGenerator(seed=13).generate_qa_pairs(3000)]
+    inline, shared = io.BytesIO(), io.BytesIO()
+    for target, strings in ((inline, "inline"), (shared, "shared")):
+        with XlsxWriter(target, deterministic=True, strings=strings, column_strings=100) as writer:
+            writer.add_sheet(SHEET_TITLE, HEADERS)
+            writer.append_rows(rows)
+    # Questions and answers stop at 100 strings each (header included); both answer types are stored once
+    assert len(writer.shared_strings) == 100 + 3 + 100
+    assert writer.shared_string_refs > 3000 + 100 + 100
+    assert list(load_workbook(shared).active.values)[1:] == rows
+    assert len(shared.getvalue()) < len(inline.getvalue())
+
+def write_blocks(target, rows, workers):
+    with XlsxWriter(target, deterministic=True, workers=workers, block_rows=700) as writer:
+        writer.add_sheet(SHEET_TITLE, HEADERS, [30, 20, 50], center_header=True)
+        for start in range(0, len(rows), 500):
+            writer.append_rows(rows[start:start + 500])
+        writer.add_sheet("第二页")
+        writer.append_rows(rows[:10])
+
+def test_parallel_rendering_stitches_blocks():
+    rows = [qa_row(qa) for qa in ChineseQAGenerator(seed=14).generate_qa_pairs(3000)]
+    outputs = {}
+    for workers in (1, 2, 3):
+        outputs[workers] = io.BytesIO()
+        write_blocks(outputs[workers], rows, workers)
+    # Blocks do not depend on the number of workers, and hold the same XML as one deflate stream
+    assert outputs[2].getvalue() == outputs[3].getvalue()
+    sequential, parallel = zipfile.ZipFile(outputs[1]), zipfile.ZipFile(outputs[2])
+    assert parallel.testzip() is None
+    for part in ("xl/worksheets/sheet1.xml", "xl/worksheets/sheet2.xml", "xl/sharedStrings.xml"):
+        assert parallel.read(part) == sequential.read(part)
+    wb = load_workbook(outputs[2], read_only=True)
+    assert list(wb[SHEET_TITLE].iter_rows(min_row=2, values_only=True)) == rows
+    assert list(wb["第二页"].iter_rows(values_only=True)) == rows[:10]
+    wb.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "bad.xlsx")
+        try:
+            write_blocks(filename, rows + [("坏\x00问题", "纯文本", "答案")], workers=2)
+            assert False, "expected a ValueError"
+        except ValueError:
+            pass
+        assert os.listdir(tmp) == []
+
+def test_zip64_records_round_trip():
+    rows = [qa_row(qa) for qa in ChineseQAGenerator(seed=15).generate_qa_pairs(1500)]
+    limit = xlsx_writer._ZIP64_LIMIT
+    for workers in (1, 2):
+        small, large = io.BytesIO(), io.BytesIO()
+        write_blocks(small, rows, workers)
+        # Offsets and sizes past a lowered limit take the zip64 extra fields and end records
+        xlsx_writer._ZIP64_LIMIT = 1000
+        try:
+            write_blocks(large, rows, workers)
+        finally:
+            xlsx_writer._ZIP64_LIMIT = limit
+        assert b"PK\x06\x06" in large.getvalue() and b"PK\x06\x06" not in small.getvalue()
+        small_zip, large_zip = zipfile.ZipFile(small), zipfile.ZipFile(large)
+        assert small_zip.testzip() is None and large_zip.testzip() is None
+        assert large_zip.namelist() == small_zip.namelist()
+        assert all(large_zip.read(name) == small_zip.read(name) for name in small_zip.namelist())
+        wb = load_workbook(large, read_only=True)
+        assert list(wb[SHEET_TITLE].iter_rows(min_row=2, values_only=True)) == rows
+        wb.close()
+
+def test_native_sheets_and_size_targeting():
+    generator = ChineseQAGenerator(seed=12)
+    rows = [qa_row(qa) for qa in generator.generate_qa_pairs(250)]
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "sheets.xlsx")
+        with NativeExcelSink(filename, sheet_rows=100) as sink:
+            sink.write_values(rows)
+        assert [rows for _, rows in sink.sheets] == [100, 100, 50]
+        assert [row for batch in iter_existing_rows(filename) for row in batch] == rows
+        wb = load_workbook(filename, read_only=True)
+        assert all(tuple(next(ws.values)) == tuple(HEADERS) for ws in wb.worksheets)
+        wb.close()
+
+        sized = os.path.join(tmp, "sized.xlsx")
+        metrics = Metrics()
+        total, size_mb = create_excel_with_size(0.3, sized, seed=7, tolerance=0.01, metrics=metrics, engine="native")
+        assert abs(size_mb - 0.3) <= 0.003
+        # Calibrating past the shared-strings warmup lands the first save within tolerance
+        assert metrics.snapshot()["counters"]["saves"] == 1
+        assert len(list(load_workbook(sized).active.values)) == total + 1
+        result = truncate_workbook(sized, 200 * 1024)
+        assert os.path.getsize(sized) <= 200 * 1024
+        assert len(list(load_workbook(sized).active.values)) == result.final_rows
+
+if __name__ == "__main__":
+    test_native_engine_matches_openpyxl_output()
+    test_writer_cells_sheets_and_shared_strings()
+    test_dictionary_encoding_caps_unique_columns()
+    test_parallel_rendering_stitches_blocks()
+    test_zip64_records_round_trip()
+    test_native_sheets_and_size_targeting()
+    print("All xlsx writer tests passed!")
@@ -0,0 +1,656 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Native streaming xlsx writer.
+
+openpyxl builds a Cell object and style proxy for every value. This writer formats each batch
+of rows straight into SpreadsheetML and deflates it into the open zip member, so nothing per
+cell outlives the batch. It covers what the Q&A and message workbooks use: a bold, filled
+(optionally centred) header row, column widths, several sheets, and text, number and boolean
+cells, with text stored inline (as openpyxl's write-only mode does) or dictionary-encoded in a
+shared-strings table, which keeps each repeated value once and makes the sheet XML smaller to
+compress.
+"""
+
+import datetime
+import os
+import re
+import sys
+import struct
+import zlib
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from reproducible import FIXED_TIMESTAMP, replace_file
+
+XLSX_ENGINES = ("openpyxl", "native")
+STRING_MODES = ("inline", "shared")
+HEADER_COLOR = "0090EE90"
+# Distinct strings one column may add to the shared-strings table, and the table's total size.
+# Low-cardinality columns (answer types, message levels) never reach the column cap; unique
+# columns (questions, message IDs) reach it early and store their remaining values inline.
+DEFAULT_COLUMN_STRINGS = 256
+DEFAULT_MAX_SHARED_STRINGS = 65536
+# Rows formatted before they are encoded and handed to the compressor
+FLUSH_ROWS = 5000
+# Rows per block rendered by one worker process in parallel mode
+DEFAULT_BLOCK_ROWS = 20000
+_NEVER = sys.maxsize
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+# Control characters XML 1.0 cannot carry; openpyxl refuses them too
+_ILLEGAL_CHARACTERS = re.compile(r"[\000-\010\013\014\016-\037]")
+
+# Cell style ids in styles.xml: 0 default, 1 bold filled header, 2 the same centred
+_STYLES = (
+    _XML_DECLARATION +
+    f'<styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="2">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/><scheme val="minor"/></font>'
+    '<font><b val="1"/><sz val="11"/><name val="Calibri"/><family val="2"/><scheme val="minor"/></font>'
+    '</fonts>'
+    '<fills count="3"><fill><patternFill/></fill><fill><patternFill patternType="gray125"/></fill>'
+    f'<fill><patternFill patternType="solid"><fgColor rgb="{HEADER_COLOR}"/><bgColor rgb="{HEADER_COLOR}"/>'
+    '</patternFill></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="2" borderId="0" xfId="0" applyFont="1" applyFill="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="2" borderId="0" xfId="0" applyFont="1" applyFill="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="center"/></xf>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def column_letter(index: int) -> str:
+    """Excel column letters for a 1-based column index (1 -> A, 27 -> AA)."""
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+_LETTERS: List[str] = []
+
+
+def _column_letters(count: int) -> List[str]:
+    while len(_LETTERS) < count:
+        _LETTERS.append(column_letter(len(_LETTERS) + 1))
+    return _LETTERS
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _attribute(text: str) -> str:
+    return _escape(text).replace('"', "&quot;")
+
+
+def _text_element(text: str) -> str:
+    """<t> element for `text`, keeping leading and trailing whitespace."""
+    escaped = _escape(text)
+    if text != text.strip():
+        return f'<t xml:space="preserve">{escaped}</t>'
+    return f"<t>{escaped}</t>"
+
+
+def _cell(ref: str, value, style: str) -> str:
+    """<c> element for a value stored in the cell itself."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, int):
+        return f'<c r="{ref}"{style} t="n"><v>{value}</v></c>'
+    if isinstance(value, float):
+        return f'<c r="{ref}"{style} t="n"><v>{"%.16g" % value}</v></c>'
+    text = value if isinstance(value, str) else str(value)
+    return f'<c r="{ref}"{style} t="inlineStr"><is>{_text_element(text)}</is></c>'
+
+
+def render_rows(rows: Sequence[Sequence], first_row: int, style: str = "", shared: Optional[Dict[str, int]] = None,
+                inline_from: Sequence[int] = ()) -> str:
+    """
+    Sheet XML of `rows`, numbered from `first_row`.
+
+    With `shared`, text in column c of row r is written as its index in `shared` while
+    r < inline_from[c], and inline after that (XlsxWriter decides both); without it every
+    value is inline.
+    """
+    letters = _column_letters(max(map(len, rows), default=0))
+    parts = []
+    for row_number, row in enumerate(rows, first_row):
+        parts.append(f'<row r="{row_number}">')
+        for column, value in enumerate(row):
+            if type(value) is str:
+                if shared is not None and row_number < inline_from[column]:
+                    parts.append(f'<c r="{letters[column]}{row_number}"{style} t="s"><v>{shared[value]}</v></c>')
+                else:
+                    parts.append(f'<c r="{letters[column]}{row_number}"{style} t="inlineStr">'
+                                 f'<is>{_text_element(value)}</is></c>')
+            else:
+                parts.append(_cell(f"{letters[column]}{row_number}", value, style))
+        parts.append("</row>")
+    text = "".join(parts)
+    # Markup and numbers never contain control characters, so one scan covers every text cell
+    illegal = _ILLEGAL_CHARACTERS.search(text)
+    if illegal:
+        raise ValueError(f"a cell contains a control character that cannot be stored in xlsx: "
+                         f"{text[max(illegal.start() - 40, 0):illegal.end() + 40]!r}")
+    return text
+
+
+def deflate_block(text: str, final: bool = False) -> Tuple[bytes, int, int]:
+    """
+    (raw deflate, CRC-32, length) of `text` compressed on its own, as zipfile would.
+
+    A block that is not `final` ends on a byte boundary without closing the stream, so blocks
+    deflated separately (and in any process) concatenate into one valid member.
+    """
+    data = text.encode("utf-8")
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+    return compressed, zlib.crc32(data), len(data)
+
+
+def _render_block(task: tuple) -> Tuple[bytes, int, int]:
+    rows, first_row, style, shared, inline_from = task
+    return deflate_block(render_rows(rows, first_row, style, shared, inline_from))
+
+
+def _gf2_times(matrix: List[int], vector: int) -> int:
+    total = 0
+    row = 0
+    while vector:
+        if vector & 1:
+            total ^= matrix[row]
+        vector >>= 1
+        row += 1
+    return total
+
+
+def _gf2_square(matrix: List[int]) -> List[int]:
+    return [_gf2_times(matrix, matrix[n]) for n in range(32)]
+
+
+def crc32_combine(crc1: int, crc2: int, length2: int) -> int:
+    """CRC-32 of A + B from crc32(A), crc32(B) and len(B), as zlib's crc32_combine()."""
+    if length2 <= 0:
+        return crc1
+    # Operators that append one and two zero bits to a CRC, squared up to the bits of length2 in bytes
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = _gf2_square(odd)
+    odd = _gf2_square(even)
+    while True:
+        even = _gf2_square(odd)
+        if length2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        length2 >>= 1
+        if not length2:
+            break
+        odd = _gf2_square(even)
+        if length2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        length2 >>= 1
+        if not length2:
+            break
+    return crc1 ^ crc2
+
+
+# Zip records (APPNOTE 4.3): local file header, central directory entry, end of central directory
+# and its zip64 forms. Members are deflated with data descriptors off; sizes past ZIP64_LIMIT
+# go in a zip64 extra field, which every local header carries so it can be rewritten in place.
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5HLL")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_END_RECORD64 = struct.Struct("<4sQ2H2L4Q")
+_END_LOCATOR64 = struct.Struct("<4sLQL")
+_ZIP64_LIMIT = (1 << 31) - 1
+_ZIP64_VERSION = 45
+_MADE_BY_UNIX = 3
+
+
+class _ZipMember:
+    """
+    Deflated zip member written as separately deflated blocks (see deflate_block), in order.
+
+    The local header is written first and rewritten with the sizes and combined CRC on close,
+    and the member is then listed in the archive's central directory.
+    """
+
+    def __init__(self, archive: "_ZipArchive", name: str):
+        self._archive = archive
+        self.name = name.encode("ascii")
+        self.crc = self.file_size = self.compress_size = 0
+        self.header_offset = archive.fp.tell()
+        archive.fp.write(self._local_header())
+
+    def _local_header(self) -> bytes:
+        extra = struct.pack("<HHQQ", 1, 16, self.file_size, self.compress_size)
+        dos_time, dos_date = self._archive.dos_date_time
+        return _LOCAL_HEADER.pack(b"PK\003\004", _ZIP64_VERSION, 0, 0, zlib.DEFLATED, dos_time, dos_date, self.crc,
+                                  0xFFFFFFFF, 0xFFFFFFFF, len(self.name), len(extra)) + self.name + extra
+
+    def central_header(self) -> bytes:
+        sizes = (self.compress_size, self.file_size)
+        zip64 = []
+        if max(sizes) > _ZIP64_LIMIT:
+            zip64 = [self.file_size, self.compress_size]
+            sizes = (0xFFFFFFFF, 0xFFFFFFFF)
+        offset = self.header_offset
+        if offset > _ZIP64_LIMIT:
+            zip64.append(offset)
+            offset = 0xFFFFFFFF
+        extra = struct.pack(f"<HH{len(zip64)}Q", 1, 8 * len(zip64), *zip64) if zip64 else b""
+        dos_time, dos_date = self._archive.dos_date_time
+        return _CENTRAL_HEADER.pack(b"PK\001\002", _ZIP64_VERSION, _MADE_BY_UNIX, _ZIP64_VERSION, 0, 0, zlib.DEFLATED,
+                                    dos_time, dos_date, self.crc, *sizes, len(self.name), len(extra), 0, 0, 0,
+                                    0o600 << 16, offset) + self.name + extra
+
+    def write_block(self, block: Tuple[bytes, int, int]):
+        compressed, crc, length = block
+        self._archive.fp.write(compressed)
+        self.crc = crc32_combine(self.crc, crc, length)
+        self.file_size += length
+        self.compress_size += len(compressed)
+
+    def close(self):
+        fp = self._archive.fp
+        end = fp.tell()
+        fp.seek(self.header_offset)
+        fp.write(self._local_header())
+        fp.seek(end)
+        self._archive.members.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class _DeflateMember(_ZipMember):
+    """Zip member deflated as one stream from the bytes passed to write()."""
+
+    def __init__(self, archive: "_ZipArchive", name: str):
+        super().__init__(archive, name)
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+
+    def write(self, data: bytes):
+        self.crc = zlib.crc32(data, self.crc)
+        self.file_size += len(data)
+        self._write_compressed(self._compressor.compress(data))
+
+    def _write_compressed(self, compressed: bytes):
+        self._archive.fp.write(compressed)
+        self.compress_size += len(compressed)
+
+    def close(self):
+        self._write_compressed(self._compressor.flush())
+        super().close()
+
+
+class _ZipArchive:
+    """
+    Zip archive written member by member to a seekable file, with the same records zipfile
+    writes for deflated members opened with force_zip64=True.
+    """
+
+    def __init__(self, fp, date_time: Tuple[int, ...]):
+        if not fp.seekable():
+            raise ValueError("the native xlsx writer needs a seekable target")
+        self.fp = fp
+        self.members = []
+        self.dos_date_time = (date_time[3] << 11 | date_time[4] << 5 | date_time[5] // 2,
+                              (date_time[0] - 1980) << 9 | date_time[1] << 5 | date_time[2])
+
+    def open(self, name: str) -> _DeflateMember:
+        return _DeflateMember(self, name)
+
+    def open_blocks(self, name: str) -> _ZipMember:
+        return _ZipMember(self, name)
+
+    def close(self):
+        """Write the central directory and end records."""
+        fp = self.fp
+        start = fp.tell()
+        for member in self.members:
+            fp.write(member.central_header())
+        end = fp.tell()
+        count, size, offset = len(self.members), end - start, start
+        if count > 0xFFFF or offset > _ZIP64_LIMIT or size > _ZIP64_LIMIT:
+            fp.write(_END_RECORD64.pack(b"PK\006\006", 44, _ZIP64_VERSION, _ZIP64_VERSION, 0, 0, count, count,
+                                        size, offset))
+            fp.write(_END_LOCATOR64.pack(b"PK\006\007", 0, end, 1))
+            count, size, offset = min(count, 0xFFFF), min(size, 0xFFFFFFFF), min(offset, 0xFFFFFFFF)
+        fp.write(_END_RECORD.pack(b"PK\005\006", 0, 0, count, count, size, offset, 0))
+
+
+class XlsxWriter:
+    """
+    Write-once xlsx file written sheet by sheet.
+
+    Call add_sheet() and then append_rows() any number of times; adding another sheet
+    finishes the previous one. `strings` picks how text cells are stored: "inline" in the
+    cell, or "shared" (dictionary encoding) as an index into one table written on close. Each
+    column adds at most `column_strings` distinct values to the table and the table holds at
+    most `max_shared_strings`; a column's text is stored inline from its first value that
+    does not fit, so a column of unique questions does not grow the table while answer types
+    and message levels are stored once. A path target is written to a temporary file that
+    replaces it on close; with deterministic=True identical content gives a byte-identical file.
+
+    With workers > 1, data rows are rendered and deflated `block_rows` at a time in a process
+    pool and the blocks are stitched into the sheet in order; the file is the same for any
+    number of workers above one.
+    """
+
+    def __init__(self, target, deterministic: bool = False, strings: str = "shared",
+                 column_strings: int = DEFAULT_COLUMN_STRINGS, max_shared_strings: int = DEFAULT_MAX_SHARED_STRINGS,
+                 workers: int = 1, block_rows: int = DEFAULT_BLOCK_ROWS):
+        if strings not in STRING_MODES:
+            raise ValueError(f"strings must be one of {STRING_MODES}")
+        self.target = target
+        self.deterministic = deterministic
+        self.strings = strings
+        self.column_strings = column_strings
+        self.max_shared_strings = max_shared_strings
+        self.workers = workers
+        self.block_rows = block_rows
+        self.sheets = []
+        self.shared_strings = {}
+        self.shared_string_refs = 0
+        timestamp = FIXED_TIMESTAMP if deterministic else datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        self._timestamp = timestamp
+        self._tmp_filename = None
+        self._file = None
+        if isinstance(target, (str, os.PathLike)):
+            self._tmp_filename = os.fspath(target) + ".tmp"
+            target = self._file = open(self._tmp_filename, "wb")
+        self._zip = _ZipArchive(target, timestamp.timetuple()[:6])
+        self._stream = None
+        self._next_row = 1
+        self._column_strings = []
+        # Per column, the first row whose text is stored inline; _NEVER while it still uses the table
+        self._inline_from = []
+        self._pending = []
+        self._in_flight = deque()
+        self._pool = None
+        self.closed = False
+
+    def _write_member(self, name: str, text: str):
+        with self._zip.open(name) as member:
+            member.write(text.encode("utf-8"))
+
+    @property
+    def parallel(self) -> bool:
+        return self.workers > 1
+
+    def _write_text(self, text: str):
+        if self.parallel:
+            self._stream.write_block(deflate_block(text))
+        else:
+            self._stream.write(text.encode("utf-8"))
+
+    def add_sheet(self, title: str, headers: Sequence[str] = (), column_widths: Sequence[float] = (),
+                  center_header: bool = False):
+        """Start a new sheet with optional column widths and a styled header row."""
+        self._finish_sheet()
+        self.sheets.append(title)
+        name = f"xl/worksheets/sheet{len(self.sheets)}.xml"
+        self._stream = self._zip.open_blocks(name) if self.parallel else self._zip.open(name)
+        self._next_row = 1
+        # Rows are numbered per sheet; columns already past their cap stay inline throughout
+        self._inline_from = [0 if limit != _NEVER else _NEVER for limit in self._inline_from]
+        selected = ' tabSelected="1"' if len(self.sheets) == 1 else ""
+        parts = [_XML_DECLARATION, f'<worksheet xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">',
+                 f'<sheetViews><sheetView{selected} workbookViewId="0"/></sheetViews>',
+                 '<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/>']
+        if column_widths:
+            parts.append("<cols>")
+            parts.extend(f'<col min="{col}" max="{col}" width="{width:g}" customWidth="1"/>'
+                         for col, width in enumerate(column_widths, 1))
+            parts.append("</cols>")
+        parts.append("<sheetData>")
+        self._write_text("".join(parts))
+        if headers:
+            self.append_rows([headers], style=2 if center_header else 1)
+
+    def _share_strings(self, rows: Sequence[Sequence], first_row: int) -> Optional[Dict[str, int]]:
+        """
+        Add the new text of `rows` to the shared-strings table, in row order, and return the
+        entries the rows refer to (None when strings are inline). Columns that hit their cap,
+        or every column once the table is full, get their inline_from row set.
+        """
+        if self.strings != "shared":
+            return None
+        table, counts, inline_from = self.shared_strings, self._column_strings, self._inline_from
+        used = {}
+        refs = 0
+        active = [column for column, limit in enumerate(inline_from) if limit == _NEVER]
+        for row_number, row in enumerate(rows, first_row):
+            if len(row) > len(inline_from):
+                counts.extend([0] * (len(row) - len(inline_from)))
+                inline_from.extend([_NEVER] * (len(row) - len(inline_from)))
+                active = [column for column, limit in enumerate(inline_from) if limit == _NEVER]
+            changed = False
+            for column in active:
+                if column >= len(row):
+                    break
+                value = row[column]
+                if type(value) is not str or row_number >= inline_from[column]:
+                    continue
+                index = table.get(value)
+                if index is None:
+                    if counts[column] >= self.column_strings:
+                        inline_from[column] = row_number
+                        changed = True
+                        continue
+                    if len(table) >= self.max_shared_strings:
+                        # Cells before this one in the row already refer to the table
+                        for other in active:
+                            inline_from[other] = row_number + 1 if other < column else row_number
+                        changed = True
+                        continue
+                    if _ILLEGAL_CHARACTERS.search(value):
+                        raise ValueError(f"a cell contains a control character that cannot be stored in xlsx: {value!r}")
+                    index = table[value] = len(table)
+                    counts[column] += 1
+                used[value] = index
+                refs += 1
+            if changed:
+                active = [column for column in active if inline_from[column] == _NEVER]
+        self.shared_string_refs += refs
+        return used
+
+    def append_rows(self, rows: Sequence[Sequence], style: int = 0):
+        """Append rows of cell values (str, int, float, bool or None) to the current sheet."""
+        if self._stream is None:
+            raise ValueError("add_sheet() must be called before append_rows()")
+        if self.parallel and not style:
+            self._pending.extend(rows)
+            while len(self._pending) >= self.block_rows:
+                block = self._pending[:self.block_rows]
+                del self._pending[:self.block_rows]
+                self._submit(block)
+            return
+        self._flush_pending()
+        style = f' s="{style}"' if style else ""
+        for start in range(0, len(rows), FLUSH_ROWS):
+            chunk = rows[start:start + FLUSH_ROWS]
+            shared = self._share_strings(chunk, self._next_row)
+            self._write_text(render_rows(chunk, self._next_row, style, shared, self._inline_from))
+            self._next_row += len(chunk)
+
+    def _submit(self, block: List[Sequence]):
+        """Hand a block of data rows to the pool, writing finished blocks while too many are out."""
+        shared = self._share_strings(block, self._next_row)
+        task = (block, self._next_row, "", shared, list(self._inline_from))
+        self._next_row += len(block)
+        if self._pool is None:
+            import multiprocessing
+            self._pool = multiprocessing.Pool(self.workers)
+        self._in_flight.append(self._pool.apply_async(_render_block, (task,)))
+        while len(self._in_flight) > 2 * self.workers:
+            self._stream.write_block(self._in_flight.popleft().get())
+
+    def _flush_pending(self):
+        """Write every block handed out and the rows still waiting for a full block."""
+        while self._in_flight:
+            self._stream.write_block(self._in_flight.popleft().get())
+        if self._pending:
+            block, self._pending = self._pending, []
+            shared = self._share_strings(block, self._next_row)
+            # A short last block is not worth a trip to the pool
+            self._stream.write_block(_render_block((block, self._next_row, "", shared, self._inline_from)))
+            self._next_row += len(block)
+
+    def _finish_sheet(self):
+        if self._stream is None:
+            return
+        tail = ('</sheetData><pageMargins left="0.75" right="0.75" top="1" bottom="1" '
+                'header="0.5" footer="0.5"/></worksheet>')
+        if self.parallel:
+            self._flush_pending()
+            self._stream.write_block(deflate_block(tail, final=True))
+        else:
+            self._stream.write(tail.encode("utf-8"))
+        self._stream.close()
+        self._stream = None
+
+    def _write_shared_strings(self):
+        with self._zip.open("xl/sharedStrings.xml") as member:
+            member.write((_XML_DECLARATION + f'<sst xmlns="{_MAIN_NS}" count="{self.shared_string_refs}" '
+                          f'uniqueCount="{len(self.shared_strings)}">').encode("utf-8"))
+            chunk = []
+            for text in self.shared_strings:
+                chunk.append(f"<si>{_text_element(text)}</si>")
+                if len(chunk) >= 10000:
+                    member.write("".join(chunk).encode("utf-8"))
+                    chunk = []
+            chunk.append("</sst>")
+            member.write("".join(chunk).encode("utf-8"))
+
+    def _write_package_parts(self):
+        sheet_count = len(self.sheets)
+        shared = self.strings == "shared"
+        overrides = [
+            ("/xl/workbook.xml", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"),
+            ("/xl/styles.xml", "application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"),
+            ("/docProps/core.xml", "application/vnd.openxmlformats-package.core-properties+xml"),
+            ("/docProps/app.xml", "application/vnd.openxmlformats-officedocument.extended-properties+xml"),
+        ]
+        overrides += [(f"/xl/worksheets/sheet{n}.xml",
+                       "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml")
+                      for n in range(1, sheet_count + 1)]
+        if shared:
+            overrides.append(("/xl/sharedStrings.xml",
+                              "application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"))
+        self._write_member("[Content_Types].xml", _XML_DECLARATION +
+                           '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                           '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                           '<Default Extension="xml" ContentType="application/xml"/>' +
+                           "".join(f'<Override PartName="{part}" ContentType="{kind}"/>' for part, kind in overrides) +
+                           "</Types>")
+
+        self._write_member("_rels/.rels", _XML_DECLARATION + f'<Relationships xmlns="{_PKG_REL_NS}">'
+                           f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+                           '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/'
+                           'metadata/core-properties" Target="docProps/core.xml"/>'
+                           f'<Relationship Id="rId3" Type="{_REL_NS}/extended-properties" Target="docProps/app.xml"/>'
+                           "</Relationships>")
+
+        timestamp = self._timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")
+        self._write_member("docProps/core.xml", _XML_DECLARATION +
+                           '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/'
+                           'core-properties" xmlns:dc="http://purl.org/dc/elements/1.1/" '
+                           'xmlns:dcterms="http://purl.org/dc/terms/" '
+                           'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+                           f'<dcterms:created xsi:type="dcterms:W3CDTF">{timestamp}</dcterms:created>'
+                           f'<dcterms:modified xsi:type="dcterms:W3CDTF">{timestamp}</dcterms:modified>'
+                           "</cp:coreProperties>")
+        self._write_member("docProps/app.xml", _XML_DECLARATION +
+                           '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+                           "<Application>Microsoft Excel</Application></Properties>")
+
+        self._write_member("xl/workbook.xml", _XML_DECLARATION + f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+                           '<workbookPr/><bookViews><workbookView activeTab="0"/></bookViews><sheets>' +
+                           "".join(f'<sheet name="{_attribute(title)}" sheetId="{n}" r:id="rId{n}"/>'
+                                   for n, title in enumerate(self.sheets, 1)) +
+                           "</sheets></workbook>")
+        relationships = [f'<Relationship Id="rId{n}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                         for n in range(1, sheet_count + 1)]
+        relationships.append(f'<Relationship Id="rId{sheet_count + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>')
+        if shared:
+            relationships.append(f'<Relationship Id="rId{sheet_count + 2}" Type="{_REL_NS}/sharedStrings" '
+                                 f'Target="sharedStrings.xml"/>')
+        self._write_member("xl/_rels/workbook.xml.rels", _XML_DECLARATION + f'<Relationships xmlns="{_PKG_REL_NS}">' +
+                           "".join(relationships) + "</Relationships>")
+        self._write_member("xl/styles.xml", _STYLES)
+
+    def _close_pool(self, terminate: bool = False):
+        if self._pool is not None:
+            if terminate:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def close(self):
+        if self.closed:
+            return
+        if not self.sheets:
+            self.add_sheet("Sheet")
+        self._finish_sheet()
+        self._close_pool()
+        if self.strings == "shared":
+            self._write_shared_strings()
+        self._write_package_parts()
+        self._zip.close()
+        if self._file is not None:
+            self._file.close()
+            replace_file(self._tmp_filename, self.target)
+        self.closed = True
+
+    def abort(self):
+        """Stop without finishing the file; a path target is left as it was."""
+        if self.closed:
+            return
+        self._close_pool(terminate=True)
+        self._in_flight.clear()
+        self._pending = []
+        try:
+            if self._file is not None:
+                self._file.close()
+        finally:
+            if self._tmp_filename is not None and os.path.exists(self._tmp_filename):
+                os.remove(self._tmp_filename)
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+        return False
+
+
+def write_xlsx(target, title: str, headers: Sequence[str], rows: Sequence[Sequence],
+               column_widths: Optional[Sequence[float]] = None, deterministic: bool = False,
+               strings: str = "shared", center_header: bool = False, workers: int = 1):
+    """One-sheet workbook with a styled header row, written in one call."""
+    with XlsxWriter(target, deterministic, strings, workers=workers) as writer:
+        writer.add_sheet(title, headers, column_widths or (), center_header)
+        writer.append_rows(rows)